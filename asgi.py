@@ -0,0 +1,246 @@
+"""ASGI serving mode for MovieZone.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+
+The public pages (home/search, category pages and the movie detail page) are
+served by async handlers that use pymongo's AsyncMongoClient. While a request
+waits on MongoDB the worker keeps serving others. TMDb lookups of viewed titles
+go through bot.py's background enrichment (its cache, lease and versioned
+write), so no request waits on TMDb. The routes, templates and URLs are the
+same as bot.py.
+
+The admin screens are low-traffic and keep running as the WSGI Flask app:
+requests under /admin, /edit_movie and /delete_movie are dispatched to it
+unchanged, with Basic Auth still enforced by bot.py. The sitemap and feeds are
+served by it too.
+
+Public reads use bot.py's read routing (PUBLIC_READ_PREFERENCE, primary for a
+few seconds after a catalog change), and the async client's commands are
+counted in the same /admin/mongo_metrics report. Slow queries land in bot.py's
+slow-query log, under the async handler's endpoint.
+"""
+import os
+import re
+import threading
+
+from asgiref.wsgi import WsgiToAsgi
+from bson.objectid import ObjectId
+from pymongo import AsyncMongoClient
+from jinja2 import DictLoader
+from quart import Quart, has_request_context, render_template, request
+
+import bot
+from read_routing import RoutedCollection
+
+app = Quart(__name__)
+# Same templates as bot.py, compiled once on first use
+app.jinja_loader = DictLoader(bot.TEMPLATES)
+app.add_template_filter(bot.format_date)
+app.add_template_filter(bot.link_size)
+
+
+def current_route():
+    """Slow queries of the async handlers are logged under their endpoint, the rest as in bot.py."""
+    if has_request_context():
+        return request.endpoint or request.path
+    return bot.current_route()
+
+
+bot.slow_query_log.route = current_route
+
+# Concurrent slow requests are cheap here, so allow more connections per process
+# than the threaded WSGI workers need.
+ASYNC_MONGO_MAX_POOL_SIZE = int(os.getenv("ASYNC_MONGO_MAX_POOL_SIZE", "200"))
+
+# Created per process in before_serving so they belong to the server's event loop
+mongo_client = None
+movies = None
+episodes = None
+
+
+@app.before_serving
+async def open_clients():
+    global mongo_client, movies, episodes
+    mongo_client = AsyncMongoClient(bot.MONGO_URI, maxPoolSize=ASYNC_MONGO_MAX_POOL_SIZE,
+                                    event_listeners=[bot.command_metrics, bot.slow_query_log])
+    # Public reads follow bot.py's read routing (secondaries, primary right after a change)
+    database = mongo_client["movie_db"]
+    public = database.with_options(read_preference=bot.read_routing.read_preference)
+    movies = RoutedCollection(bot.read_routing, database["movies"], public["movies"])
+    episodes = RoutedCollection(bot.read_routing, database["episodes"], public["episodes"])
+    # Other processes' writes reach the in-process indexes through bot.py's change stream or poller
+    bot.start_change_watcher()
+    # The trigram index is built with bot.py's synchronous client, off the event loop
+    threading.Thread(target=bot.load_title_search, daemon=True).start()
+    # So is the trending ranking, and views are flushed by bot.py's view counter thread
+    bot.start_trending_worker()
+
+
+@app.after_serving
+async def close_clients():
+    await mongo_client.close()
+
+
+async def find_list(filter, limit=0):
+    cursor = movies.find(filter).sort('_id', -1)
+    if limit:
+        cursor = cursor.limit(limit)
+    result = await cursor.to_list(None)
+    for m in result:
+        m['_id'] = str(m['_id'])
+    return result
+
+
+async def trending_list(limit=0):
+    """Async counterpart of bot.shelf_list("trending"): pinned titles, then the computed ranking."""
+    result = await find_list(bot.TRENDING_FILTER, limit)
+    pinned = {m['_id'] for m in result}
+    ids = [doc_id for doc_id in bot.trending_shelf.ids if str(doc_id) not in pinned]
+    if ids and (not limit or len(result) < limit):
+        found = {doc['_id']: doc async for doc in movies.find({"_id": {"$in": ids}})}
+        for doc_id in ids:
+            if doc_id in found and (not limit or len(result) < limit):
+                doc = found[doc_id]
+                doc['_id'] = str(doc_id)
+                doc['trending_auto'] = True
+                result.append(doc)
+    return result
+
+
+@app.route('/')
+async def home():
+    query = request.args.get('q')
+
+    movies_list = []
+    trending_movies_list = []
+    latest_movies_list = []
+    latest_series_list = []
+    coming_soon_movies_list = []
+    is_full_page_list = False
+
+    if query:
+        movies_list = await search_titles(query)
+        is_full_page_list = True
+    else:
+        trending_movies_list = await trending_list(bot.HOME_SHELF_LIMIT)
+        latest_movies_list = await find_list(bot.LATEST_MOVIES_FILTER, bot.HOME_SHELF_LIMIT)
+        latest_series_list = await find_list(bot.LATEST_SERIES_FILTER, bot.HOME_SHELF_LIMIT)
+        coming_soon_movies_list = await find_list(bot.COMING_SOON_FILTER, bot.HOME_SHELF_LIMIT)
+
+    return await render_template(
+        "index.html",
+        movies=movies_list,
+        query=query,
+        trending_movies=trending_movies_list,
+        latest_movies=latest_movies_list,
+        latest_series=latest_series_list,
+        coming_soon_movies=coming_soon_movies_list,
+        is_full_page_list=is_full_page_list
+    )
+
+
+async def search_titles(query):
+    """Async counterpart of bot.iter_search_results."""
+    if not bot.title_search.ready:
+        cursor = movies.find({"title": {"$regex": re.escape(query), "$options": "i"}}).limit(bot.SEARCH_LIMIT)
+        result = await cursor.to_list(None)
+    else:
+        ids = bot.title_search.search(query, bot.SEARCH_LIMIT)
+        found = {doc["_id"]: doc async for doc in movies.find({"_id": {"$in": ids}})}
+        result = [found[doc_id] for doc_id in ids if doc_id in found]
+    for m in result:
+        m['_id'] = str(m['_id'])
+    return result
+
+
+async def load_episodes_page(movie, page):
+    """Async counterpart of bot.load_episodes_page."""
+    if "episodes" in movie:
+        return bot.load_episodes_page(movie, page)
+    page, pages = bot.episode_page_bounds(movie.get("episode_count", 0), page)
+    cursor = episodes.find({"series_id": movie["_id"]}, {"series_id": 0}).sort(bot.EPISODE_SORT)
+    cursor = cursor.skip((page - 1) * bot.EPISODES_PAGE_SIZE).limit(bot.EPISODES_PAGE_SIZE)
+    return await cursor.to_list(None), page, pages
+
+
+async def load_related(movie):
+    """Async counterpart of bot.load_related."""
+    ids = [neighbour["_id"] for neighbour in movie.get("related") or []][:bot.RELATED_SIZE]
+    if not ids:
+        return []
+    found = {doc["_id"]: doc async for doc in movies.find({"_id": {"$in": ids}}, bot.CARD_FIELDS)}
+    result = [found[doc_id] for doc_id in ids if doc_id in found]
+    for m in result:
+        m['_id'] = str(m['_id'])
+    return result
+
+
+@app.route('/movie/<movie_id>')
+async def movie_detail(movie_id):
+    try:
+        movie = await movies.find_one({"_id": ObjectId(movie_id)})
+        if movie and request.args.get('page', 1, type=int) == 1:
+            bot.view_counter.record(movie["_id"])
+        if movie and bot.should_fetch_tmdb(movie):
+            # Shown as stored; the lookup runs in bot.py's background worker, which caches it,
+            # writes only if the title is unchanged and notifies this process's indexes
+            bot.queue_tmdb_enrichment(movie_id, dict(movie, _id=movie_id))
+
+        episodes_list, episode_page, episode_pages = [], 1, 1
+        if movie and movie.get("type") == "series":
+            episodes_list, episode_page, episode_pages = await load_episodes_page(movie, request.args.get('page', 1, type=int))
+
+        related_list = await load_related(movie) if movie else []
+        if movie:
+            movie['_id'] = str(movie['_id'])
+        return await render_template("detail.html", movie=movie, episodes=episodes_list, episode_page=episode_page, episode_pages=episode_pages,
+                                     related_titles=related_list)
+    except Exception as e:
+        print(f"Error fetching movie detail for ID {movie_id}: {e}")
+        return await render_template("detail.html", movie=None)
+
+
+@app.route('/trending_movies')
+async def trending_movies():
+    return await render_template("index.html", movies=await trending_list(), query="Trending on MovieZone", is_full_page_list=True)
+
+
+@app.route('/movies_only')
+async def movies_only():
+    return await render_template("index.html", movies=await find_list(bot.LATEST_MOVIES_FILTER), query="All Movies on MovieZone", is_full_page_list=True)
+
+
+@app.route('/webseries')
+async def webseries():
+    return await render_template("index.html", movies=await find_list(bot.LATEST_SERIES_FILTER), query="All Web Series on MovieZone", is_full_page_list=True)
+
+
+@app.route('/coming_soon')
+async def coming_soon():
+    return await render_template("index.html", movies=await find_list(bot.COMING_SOON_FILTER), query="Coming Soon to MovieZone", is_full_page_list=True)
+
+
+# Endpoint names must exist in this app too, so url_for() in the shared templates
+# resolves the admin, feed, download and browse links. These are never called: the dispatcher below
+# sends those paths to the Flask app.
+for rule, endpoint in [('/admin', 'admin'), ('/edit_movie/<movie_id>', 'edit_movie'), ('/delete_movie/<movie_id>', 'delete_movie'),
+                       ('/feed/<kind>.<feed_format>', 'feed'), ('/download/<movie_id>/<quality>', 'download'),
+                       ('/download/<movie_id>/s<int:season>e<int:episode>/<quality>', 'download_episode'),
+                       ('/browse', 'browse'), ('/genre/<name>', 'genre'), ('/year/<year>', 'year'), ('/language/<code>', 'language')]:
+    app.add_url_rule(rule, endpoint, methods=["GET", "POST"])
+
+# The sitemap and feeds are cached per process by bot.py and rarely miss, so they
+# stay on the WSGI app as well, like the health checks, the download redirects
+# (whose click counter buffers in bot.py) and the browse pages (answered from
+# bot.py's in-memory facet index).
+WSGI_PATH_PREFIXES = ("/admin", "/edit_movie/", "/delete_movie/", "/sitemap", "/feed/", "/download/",
+                      "/browse", "/genre/", "/year/", "/language/", "/healthz", "/readyz")
+flask_admin = WsgiToAsgi(bot.create_app())
+
+
+async def application(scope, receive, send):
+    """ASGI entry point: admin, sitemap, feed, download and browse paths go to the WSGI Flask app, everything else to Quart."""
+    if scope["type"] == "http" and scope["path"].startswith(WSGI_PATH_PREFIXES):
+        await flask_admin(scope, receive, send)
+    else:
+        await app(scope, receive, send)
@@ -1,9 +1,37 @@
-from flask import Flask, render_template_string, request, redirect, url_for, Response
-from pymongo import MongoClient
+import time
+IMPORT_STARTED = time.perf_counter() # Cold-start timing, see startup_timings()
+
+from flask import Flask, has_request_context, render_template, request, redirect, url_for, Response, jsonify, stream_with_context
+from jinja2 import DictLoader
+import pymongo
+from pymongo import MongoClient, InsertOne, UpdateOne, DeleteOne, ReturnDocument, ReadPreference
+from pymongo.errors import BulkWriteError, PyMongoError
 from bson.objectid import ObjectId
-import requests, os
+import requests, os, re, socket, threading, itertools
+from datetime import datetime, timezone
+from urllib.parse import quote
+from email.utils import format_datetime
 from functools import wraps
 from dotenv import load_dotenv
+from catalog_mirror import CatalogMirror
+from change_stream import UPDATED_AT_INDEX, CatalogPoller, ChangeStreamWatcher
+from click_counter import ClickCounter
+from facets import FACETS, FacetIndex
+from feeds import FEED_INDEX, SITEMAP_MAX_URLS, FeedCache, SitemapIndex, lastmod
+from page_cache import PageCache
+from read_routing import READ_COMMANDS, CommandMetrics, ReadRouting, RoutedCollection
+from slow_queries import RANK_KEYS, SlowQueryLog
+import catalog_export
+import related
+from schema import (RATING_INDEX, YEAR_INDEX, dead_link_count, format_date, keep_link_checks, keep_link_checks_stages,
+                    link_size, make_link, normalize_movie, parse_rating, parse_release_date, parse_year, same_links)
+from single_flight import MongoLease, SingleFlight
+from stale_cache import StaleCache
+from title_search import TitleSearchIndex
+from tmdb_cache import TMDbCache, tmdb_candidate, tmdb_candidates
+from trending import VIEWS_INDEX, TrendingShelf, ViewCounter, compute_trending
+from shelves import (SHELVES, SHELF_INDEX, SHELF_FILTERS, TRENDING_FILTER, LATEST_MOVIES_FILTER,
+                     LATEST_SERIES_FILTER, COMING_SOON_FILTER, SET_SHELVES_STAGE, movie_shelves)
 
 # .env ফাইল থেকে এনভায়রনমেন্ট ভেরিয়েবল লোড করুন (শুধুমাত্র লোকাল ডেভেলপমেন্টের জন্য)
 load_dotenv()
@@ -40,23 +68,100 @@ def requires_auth(f):
     return decorated
 # --- অথেন্টিকেশন সংক্রান্ত পরিবর্তন শেষ ---
 
-# Check if environment variables are set
-if not MONGO_URI:
-    print("Error: MONGO_URI environment variable not set. Exiting.")
-    exit(1)
-if not TMDB_API_KEY:
-    print("Error: TMDB_API_KEY environment variable not set. Exiting.")
-    exit(1)
-
-# Database connection
-try:
-    client = MongoClient(MONGO_URI)
-    db = client["movie_db"]
-    movies = db["movies"]
-    print("Successfully connected to MongoDB!")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}. Exiting.")
-    exit(1)
+def check_config():
+    """Raises RuntimeError if a required environment variable is missing."""
+    if not MONGO_URI:
+        raise RuntimeError("MONGO_URI environment variable not set.")
+    if not TMDB_API_KEY:
+        raise RuntimeError("TMDB_API_KEY environment variable not set.")
+
+# Connection pool size per process. The production launcher (gunicorn.conf.py) sets this
+# to match the number of threads in each worker; the pymongo default is 100.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+
+# Public pages read with PUBLIC_READ_PREFERENCE (replica set secondaries by default) from
+# members at most MONGO_MAX_STALENESS_SECONDS behind (-1 = no limit, MongoDB's minimum is 90).
+# For PRIMARY_READS_AFTER_CHANGE seconds after a catalog change they read the primary, so pages
+# re-rendered after an edit include it. Admin screens and all writes use the primary, and so do
+# the loads of the in-memory indexes: they are kept for the life of the process and only ever
+# patched by change notifications, so a load from a lagging secondary would stay behind.
+read_routing = ReadRouting(os.getenv("PUBLIC_READ_PREFERENCE", "secondaryPreferred"),
+                           int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "90")),
+                           float(os.getenv("PRIMARY_READS_AFTER_CHANGE", "5")))
+command_metrics = CommandMetrics()
+
+def current_route():
+    """What is running the current MongoDB command: the Flask endpoint, or the background thread."""
+    if has_request_context():
+        return request.endpoint or request.path
+    return f"thread:{threading.current_thread().name}"
+
+def explain_query(database, command):
+    # Reads are explained where public reads go; writes (update, delete, findAndModify) on the primary
+    read_preference = read_routing.read_preference if next(iter(command)) in READ_COMMANDS else ReadPreference.PRIMARY
+    return get_client()[database].command("explain", command, verbosity="executionStats",
+                                          read_preference=read_preference)
+
+# Queries slower than SLOW_QUERY_MS (0 = off) are logged and ranked by shape at /admin/slow_queries;
+# each new slow shape is explained once in the background unless SLOW_QUERY_EXPLAIN=0.
+slow_query_log = SlowQueryLog(float(os.getenv("SLOW_QUERY_MS", "100")),
+                              explain=explain_query if os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1" else None,
+                              route=current_route)
+
+client = None
+mongo_lock = threading.RLock()
+
+def connect_mongo():
+    """Creates the MongoClient used by the db/movies/episodes handles.
+
+    Importing bot.py doesn't connect; the client is created on first use. A
+    MongoClient must not be shared across fork(), so gunicorn calls this again
+    in every worker after forking (see post_fork in gunicorn.conf.py).
+    """
+    global client
+    with mongo_lock:
+        client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE, event_listeners=[command_metrics, slow_query_log])
+    return client
+
+def get_client():
+    if client is None:
+        with mongo_lock:
+            if client is None:
+                connect_mongo()
+    return client
+
+class LazyHandle:
+    """Stands in for movie_db or one of its collections and resolves on first use."""
+
+    def __init__(self, *path, read_preference=None):
+        self._path = path
+        self._read_preference = read_preference
+        self._client = None
+        self._target = None
+
+    def resolve(self):
+        current = get_client()
+        if self._client is not current:
+            target = current["movie_db"]
+            for name in self._path:
+                target = target[name]
+            if self._read_preference is not None:
+                target = target.with_options(read_preference=self._read_preference)
+            self._client, self._target = current, target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __getitem__(self, name):
+        return self.resolve()[name]
+
+db = LazyHandle()
+movies = LazyHandle("movies")
+episodes = LazyHandle("episodes")
+# Public page reads (see read_routing.py); admin screens read their own writes through movies/episodes
+public_movies = RoutedCollection(read_routing, movies, LazyHandle("movies", read_preference=read_routing.read_preference))
+public_episodes = RoutedCollection(read_routing, episodes, LazyHandle("episodes", read_preference=read_routing.read_preference))
 
 # TMDb Genre Map (for converting genre IDs to names) - অপরিবর্তিত
 TMDb_Genre_Map = {
@@ -66,6 +171,714 @@ TMDb_Genre_Map = {
     10752: "War", 37: "Western", 10751: "Family", 14: "Fantasy", 36: "History"
 }
 
+# Homepage shelves show the newest 6 titles (shelf filters live in shelves.py)
+HOME_SHELF_LIMIT = 6
+
+tmdb_session = None
+
+def tmdb_get(url):
+    """GET a TMDb API url (5s timeout) on a lazily created, connection-reusing session."""
+    global tmdb_session
+    if tmdb_session is None:
+        tmdb_session = requests.Session()
+    return tmdb_session.get(url, timeout=5).json()
+
+def tmdb_search_url(title, search_type="movie"):
+    return f"https://api.themoviedb.org/3/search/{search_type}?api_key={TMDB_API_KEY}&query={quote(title)}"
+
+def tmdb_detail_url(tmdb_id, detail_type="movie"):
+    return f"https://api.themoviedb.org/3/{detail_type}/{tmdb_id}?api_key={TMDB_API_KEY}"
+
+# TMDb searches and details are cached for TMDB_CACHE_TTL seconds, in process and in movie_db.tmdb_cache
+TMDB_CACHE_TTL = int(os.getenv("TMDB_CACHE_TTL", "86400"))
+TMDB_TYPES = {"movie": "movie", "series": "tv"} # content_type -> TMDb media type
+tmdb_cache = TMDbCache(LazyHandle("tmdb_cache"), TMDB_CACHE_TTL)
+
+def tmdb_search(title, content_type="movie"):
+    media_type = TMDB_TYPES[content_type]
+    key = f"search:{media_type}:{' '.join(title.casefold().split())}"
+    return tmdb_cache.get(key, lambda: tmdb_get(tmdb_search_url(title, media_type)))
+
+def tmdb_detail(tmdb_id, content_type="movie"):
+    media_type = TMDB_TYPES[content_type]
+    return tmdb_cache.get(f"{media_type}:{tmdb_id}", lambda: tmdb_get(tmdb_detail_url(tmdb_id, media_type)))
+
+def should_fetch_tmdb(movie):
+    """Only movies without a stored tmdb_id or still missing their poster/overview are enriched on view."""
+    movie = normalize_movie(movie)
+    return bool(TMDB_API_KEY) and (not movie.get("tmdb_id") or not movie.get("overview") or not movie.get("poster")) and movie.get("type") == "movie"
+
+def merge_tmdb_detail(movie, res):
+    """Fills fields of `movie` still missing from a TMDb detail response.
+
+    Manually entered data always wins. Returns the fields TMDb filled in (normalized,
+    see schema.py), with a new updated_at if there are any.
+    """
+    movie.update(normalize_movie(movie))
+    before = {field: movie.get(field) for field in ("overview", "poster", "year", "release_date", "vote_average", "original_language", "genres")}
+    # Only update if TMDb provides a better value AND manual data wasn't provided
+    if not movie.get("overview") and res.get("overview"):
+        movie["overview"] = res.get("overview")
+    if not movie.get("poster") and res.get("poster_path"):
+        movie["poster"] = f"https://image.tmdb.org/t/p/w500{res['poster_path']}"
+
+    release_date = parse_release_date(res.get("release_date") or res.get("first_air_date")) # first_air_date for series
+    if movie.get("year") is None and release_date:
+        movie["year"] = release_date.year
+        movie["release_date"] = release_date
+
+    if movie.get("vote_average") is None and res.get("vote_average"):
+        movie["vote_average"] = parse_rating(res.get("vote_average"))
+    if not movie.get("original_language") and res.get("original_language"):
+        movie["original_language"] = res["original_language"].lower()
+
+    genres_names = []
+    for genre_obj in res.get("genres", []):
+        if isinstance(genre_obj, dict) and genre_obj.get("id") in TMDb_Genre_Map:
+            genres_names.append(TMDb_Genre_Map[genre_obj["id"]])
+    if (not movie.get("genres") or movie["genres"] == []) and genres_names: # Only update if TMDb provides genres and no manual genres
+        movie["genres"] = genres_names
+
+    fields = {field: movie[field] for field, value in before.items() if movie.get(field) != value}
+    if fields:
+        movie["updated_at"] = fields["updated_at"] = datetime.now(timezone.utc)
+    return fields
+
+# Fields the admin forms fill from the picked TMDb candidate when they're left empty
+TMDB_FILLED_FIELDS = ("overview", "poster", "year", "original_language", "genres")
+
+def apply_tmdb_pick(movie_data, tmdb_id, content_type):
+    """Stores the TMDb candidate picked in an admin form and fills what was left empty from its cached detail."""
+    movie_data["tmdb_id"] = tmdb_id
+    if not tmdb_id or not TMDB_API_KEY:
+        return
+    try:
+        res = tmdb_detail(tmdb_id, content_type)
+        if res and res.get("id") == tmdb_id:
+            merge_tmdb_detail(movie_data, res)
+        else:
+            print(f"TMDb has no {TMDB_TYPES[content_type]} with id {tmdb_id}.")
+    except requests.exceptions.RequestException as e:
+        print(f"Error connecting to TMDb API for {TMDB_TYPES[content_type]} {tmdb_id}: {e}")
+
+# --- In-process caches and cross-node invalidation ---
+# Rendered public pages are cached for PAGE_CACHE_TTL seconds (0 disables the cache).
+# Run with CHANGE_STREAMS=1 when several processes or nodes serve the site, so an edit
+# on any of them invalidates every process's cache.
+# Entries are refreshed slightly early under load (PAGE_CACHE_EARLY_REFRESH scales how early, 0 = never).
+# At most PAGE_CACHE_SIZE pages are kept per process, least recently used evicted first.
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "0"))
+PAGE_CACHE_EARLY_REFRESH = float(os.getenv("PAGE_CACHE_EARLY_REFRESH", "1"))
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "5000"))
+page_cache = PageCache(PAGE_CACHE_TTL, PAGE_CACHE_EARLY_REFRESH, PAGE_CACHE_SIZE)
+
+# Concurrent misses for the same page (or TMDb lookup) are coalesced within a process.
+# SINGLE_FLIGHT_MONGO=1 also takes a lease in movie_db.locks so only one process looks a title up on TMDb.
+single_flight = SingleFlight()
+SINGLE_FLIGHT_MONGO = os.getenv("SINGLE_FLIGHT_MONGO") == "1"
+tmdb_lease = MongoLease(LazyHandle("locks"), ttl=30)
+
+def cached_page(key, render):
+    """Page cache lookup; on a miss only one thread per process renders `key`, the others share its html.
+
+    render() returns (html, doc_ids shown, shelves listed); doc_ids None means "don't cache".
+    Returns (html, cacheable): cacheable is False when render() said not to cache the page.
+    """
+    html = page_cache.get(key)
+    if html is not None:
+        return html, True
+
+    def load():
+        started = time.perf_counter()
+        generation = page_cache.generation()
+        html, doc_ids, shelves = render()
+        if doc_ids is not None:
+            page_cache.set(key, html, doc_ids, shelves, time.perf_counter() - started, generation)
+        return html, doc_ids is not None
+    return single_flight.do(key, load)
+
+CHANGE_STREAMS = os.getenv("CHANGE_STREAMS") == "1"
+NODE_ID = os.getenv("NODE_ID", socket.gethostname())
+change_stream_watcher = None
+# Without change streams, other processes' writes are picked up by polling every
+# CATALOG_POLL_INTERVAL seconds (0 = never, e.g. for a single process)
+CATALOG_POLL_INTERVAL = float(os.getenv("CATALOG_POLL_INTERVAL", "30"))
+catalog_poller = None
+
+# Callables taking (doc_id, doc) that are told about every change to the movies collection.
+# doc is the document after the change (None if deleted); doc_id None means "anything may have changed".
+movie_change_listeners = []
+
+def notify_movie_changed(doc_id, doc):
+    for listener in movie_change_listeners:
+        try:
+            listener(doc_id, doc)
+        except Exception as e:
+            print(f"Error in movie change listener {listener.__name__} for ID {doc_id}: {e}")
+
+def invalidate_page_cache(doc_id, doc):
+    if doc_id is None:
+        page_cache.clear()
+    else:
+        page_cache.invalidate_document(doc_id, movie_shelves(doc) if doc else ())
+
+# Registered first, so reads that refill the page cache already go to the primary
+movie_change_listeners.insert(0, read_routing.catalog_changed)
+movie_change_listeners.append(invalidate_page_cache)
+
+# Optional read mode: every process keeps the whole catalog in memory and serves the
+# homepage, category pages and movie details from it (with >1 process, set CHANGE_STREAMS=1 or
+# the other processes' writes arrive a CATALOG_POLL_INTERVAL late).
+CATALOG_MIRROR = os.getenv("CATALOG_MIRROR") == "1"
+catalog_mirror = CatalogMirror(movie_shelves, SHELVES)
+
+def load_catalog_mirror():
+    count = catalog_mirror.load(movies)
+    print(f"Catalog mirror loaded {count} documents in {catalog_mirror.load_seconds:.2f}s.")
+
+def update_catalog_mirror(doc_id, doc):
+    catalog_mirror.apply_change(doc_id, doc)
+    if doc_id is None:
+        threading.Thread(target=load_catalog_mirror, daemon=True).start()
+
+if CATALOG_MIRROR:
+    movie_change_listeners.append(update_catalog_mirror)
+
+def shelf_list(shelf, limit=0):
+    """Documents on `shelf`, newest first, with string _ids (from the mirror when it is loaded).
+
+    The trending shelf lists the titles pinned in the admin first, then the computed ranking.
+    """
+    if catalog_mirror.ready:
+        result = catalog_mirror.shelf(shelf, limit)
+    else:
+        cursor = public_movies.find(SHELF_FILTERS[shelf]).sort('_id', -1)
+        if limit:
+            cursor = cursor.limit(limit)
+        result = list(cursor)
+        for m in result:
+            m['_id'] = str(m['_id'])
+    if shelf == "trending" and (not limit or len(result) < limit):
+        ranked = ranked_trending({m['_id'] for m in result})
+        result += ranked[:limit - len(result)] if limit else ranked
+    return result
+
+# Fields the title cards of the list pages use
+CARD_FIELDS = {"title": 1, "poster": 1, "year": 1, "quality": 1, "top_label": 1, "original_language": 1,
+               "is_trending": 1, "is_coming_soon": 1}
+
+def titles_by_id(ids, fields=None):
+    """The titles with these ObjectIds in the same order, with string _ids; ids no longer found are skipped."""
+    if not ids:
+        return []
+    if catalog_mirror.ready:
+        found = {doc_id: catalog_mirror.get(doc_id) for doc_id in ids}
+    else:
+        found = {doc['_id']: doc for doc in public_movies.find({"_id": {"$in": ids}}, fields)}
+    result = []
+    for doc_id in ids:
+        doc = found.get(doc_id)
+        if doc is not None:
+            doc['_id'] = str(doc['_id'])
+            result.append(doc)
+    return result
+
+def ranked_trending(exclude=()):
+    """Titles of the computed trending ranking, best first, except the string ids in `exclude`."""
+    result = titles_by_id([doc_id for doc_id in trending_shelf.ids if str(doc_id) not in exclude])
+    for doc in result:
+        doc['trending_auto'] = True # Shows the trending badge
+    return result
+
+# --- Streamed list pages ---
+# Search results and the "See All" pages are rendered with Jinja's streaming API while their
+# titles are read from a cursor STREAM_BATCH_SIZE at a time, so the page head goes out first and
+# neither the whole title list nor the whole page is held in memory. Pages up to
+# STREAM_CACHE_MAX_BYTES are still kept in the page cache and the stale-page cache once sent.
+# Every batch read while streaming has its own PUBLIC_DB_DEADLINE; if one fails, the list ends
+# early with a notice and the page is not cached.
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "100"))
+STREAM_BUFFER = int(os.getenv("STREAM_BUFFER", "20")) # Template chunks per write
+STREAM_CACHE_MAX_BYTES = int(os.getenv("STREAM_CACHE_MAX_BYTES", str(1024 * 1024)))
+
+def iter_shelf(shelf):
+    """Like shelf_list(shelf), but yields the titles one at a time."""
+    if catalog_mirror.ready:
+        titles = catalog_mirror.iter_shelf(shelf)
+    else:
+        cursor = public_movies.find(SHELF_FILTERS[shelf], CARD_FIELDS).sort('_id', -1).batch_size(STREAM_BATCH_SIZE)
+        titles = ({**m, '_id': str(m['_id'])} for m in cursor)
+    pinned = set()
+    for m in titles:
+        pinned.add(m['_id'])
+        yield m
+    if shelf == "trending":
+        yield from ranked_trending(pinned)
+
+def stream_list_page(cache_key, titles, shelves=(), **context):
+    """Streams index.html as a full page list of `titles` (an iterator of title dicts).
+
+    With a `cache_key` the page is served from the page cache when possible, and stored
+    there (as listing `shelves`) after it has been sent, unless it exceeded STREAM_CACHE_MAX_BYTES.
+    """
+    html = page_cache.get(cache_key) if cache_key else None
+    if html is not None:
+        return html
+    url = request.full_path
+    # Sending can take long with a slow client; changes meanwhile must not be overwritten by this render
+    generation = page_cache.generation()
+    # Run the first query now, within the route's MongoDB deadline, so a failure can still be answered with a stale copy
+    titles = iter(titles)
+    first = next(titles, None)
+    if first is not None:
+        titles = itertools.chain([first], titles)
+    shown = []
+    status = {"incomplete": False}
+
+    def tracked():
+        while True:
+            try:
+                # The route's deadline has ended once the page is streaming; every later batch gets its own
+                with pymongo.timeout(PUBLIC_DB_DEADLINE or None):
+                    m = next(titles, None)
+            except PyMongoError as e:
+                # The response has started, so end the list and the page instead of dropping the connection
+                print(f"MongoDB error while streaming {url}: {e}")
+                status["incomplete"] = True
+                return
+            if m is None:
+                return
+            if shown is not None:
+                shown.append(m['_id'])
+            yield m
+
+    context.update(movies=tracked(), is_full_page_list=True, stream_status=status)
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template("index.html").stream(context)
+    stream.enable_buffering(STREAM_BUFFER)
+
+    def generate():
+        nonlocal shown
+        started = time.perf_counter()
+        chunks, size = [], 0
+        for chunk in stream:
+            if chunks is not None:
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > STREAM_CACHE_MAX_BYTES:
+                    # Too large to keep; stop collecting
+                    chunks = shown = None
+            yield chunk
+        if chunks is not None and not status["incomplete"]:
+            html = "".join(chunks)
+            if cache_key:
+                page_cache.set(cache_key, html, shown, shelves, time.perf_counter() - started, generation)
+            stale_cache.set(url, html)
+    return Response(stream_with_context(generate()), mimetype="text/html")
+
+# --- Sitemap and feeds ---
+# The sitemap is built from an in-process (_id, lastmod) index that is loaded on the
+# first request and then updated from change notifications; feeds are rendered from
+# an indexed query and cached until a title of their type changes.
+FEED_SIZE = int(os.getenv("FEED_SIZE", "50"))
+FEED_TYPES = {"movies": ("movie", "Latest Movies"), "series": ("series", "Latest Web Series")}
+SITEMAP_PAGES = ["home", "trending_movies", "movies_only", "webseries", "coming_soon"]
+sitemap_index = SitemapIndex()
+sitemap_load_lock = threading.Lock()
+feed_cache = FeedCache()
+# Absolute URLs in sitemaps and feeds start with SITE_URL (e.g. https://moviezone.example). Unset,
+# they take the Host header of the request, and each host gets its own (bounded) cached copies.
+SITE_URL = os.getenv("SITE_URL", "").rstrip("/")
+
+def site_root():
+    """What absolute URLs in sitemaps and feeds start with; part of their cache keys."""
+    return SITE_URL + "/" if SITE_URL else request.url_root
+
+def absolute_url(endpoint, **values):
+    if SITE_URL:
+        return SITE_URL + url_for(endpoint, **values)
+    return url_for(endpoint, _external=True, **values)
+
+def ensure_sitemap_index():
+    with sitemap_load_lock:
+        if not sitemap_index.ready:
+            count = sitemap_index.load(movies)
+            print(f"Sitemap index loaded {count} titles.")
+
+movie_change_listeners.append(sitemap_index.apply_change)
+movie_change_listeners.append(feed_cache.apply_change)
+
+# --- Faceted browsing ---
+# /browse filters by genre, year, language and type with counts per value, answered from an
+# in-process bitmap index (see facets.py) loaded in the background at startup (or on first use)
+# and updated from change notifications, which other processes' writes reach through
+# CHANGE_STREAMS or the catalog poller; a reset notification reloads it in the background.
+# /genre/<name>, /year/<year> and /language/<code> are the same page with one filter preset.
+BROWSE_PAGE_SIZE = int(os.getenv("BROWSE_PAGE_SIZE", "60"))
+FACET_LABELS = {"genre": "Genre", "year": "Year", "language": "Language", "type": "Type"}
+facet_index = FacetIndex()
+facet_load_lock = threading.Lock()
+
+def ensure_facet_index():
+    with facet_load_lock:
+        if not facet_index.ready:
+            count = facet_index.load(movies)
+            print(f"Facet index loaded {count} titles in {facet_index.load_seconds:.2f}s.")
+
+def update_facet_index(doc_id, doc):
+    facet_index.apply_change(doc_id, doc)
+    if doc_id is None:
+        threading.Thread(target=ensure_facet_index, daemon=True).start()
+
+movie_change_listeners.append(update_facet_index)
+
+READYZ_TIMEOUT = float(os.getenv("READYZ_TIMEOUT", "2"))
+
+# --- Title search ---
+# Public search uses a typo-tolerant trigram index built in every serving process
+# (loaded in the background at startup, then updated from change notifications, which other
+# processes' writes reach through CHANGE_STREAMS or the catalog poller); until it is ready,
+# search falls back to $regex.
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "50"))
+title_search = TitleSearchIndex()
+
+def load_title_search():
+    count = title_search.load(movies)
+    print(f"Title search index loaded {count} titles in {title_search.load_seconds:.2f}s.")
+
+def update_title_search(doc_id, doc):
+    title_search.apply_change(doc_id, doc)
+    if doc_id is None:
+        threading.Thread(target=load_title_search, daemon=True).start()
+
+movie_change_listeners.append(update_title_search)
+
+def iter_search_results(query):
+    """Search results, best match first, with string _ids, read STREAM_BATCH_SIZE titles at a time."""
+    if not title_search.ready:
+        cursor = public_movies.find({"title": {"$regex": re.escape(query), "$options": "i"}}, CARD_FIELDS)
+        for m in cursor.limit(SEARCH_LIMIT).batch_size(STREAM_BATCH_SIZE):
+            m['_id'] = str(m['_id'])
+            yield m
+    else:
+        ids = title_search.search(query, SEARCH_LIMIT)
+        for start in range(0, len(ids), STREAM_BATCH_SIZE):
+            yield from titles_by_id(ids[start:start + STREAM_BATCH_SIZE], CARD_FIELDS)
+
+# --- Serving stale pages while MongoDB is unavailable ---
+# Public pages run their MongoDB calls under a PUBLIC_DB_DEADLINE (seconds, 0 = none).
+# If MongoDB fails or misses it, the last good render of the URL is served with an
+# "X-Cache: STALE" header, and a background thread re-renders those URLs once a ping succeeds.
+PUBLIC_DB_DEADLINE = float(os.getenv("PUBLIC_DB_DEADLINE", "5"))
+STALE_CACHE_SIZE = int(os.getenv("STALE_CACHE_SIZE", "5000"))
+STALE_RETRY_INTERVAL = float(os.getenv("STALE_RETRY_INTERVAL", "5"))
+stale_cache = StaleCache(STALE_CACHE_SIZE)
+revalidator = None
+revalidator_lock = threading.Lock()
+
+def serve_stale_on_db_error(view):
+    """Decorator for public page views (see above)."""
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        url = request.full_path
+        try:
+            with pymongo.timeout(PUBLIC_DB_DEADLINE or None):
+                result = view(*args, **kwargs)
+        except PyMongoError as e:
+            print(f"MongoDB error while rendering {url}: {e}")
+            entry = stale_cache.get_stale(url)
+            schedule_revalidation()
+            if entry is None:
+                return "MovieZone is temporarily unavailable. Please try again in a moment.", 503, {"Retry-After": "10"}
+            html, rendered_at = entry
+            return Response(html, headers={"X-Cache": "STALE", "Age": str(int(time.time() - rendered_at))})
+        if isinstance(result, str):
+            stale_cache.set(url, result)
+        return result
+    return decorated
+
+def schedule_revalidation():
+    global revalidator
+    with revalidator_lock:
+        if revalidator is None or not revalidator.is_alive():
+            revalidator = threading.Thread(target=revalidate_stale_pages, daemon=True)
+            revalidator.start()
+
+def revalidate_stale_pages():
+    """Waits until MongoDB answers again, then re-renders every URL that was served stale."""
+    while True:
+        time.sleep(STALE_RETRY_INTERVAL)
+        try:
+            with pymongo.timeout(READYZ_TIMEOUT):
+                get_client().admin.command("ping")
+            break
+        except PyMongoError:
+            continue
+    urls = stale_cache.take_served_stale()
+    for url in urls:
+        with app.test_request_context(url):
+            try:
+                # Reading the body runs streamed pages to the end, which stores them
+                app.full_dispatch_request().get_data()
+            except Exception as e:
+                print(f"Error revalidating {url}: {e}")
+    print(f"MongoDB is reachable again; revalidated {len(urls)} pages served stale.")
+
+# --- Download click counters ---
+# Download buttons go through /download/..., which counts the click and redirects to the stored link.
+# Clicks are buffered in memory and written to movie_db.download_clicks every CLICK_FLUSH_INTERVAL
+# seconds as one bulk write of $inc updates (one per title), never one write per click.
+CLICK_FLUSH_INTERVAL = float(os.getenv("CLICK_FLUSH_INTERVAL", "10"))
+download_clicks = LazyHandle("download_clicks")
+click_counter = ClickCounter(download_clicks, CLICK_FLUSH_INTERVAL)
+
+# --- Computed trending ---
+# Movie detail views are buffered like download clicks and written to movie_db.title_views in
+# hourly buckets. Every TRENDING_INTERVAL seconds one process (holding a lease in movie_db.locks)
+# ranks titles by time-decayed views (see trending.py) and stores the TRENDING_SIZE best; every
+# process re-reads the ranking every TRENDING_REFRESH_INTERVAL seconds. TRENDING_INTERVAL=0 turns
+# the ranking off, leaving only the titles pinned with "Is Trending?" in the admin.
+TRENDING_SIZE = int(os.getenv("TRENDING_SIZE", "20"))
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+TRENDING_WINDOW_HOURS = float(os.getenv("TRENDING_WINDOW_HOURS", "168"))
+TRENDING_INTERVAL = float(os.getenv("TRENDING_INTERVAL", "600"))
+TRENDING_REFRESH_INTERVAL = float(os.getenv("TRENDING_REFRESH_INTERVAL", "60"))
+title_views = LazyHandle("title_views")
+view_counter = ViewCounter(title_views, CLICK_FLUSH_INTERVAL)
+trending_shelf = TrendingShelf(LazyHandle("trending"))
+trending_lease = MongoLease(LazyHandle("locks"), ttl=300)
+trending_worker = None
+
+def update_trending():
+    """Re-reads the stored ranking, recomputing it first when it is due and no other process is."""
+    changed = trending_shelf.refresh()
+    owner = f"{NODE_ID}:{os.getpid()}"
+    if trending_shelf.due(TRENDING_INTERVAL) and trending_lease.acquire("trending", owner):
+        try:
+            started = time.perf_counter()
+            ids, scores = compute_trending(title_views, TRENDING_SIZE, TRENDING_HALF_LIFE_HOURS, TRENDING_WINDOW_HOURS)
+            changed = trending_shelf.store(ids, scores) or changed
+            print(f"Trending ranking of {len(ids)} titles computed in {time.perf_counter() - started:.2f}s.")
+        finally:
+            trending_lease.release("trending", owner)
+    if changed:
+        page_cache.invalidate_document(None, ["trending"])
+
+def run_trending_worker():
+    while True:
+        try:
+            update_trending()
+        except Exception as e:
+            print(f"Error updating the trending ranking: {e}")
+        time.sleep(TRENDING_REFRESH_INTERVAL)
+
+def start_trending_worker():
+    global trending_worker
+    if TRENDING_INTERVAL and trending_worker is None:
+        trending_worker = threading.Thread(target=run_trending_worker, daemon=True)
+        trending_worker.start()
+
+# --- Related titles ---
+# The detail page shows up to RELATED_SIZE similar titles ("More like this"), stored on each
+# title by `python related.py` (whole catalog) and updated in a background thread when a title
+# is added, deleted, or edited in a way that changes its similarity features (see related.py).
+# One process at a time (holding the "related" lease in movie_db.locks) keeps the catalog's
+# feature vectors in memory and does the updates; the others drop their queue, as the holder is
+# told about the same changes through change streams or the catalog poller.
+RELATED_SIZE = int(os.getenv("RELATED_SIZE", "12"))
+related_index = related.RelatedIndex(RELATED_SIZE)
+related_lease = MongoLease(LazyHandle("locks"), ttl=600)
+related_pending = set()
+related_lock = threading.Lock()
+related_worker = None
+
+def queue_related_update(doc_id):
+    global related_worker
+    with related_lock:
+        related_pending.add(ObjectId(doc_id))
+        if related_worker is None:
+            related_worker = threading.Thread(target=run_related_updates, daemon=True)
+            related_worker.start()
+
+def queue_related_change(doc_id, doc):
+    """Movie change listener: queues titles whose related lists may have to change."""
+    if doc_id is None:
+        related_index.clear() # Unknown changes; reloaded by the next update
+    elif doc is None or not related_index.ready or related_index.changed(dict(doc, _id=ObjectId(doc_id))):
+        queue_related_update(doc_id)
+
+movie_change_listeners.append(queue_related_change)
+
+def run_related_updates():
+    """Updates related lists for the queued titles, in batches, until the queue is empty."""
+    global related_worker
+    owner = f"{NODE_ID}:{os.getpid()}"
+    while True:
+        with related_lock:
+            changed = set(related_pending)
+            related_pending.clear()
+            if not changed:
+                related_worker = None
+                return
+        try:
+            if not related_lease.acquire("related", owner):
+                related_index.clear() # Another process holds the index; free ours
+                continue
+            started = time.perf_counter()
+            if not related_index.ready:
+                count = related_index.load(movies)
+                print(f"Related index loaded {count} titles in {related_index.load_seconds:.2f}s.")
+            rewritten = related_index.update(movies, changed)
+            # The rewritten lists change those titles' detail pages
+            for doc in movies.find({"_id": {"$in": rewritten}}):
+                notify_movie_changed(str(doc["_id"]), doc)
+            print(f"Related titles updated for {len(changed)} changed titles ({len(rewritten)} lists) in {time.perf_counter() - started:.2f}s.")
+        except Exception as e:
+            print(f"Error updating related titles: {e}")
+
+def load_related(movie):
+    """The titles in `movie`'s related list, best first, with string _ids."""
+    return titles_by_id([neighbour["_id"] for neighbour in movie.get("related") or []][:RELATED_SIZE], CARD_FIELDS)
+
+# --- Series episodes ---
+# Episodes live in their own collection, one document per episode:
+# {series_id, season, episode_number, title, overview, links}, indexed on
+# (series_id, season, episode_number). The series document only keeps episode_count.
+# Series saved before this change may still embed an `episodes` array until
+# `python migrate.py episodes` has run; those are read (and rewritten on edit) too.
+EPISODES_PAGE_SIZE = int(os.getenv("EPISODES_PAGE_SIZE", "50"))
+EPISODE_SORT = [("season", 1), ("episode_number", 1)]
+
+def ensure_indexes():
+    """Creates the indexes the site's queries use; run by `python migrate.py indexes` and the dev server."""
+    movies.create_index(SHELF_INDEX)
+    movies.create_index(FEED_INDEX)
+    movies.create_index(UPDATED_AT_INDEX)
+    movies.create_index(YEAR_INDEX)
+    movies.create_index(RATING_INDEX)
+    movies.create_index(related.RELATED_INDEX)
+    if SINGLE_FLIGHT_MONGO:
+        tmdb_lease.ensure_index()
+    tmdb_cache.ensure_index()
+    episodes.create_index([("series_id", 1)] + EPISODE_SORT)
+    title_views.create_index(VIEWS_INDEX, unique=True)
+    title_views.create_index("hour")
+    if TRENDING_INTERVAL:
+        trending_lease.ensure_index()
+
+def episodes_from_form():
+    """Parses the episode rows of the admin/edit form into episode dicts (without series_id)."""
+    episodes_list = []
+    episode_seasons = request.form.getlist('episode_season[]')
+    episode_numbers = request.form.getlist('episode_number[]')
+    episode_titles = request.form.getlist('episode_title[]')
+    episode_overviews = request.form.getlist('episode_overview[]')
+    episode_link_480ps = request.form.getlist('episode_link_480p[]')
+    episode_link_720ps = request.form.getlist('episode_link_720p[]')
+    episode_link_1080ps = request.form.getlist('episode_link_1080p[]')
+
+    for i in range(len(episode_numbers)):
+        episode_links = []
+        if episode_link_480ps and episode_link_480ps[i]:
+            episode_links.append(make_link("480p", episode_link_480ps[i]))
+        if episode_link_720ps and episode_link_720ps[i]:
+            episode_links.append(make_link("720p", episode_link_720ps[i]))
+        if episode_link_1080ps and episode_link_1080ps[i]:
+            episode_links.append(make_link("1080p", episode_link_1080ps[i]))
+
+        episodes_list.append({
+            "season": int(episode_seasons[i]) if i < len(episode_seasons) and episode_seasons[i] else 1,
+            "episode_number": int(episode_numbers[i]) if episode_numbers[i] else 0,
+            "title": episode_titles[i] if episode_titles else "",
+            "overview": episode_overviews[i] if episode_overviews else "",
+            "links": episode_links
+        })
+    return episodes_list
+
+def save_episodes(series_id, new_episodes):
+    """Replaces the stored episodes of a series, writing only episodes that were added, changed or removed."""
+    existing = {}
+    for ep in episodes.find({"series_id": series_id}):
+        existing.setdefault((ep.get("season", 1), ep["episode_number"]), []).append(ep)
+
+    operations = []
+    for ep in new_episodes:
+        matches = existing.get((ep["season"], ep["episode_number"]))
+        if matches:
+            old = matches.pop(0)
+            # Links are compared by quality and url: stored ones also carry their link check results
+            if any(old.get(field) != ep[field] for field in ("title", "overview")) or not same_links(old.get("links"), ep["links"]):
+                operations.append(UpdateOne({"_id": old["_id"]}, {"$set": dict(ep, links=keep_link_checks(old.get("links"), ep["links"]))}))
+        else:
+            operations.append(InsertOne(dict(ep, series_id=series_id)))
+    for leftovers in existing.values():
+        operations.extend(DeleteOne({"_id": old["_id"]}) for old in leftovers)
+
+    if operations:
+        episodes.bulk_write(operations, ordered=False)
+
+def sorted_embedded_episodes(movie):
+    return sorted(movie.get("episodes") or [], key=lambda ep: (ep.get("season", 1), ep.get("episode_number", 0)))
+
+def episode_page_bounds(total, page):
+    """Clamps `page` (1-based) to the available pages; returns (page, pages)."""
+    pages = max(1, -(-total // EPISODES_PAGE_SIZE))
+    return min(max(page, 1), pages), pages
+
+def load_episodes_page(movie, page):
+    """One page of a series' episodes in (season, episode) order; returns (episodes, page, pages)."""
+    if "episodes" in movie:
+        all_episodes = sorted_embedded_episodes(movie)
+        page, pages = episode_page_bounds(len(all_episodes), page)
+        start = (page - 1) * EPISODES_PAGE_SIZE
+        return all_episodes[start:start + EPISODES_PAGE_SIZE], page, pages
+
+    page, pages = episode_page_bounds(movie.get("episode_count", 0), page)
+    cursor = public_episodes.find({"series_id": ObjectId(movie["_id"])}, {"series_id": 0}).sort(EPISODE_SORT)
+    return list(cursor.skip((page - 1) * EPISODES_PAGE_SIZE).limit(EPISODES_PAGE_SIZE)), page, pages
+
+def start_change_watcher():
+    """Starts following other processes' catalog writes: a change stream, or polling without one."""
+    global change_stream_watcher, catalog_poller
+    if CHANGE_STREAMS and change_stream_watcher is None:
+        change_stream_watcher = ChangeStreamWatcher(movies, db["change_stream_tokens"], NODE_ID, notify_movie_changed)
+        change_stream_watcher.start()
+        print(f"Watching movie_db.movies for changes (node '{NODE_ID}').")
+    elif not CHANGE_STREAMS and CATALOG_POLL_INTERVAL and catalog_poller is None:
+        catalog_poller = CatalogPoller(movies, notify_movie_changed, CATALOG_POLL_INTERVAL)
+        catalog_poller.start()
+
+def load_in_background(load, retry_delay=30):
+    """Runs `load` in a daemon thread, again every retry_delay seconds while MongoDB fails."""
+    def run():
+        while True:
+            try:
+                return load()
+            except PyMongoError as e:
+                print(f"{load.__name__} failed, retrying in {retry_delay}s: {e}")
+                time.sleep(retry_delay)
+    threading.Thread(target=run, daemon=True).start()
+
+def start_background_workers():
+    """Starts per-process background threads. Called once in every serving process.
+
+    Nothing here waits for MongoDB: under gunicorn this runs in post_fork, where an
+    exception or a slow start would keep the worker from booting. Indexes are created
+    by `python migrate.py indexes`, not here.
+    """
+    try:
+        start_change_watcher()
+        # Load after the watcher has started: changes during the load are queued and replayed
+        if CATALOG_MIRROR and not catalog_mirror.ready:
+            load_in_background(load_catalog_mirror)
+        if not title_search.ready:
+            load_in_background(load_title_search)
+        if not facet_index.ready:
+            load_in_background(ensure_facet_index)
+        start_trending_worker()
+    except Exception as e:
+        print(f"Could not start background workers: {e}")
+
 # --- START OF index_html TEMPLATE --- (কোন পরিবর্তন নেই)
 index_html = """
 <!DOCTYPE html>
@@ -74,6 +887,8 @@ index_html = """
 <meta charset="UTF-8" />
 <meta name="viewport" content="width=device-width, initial-scale=1" />
 <title>MovieZone - Your Entertainment Hub</title>
+<link rel="alternate" type="application/rss+xml" title="MovieZone - Latest Movies" href="{{ url_for('feed', kind='movies', feed_format='rss') }}" />
+<link rel="alternate" type="application/rss+xml" title="MovieZone - Latest Web Series" href="{{ url_for('feed', kind='series', feed_format='rss') }}" />
 <style>
   /* Reset & basics */
   * {
@@ -175,6 +990,48 @@ index_html = """
       color: #1db954;
   }
 
+  .facet-bar {
+      margin-bottom: 20px;
+  }
+  .facet-group {
+      display: flex;
+      align-items: center;
+      gap: 8px;
+      overflow-x: auto;
+      scrollbar-width: none;
+      padding: 6px 0;
+  }
+  .facet-label {
+      color: #999;
+      font-size: 13px;
+      min-width: 70px;
+      text-transform: uppercase;
+  }
+  .facet-chip {
+      background: #222;
+      color: #eee;
+      padding: 5px 12px;
+      border-radius: 16px;
+      font-size: 13px;
+      white-space: nowrap;
+  }
+  .facet-chip.active {
+      background: #e44d26;
+      color: #fff;
+  }
+  .facet-count {
+      color: #999;
+      font-size: 11px;
+  }
+  .facet-chip.active .facet-count {
+      color: #fff;
+  }
+  .facet-total {
+      color: #999;
+      font-size: 13px;
+      margin-top: 6px;
+  }
+
 
   /* Movie Grid and Card Styles */
   .grid {
@@ -456,11 +1313,22 @@ index_html = """
       <h2>{{ query }}</h2> {# query holds the title like "Trending on MovieZone" #}
       {# No "See All" button for full list pages #}
     </div>
-    {% if movies|length == 0 %}
-      <p style="text-align:center; color:#999; margin-top: 40px;">No content found in this category.</p>
-    {% else %}
-      <div class="grid vertical-grid"> {# Apply vertical-grid class here #}
-        {% for m in movies %}
+    {% if facets %}
+    <div class="facet-bar">
+      {% for label, items in facets %}
+      <div class="facet-group">
+        <span class="facet-label">{{ label }}</span>
+        {% for text, count, active, url in items %}
+          <a href="{{ url }}" class="facet-chip{% if active %} active{% endif %}">{{ text }} <span class="facet-count">{{ count }}</span></a>
+        {% endfor %}
+      </div>
+      {% endfor %}
+      <p class="facet-total">{{ facet_total }} titles</p>
+    </div>
+    {% endif %}
+    {# movies may be a generator (streamed pages), so no |length here #}
+    {% for m in movies %}
+      {% if loop.first %}<div class="grid vertical-grid">{% endif %} {# Apply vertical-grid class here #}
         <a href="{{ url_for('movie_detail', movie_id=m._id) }}" class="movie-card">
           {% if m.poster %}
             <img class="movie-poster" src="{{ m.poster }}" alt="{{ m.title }}">
@@ -481,16 +1349,31 @@ index_html = """
               <span class="movie-top-title" title="{{ m.title }}">{{ m.title }}</span>
           </div>
     
-          {% if m.quality %}
-            <div class="badge {% if m.quality == 'TRENDING' %}trending{% endif %}">{{ m.quality }}</div>
+          {% if m.is_trending or m.trending_auto or m.quality == 'TRENDING' %}
+            <div class="badge trending">TRENDING</div>
+          {% elif m.quality %}
+            <div class="badge">{{ m.quality }}</div>
           {% endif %}
           <div class="movie-info">
             <h3 class="movie-title" title="{{ m.title }}">{{ m.title }}</h3>
-            <div class="movie-year">{{ m.year }}</div>
+            <div class="movie-year">{{ m.year or '' }}</div>
           </div>
         </a>
-        {% endfor %}
-      </div>
+      {% if loop.last %}</div>{% endif %}
+    {% else %}
+      {% if not (stream_status and stream_status.incomplete) %}
+      <p style="text-align:center; color:#999; margin-top: 40px;">No content found in this category.</p>
+      {% endif %}
+    {% endfor %}
+    {% if stream_status and stream_status.incomplete %}
+      <p style="text-align:center; color:#999; margin-top: 40px;">Some titles couldn't be loaded right now. Please refresh the page.</p>
+    {% endif %}
+    {% if pagination and pagination.pages > 1 %}
+    <div class="category-header">
+      {% if pagination.prev %}<a href="{{ pagination.prev }}" class="see-all-btn">&larr; Previous</a>{% else %}<span></span>{% endif %}
+      <span style="color:#999;">Page {{ pagination.page }} of {{ pagination.pages }}</span>
+      {% if pagination.next %}<a href="{{ pagination.next }}" class="see-all-btn">Next &rarr;</a>{% else %}<span></span>{% endif %}
+    </div>
     {% endif %}
   {% else %} {# Original home page sections #}
     {% if query %}
@@ -522,12 +1405,14 @@ index_html = """
                 <span class="movie-top-title" title="{{ m.title }}">{{ m.title }}</span>
             </div>
       
-            {% if m.quality %}
-              <div class="badge {% if m.quality == 'TRENDING' %}trending{% endif %}">{{ m.quality }}</div>
+            {% if m.is_trending or m.trending_auto or m.quality == 'TRENDING' %}
+              <div class="badge trending">TRENDING</div>
+            {% elif m.quality %}
+              <div class="badge">{{ m.quality }}</div>
             {% endif %}
             <div class="movie-info">
               <h3 class="movie-title" title="{{ m.title }}">{{ m.title }}</h3>
-              <div class="movie-year">{{ m.year }}</div>
+              <div class="movie-year">{{ m.year or '' }}</div>
             </div>
           </a>
           {% endfor %}
@@ -563,12 +1448,14 @@ index_html = """
                 <span class="movie-top-title" title="{{ m.title }}">{{ m.title }}</span>
             </div>
       
-            {% if m.quality %}
-              <div class="badge {% if m.quality == 'TRENDING' %}trending{% endif %}">{{ m.quality }}</div>
+            {% if m.is_trending or m.trending_auto or m.quality == 'TRENDING' %}
+              <div class="badge trending">TRENDING</div>
+            {% elif m.quality %}
+              <div class="badge">{{ m.quality }}</div>
             {% endif %}
             <div class="movie-info">
               <h3 class="movie-title" title="{{ m.title }}">{{ m.title }}</h3>
-              <div class="movie-year">{{ m.year }}</div>
+              <div class="movie-year">{{ m.year or '' }}</div>
             </div>
           </a>
           {% endfor %}
@@ -604,12 +1491,14 @@ index_html = """
                 <span class="movie-top-title" title="{{ m.title }}">{{ m.title }}</span>
             </div>
       
-            {% if m.quality %}
-              <div class="badge {% if m.quality == 'TRENDING' %}trending{% endif %}">{{ m.quality }}</div>
+            {% if m.is_trending or m.trending_auto or m.quality == 'TRENDING' %}
+              <div class="badge trending">TRENDING</div>
+            {% elif m.quality %}
+              <div class="badge">{{ m.quality }}</div>
             {% endif %}
             <div class="movie-info">
               <h3 class="movie-title" title="{{ m.title }}">{{ m.title }}</h3>
-              <div class="movie-year">{{ m.year }}</div>
+              <div class="movie-year">{{ m.year or '' }}</div>
             </div>
           </a>
           {% endfor %}
@@ -645,12 +1534,14 @@ index_html = """
                 <span class="movie-top-title" title="{{ m.title }}">{{ m.title }}</span>
             </div>
       
-            {% if m.quality %}
-              <div class="badge {% if m.quality == 'TRENDING' %}trending{% endif %}">{{ m.quality }}</div>
+            {% if m.is_trending or m.trending_auto or m.quality == 'TRENDING' %}
+              <div class="badge trending">TRENDING</div>
+            {% elif m.quality %}
+              <div class="badge">{{ m.quality }}</div>
             {% endif %}
             <div class="movie-info">
               <h3 class="movie-title" title="{{ m.title }}">{{ m.title }}</h3>
-              <div class="movie-year">{{ m.year }}</div>
+              <div class="movie-year">{{ m.year or '' }}</div>
             </div>
           </a>
           {% endfor %}
@@ -680,12 +1571,14 @@ index_html = """
                 <span class="movie-top-title" title="{{ m.title }}">{{ m.title }}</span>
             </div>
       
-            {% if m.quality %}
-              <div class="badge {% if m.quality == 'TRENDING' %}trending{% endif %}">{{ m.quality }}</div>
+            {% if m.is_trending or m.trending_auto or m.quality == 'TRENDING' %}
+              <div class="badge trending">TRENDING</div>
+            {% elif m.quality %}
+              <div class="badge">{{ m.quality }}</div>
             {% endif %}
             <div class="movie-info">
               <h3 class="movie-title" title="{{ m.title }}">{{ m.title }}</h3>
-              <div class="movie-year">{{ m.year }}</div>
+              <div class="movie-year">{{ m.year or '' }}</div>
             </div>
           </a>
           {% endfor %}
@@ -852,6 +1745,9 @@ detail_html = """
   .detail-meta strong {
       color: #fff;
   }
+  .detail-meta a:hover {
+      color: #1db954;
+  }
 
   .detail-overview {
     font-size: 17px;
@@ -930,6 +1826,51 @@ detail_html = """
       border-radius: 8px;
   }
 
+  .related-section {
+    margin-top: 30px;
+  }
+  .related-section h3 {
+    font-size: 22px;
+    margin-bottom: 15px;
+  }
+  .related-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fill, minmax(130px, 1fr));
+    gap: 15px;
+  }
+  .related-card {
+    background: #181818;
+    border-radius: 8px;
+    overflow: hidden;
+    display: flex;
+    flex-direction: column;
+  }
+  .related-card img, .related-no-image {
+    width: 100%;
+    height: 195px;
+    object-fit: cover;
+  }
+  .related-no-image {
+    background: #333;
+    color: #777;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+  }
+  .related-title {
+    padding: 8px 8px 0;
+    font-size: 14px;
+    font-weight: 600;
+    white-space: nowrap;
+    overflow: hidden;
+    text-overflow: ellipsis;
+  }
+  .related-year {
+    padding: 2px 8px 8px;
+    font-size: 12px;
+    color: #999;
+  }
+
 
   /* Responsive Adjustments for Detail Page */
   @media (min-width: 769px) {
@@ -1014,19 +1955,21 @@ detail_html = """
             {% endif %}
             {% if movie.is_coming_soon %}
                 <div class="coming-soon-badge">COMING SOON</div>
+            {% elif movie.is_trending or movie.quality == 'TRENDING' %}
+              <div class="badge trending">TRENDING</div>
             {% elif movie.quality %}
-              <div class="badge {% if movie.quality == 'TRENDING' %}trending{% endif %}">{{ movie.quality }}</div>
+              <div class="badge">{{ movie.quality }}</div>
             {% endif %}
         </div>
         <div class="detail-info">
           <h2 class="detail-title">{{ movie.title }}</h2>
           <div class="detail-meta">
-              {% if movie.release_date %}<span><strong>Release:</strong> {{ movie.release_date }}</span>{% endif %}
+              {% if movie.release_date %}<span><strong>Release:</strong> {{ movie.release_date | format_date }}</span>{% endif %}
               {% if movie.vote_average %}<span><strong>Rating:</strong> {{ "%.1f"|format(movie.vote_average) }}/10 <i class="fas fa-star" style="color:#FFD700;"></i></span>{% endif %}
-              {% if movie.original_language %}<span><strong>Language:</strong> {{ movie.original_language | upper }}</span>{% endif %}
-              {% if movie.genres %}<span><strong>Genres:</strong> {{ movie.genres | join(', ') }}</span>{% endif %}
+              {% if movie.original_language %}<span><strong>Language:</strong> {% if movie.original_language != 'N/A' %}<a href="{{ url_for('language', code=movie.original_language | lower) }}">{{ movie.original_language | upper }}</a>{% else %}{{ movie.original_language }}{% endif %}</span>{% endif %}
+              {% if movie.genres %}<span><strong>Genres:</strong> {% for g in movie.genres %}<a href="{{ url_for('genre', name=g) }}">{{ g }}</a>{% if not loop.last %}, {% endif %}{% endfor %}</span>{% endif %}
           </div>
-          <p class="detail-overview">{{ movie.overview }}</p>
+          <p class="detail-overview">{{ movie.overview or 'No overview available.' }}</p>
         </div>
     </div>
     
@@ -1036,27 +1979,28 @@ detail_html = """
         {% if movie.links and movie.links|length > 0 %}
           {% for link_item in movie.links %}
           <div class="download-item">
-            <p class="download-quality-info">({{ link_item.quality }}) [{{ link_item.size }}]</p>
+            <p class="download-quality-info">({{ link_item.quality }}) [{{ link_item | link_size }}]</p>
             <div class="download-button-wrapper">
-              <a class="download-button" href="{{ link_item.url }}" target="_blank" rel="noopener">Download</a>
+              <a class="download-button" href="{{ url_for('download', movie_id=movie._id, quality=link_item.quality) }}" target="_blank" rel="noopener">Download</a>
             </div>
           </div>
           {% endfor %}
         {% else %}
           <p class="no-link-message">No download links available yet.</p>
         {% endif %}
-      {% elif movie.type == 'series' and movie.episodes and movie.episodes|length > 0 %}
+      {% elif movie.type == 'series' and episodes and episodes|length > 0 %}
         <h3>Episodes</h3>
-        {% for episode in movie.episodes | sort(attribute='episode_number') %}
+        {# episodes holds one page, already sorted by season and episode number #}
+        {% for episode in episodes %}
         <div class="download-item" style="border-top: 1px solid #333; padding-top: 15px; margin-top: 15px;">
-          <h4 style="color: #1db954; font-size: 20px; margin-bottom: 10px;">Episode {{ episode.episode_number }}: {{ episode.title }}</h4>
+          <h4 style="color: #1db954; font-size: 20px; margin-bottom: 10px;">{% if episode.season and episode.season != 1 %}Season {{ episode.season }} - {% endif %}Episode {{ episode.episode_number }}: {{ episode.title }}</h4>
           {% if episode.overview %}
             <p style="color: #ccc; font-size: 15px; margin-bottom: 10px;">{{ episode.overview }}</p>
           {% endif %}
           {% if episode.links and episode.links|length > 0 %}
             {% for link_item in episode.links %}
             <div class="download-button-wrapper" style="margin-bottom: 10px;">
-              <a class="download-button" href="{{ link_item.url }}" target="_blank" rel="noopener">Download ({{ link_item.quality }}) [{{ link_item.size }}]</a>
+              <a class="download-button" href="{{ url_for('download_episode', movie_id=movie._id, season=episode.season or 1, episode=episode.episode_number, quality=link_item.quality) }}" target="_blank" rel="noopener">Download ({{ link_item.quality }}) [{{ link_item | link_size }}]</a>
             </div>
             {% endfor %}
           {% else %}
@@ -1064,11 +2008,41 @@ detail_html = """
           {% endif %}
         </div>
         {% endfor %}
+        {% if episode_pages > 1 %}
+        <div class="episode-pagination" style="display:flex; justify-content:space-between; align-items:center; margin-top: 20px;">
+          {% if episode_page > 1 %}
+            <a class="download-button" href="{{ url_for('movie_detail', movie_id=movie._id, page=episode_page - 1) }}">&larr; Previous</a>
+          {% else %}<span></span>{% endif %}
+          <span style="color:#999;">Page {{ episode_page }} of {{ episode_pages }}</span>
+          {% if episode_page < episode_pages %}
+            <a class="download-button" href="{{ url_for('movie_detail', movie_id=movie._id, page=episode_page + 1) }}">Next &rarr;</a>
+          {% else %}<span></span>{% endif %}
+        </div>
+        {% endif %}
       {% else %}
         <p class="no-link-message">No download links or episodes available yet for this content type.</p>
       {% endif %}
     </div>
 
+    {% if related_titles %}
+    <div class="related-section">
+      <h3>More Like This</h3>
+      <div class="related-grid">
+        {% for m in related_titles %}
+        <a href="{{ url_for('movie_detail', movie_id=m._id) }}" class="related-card">
+          {% if m.poster %}
+            <img src="{{ m.poster }}" alt="{{ m.title }}" loading="lazy">
+          {% else %}
+            <div class="related-no-image">No Image</div>
+          {% endif %}
+          <span class="related-title" title="{{ m.title }}">{{ m.title }}</span>
+          <span class="related-year">{{ m.year or '' }}</span>
+        </a>
+        {% endfor %}
+      </div>
+    </div>
+    {% endif %}
+
   </div>
   {% else %}
     <p style="text-align:center; color:#999; margin-top: 40px;">Movie not found.</p>
@@ -1195,6 +2169,14 @@ admin_html = """
         display: flex;
         gap: 5px;
     }
+    .dead-links-badge {
+        background: #e44d26;
+        color: #fff;
+        font-size: 12px;
+        padding: 2px 6px;
+        border-radius: 4px;
+        white-space: nowrap;
+    }
     .delete-btn {
         background: #e44d26;
         color: #fff;
@@ -1225,6 +2207,21 @@ admin_html = """
     .edit-btn:hover {
         background: #0056b3;
     }
+    form.bulk-form {
+        max-width: none;
+        border: none;
+        padding: 0;
+        margin-bottom: 0;
+    }
+    .bulk-toolbar {
+        display: flex;
+        gap: 10px;
+        align-items: center;
+    }
+    .bulk-toolbar select, .bulk-toolbar input[type="text"], .bulk-toolbar button {
+        width: auto;
+        margin-bottom: 0;
+    }
     .movie-list-container {
         max-width: 800px;
         margin-top: 40px;
@@ -1251,6 +2248,8 @@ admin_html = """
         </select>
     </div>
 
+    {% include "tmdb_picker.html" %}
+
     <div class="form-group" id="movie_download_links_group"> {# Group for movie links #}
         <label>Download Links (only paste URL):</label>
         <div class="link-input-group">
@@ -1308,12 +2307,17 @@ admin_html = """
 
     <div class="form-group">
         <label for="year">Release Year (Optional - used if TMDb info not found):</label>
-        <input type="text" name="year" id="year" placeholder="e.g., 2023" />
+        <input type="number" name="year" id="year" min="1870" max="2100" placeholder="e.g., 2023" />
+    </div>
+
+    <div class="form-group">
+        <label for="release_date">Release Date (Optional - used if TMDb info not found):</label>
+        <input type="date" name="release_date" id="release_date" />
     </div>
 
     <div class="form-group">
         <label for="original_language">Original Language (Optional - used if TMDb info not found):</label>
-        <input type="text" name="original_language" id="original_language" placeholder="e.g., Bengali, English" />
+        <input type="text" name="original_language" id="original_language" placeholder="Language code, e.g., en, bn" />
     </div>
 
     <div class="form-group">
@@ -1333,38 +2337,78 @@ admin_html = """
     <button type="submit">Search</button>
   </form>
 
+  <h2 style="margin-top: 40px;">Export Catalog</h2>
+  <form method="GET" action="{{ url_for('admin_export') }}">
+    <div class="form-group">
+      <label for="export_type">Type:</label>
+      <select name="type" id="export_type">
+        <option value="">All</option>
+        <option value="movie">Movies</option>
+        <option value="series">TV/Web Series</option>
+      </select>
+    </div>
+    <div class="form-group">
+      <label for="export_since">Updated since (optional):</label>
+      <input type="date" name="since" id="export_since" />
+    </div>
+    <div class="form-group">
+      <label for="export_format">Format:</label>
+      <select name="format" id="export_format">
+        <option value="jsonl">JSON Lines (.jsonl.gz)</option>
+        <option value="bson">BSON (.bson.gz)</option>
+      </select>
+    </div>
+    <button type="submit">Download Export</button>
+  </form>
+
   <hr>
 
   <h2>Manage Existing Content {% if admin_query %}for "{{ admin_query }}"{% endif %}</h2> {# Updated Heading #}
   <div class="movie-list-container">
     {% if movies %}
+    <form method="post" action="{{ url_for('admin_bulk') }}" class="bulk-form" onsubmit="return confirmBulk()">
+    <div class="bulk-toolbar">
+      <select name="action" id="bulk_action">
+        <option value="">Bulk action for selected...</option>
+        {% for action, label in bulk_actions %}
+        <option value="{{ action }}">{{ label }}</option>
+        {% endfor %}
+      </select>
+      <input type="text" name="value" id="bulk_value" placeholder="Quality / top label" />
+      <button type="submit">Apply</button>
+    </div>
     <table>
       <thead>
         <tr>
+          <th><input type="checkbox" id="select_all" onclick="toggleSelectAll(this)" title="Select all"></th>
           <th>Title</th>
           <th>Type</th>
           <th>Quality</th>
           <th>Trending</th>
           <th>Coming Soon</th>
+          <th>Downloads</th>
           <th>Actions</th>
         </tr>
       </thead>
       <tbody>
         {% for movie in movies %}
         <tr>
-          <td>{{ movie.title }}</td>
+          <td><input type="checkbox" name="ids[]" value="{{ movie._id }}" class="row-select"></td>
+          <td>{{ movie.title }}{% if movie.dead_links %} <span class="dead-links-badge" title="These links failed the last link check">{{ movie.dead_links }} dead link{{ 's' if movie.dead_links > 1 }}</span>{% endif %}</td>
           <td>{{ movie.type | title }}</td>
           <td>{% if movie.quality %}{{ movie.quality }}{% else %}N/A{% endif %}</td> {# Handle cases where quality might be None #}
-          <td>{% if movie.quality == 'TRENDING' %}Yes{% else %}No{% endif %}</td>
+          <td>{% if movie.is_trending or movie.quality == 'TRENDING' %}Yes{% elif movie._id in trending_ranks %}#{{ trending_ranks[movie._id] }} (computed){% else %}No{% endif %}</td>
           <td>{% if movie.is_coming_soon %}Yes{% else %}No{% endif %}</td>
+          <td>{{ download_totals.get(movie._id, 0) }}</td>
           <td class="action-buttons">
             <a href="{{ url_for('edit_movie', movie_id=movie._id) }}" class="edit-btn">Edit</a>
-            <button class="delete-btn" onclick="confirmDelete('{{ movie._id }}', '{{ movie.title }}')">Delete</button>
+            <button type="button" class="delete-btn" onclick="confirmDelete('{{ movie._id }}', '{{ movie.title }}')">Delete</button>
           </td>
         </tr>
         {% endfor %}
       </tbody>
     </table>
+    </form>
     {% else %}
     <p style="text-align:center; color:#999;">No content found in the database.</p>
     {% endif %}
@@ -1377,6 +2421,23 @@ admin_html = """
       }
     }
 
+    function toggleSelectAll(source) {
+      document.querySelectorAll('.row-select').forEach(function(box) { box.checked = source.checked; });
+    }
+
+    function confirmBulk() {
+      var selected = document.querySelectorAll('.row-select:checked').length;
+      var action = document.getElementById('bulk_action').value;
+      if (!action || selected === 0) {
+        alert('Select at least one title and an action.');
+        return false;
+      }
+      if (action === 'delete') {
+        return confirm('Are you sure you want to delete ' + selected + ' selected titles?');
+      }
+      return true;
+    }
+
     function toggleEpisodeFields() {
         var contentType = document.getElementById('content_type').value;
         var episodeFields = document.getElementById('episode_fields');
@@ -1401,6 +2462,7 @@ admin_html = """
         newEpisodeDiv.className = 'episode-item';
         newEpisodeDiv.style.cssText = 'border: 1px solid #444; padding: 10px; margin-bottom: 10px; border-radius: 5px;';
         
+        const episodeSeason = episode.season || 1;
         const episodeNumber = episode.episode_number || '';
         const episodeTitle = episode.title || '';
         const episodeOverview = episode.overview || '';
@@ -1409,6 +2471,10 @@ admin_html = """
         const link1080p = (episode.links && episode.links.find(l => l.quality === '1080p')) ? episode.links.find(l => l.quality === '1080p').url : '';
 
         newEpisodeDiv.innerHTML = `
+            <div class="form-group">
+                <label>Season:</label>
+                <input type="number" name="episode_season[]" value="${episodeSeason}" min="1" required />
+            </div>
             <div class="form-group">
                 <label>Episode Number:</label>
                 <input type="number" name="episode_number[]" value="${episodeNumber}" required />
@@ -1538,6 +2604,8 @@ edit_html = """
   <a href="{{ url_for('admin') }}" class="back-to-admin">&larr; Back to Admin Panel</a>
   <h2>Edit Content: {{ movie.title }}</h2>
   <form method="post">
+    {# Version this form was loaded with; saving fails with a conflict if it changed meanwhile #}
+    <input type="hidden" name="version" value="{{ movie.version or 0 }}" />
     <div class="form-group">
         <label for="title">Movie/Series Title:</label>
         <input type="text" name="title" id="title" placeholder="Movie or Series Title" value="{{ movie.title }}" required />
@@ -1551,6 +2619,8 @@ edit_html = """
         </select>
     </div>
 
+    {% with tmdb_id = movie.tmdb_id %}{% include "tmdb_picker.html" %}{% endwith %}
+
     <div class="form-group" id="movie_download_links_group"> {# Group for movie links #}
         <label>Download Links (only paste URL):</label>
         <div class="link-input-group">
@@ -1571,9 +2641,13 @@ edit_html = """
         <h3>Episodes</h3>
         <div id="episodes_container">
             {# Existing episodes will be loaded here in edit mode #}
-            {% if movie.type == 'series' and movie.episodes %}
-                {% for episode in movie.episodes %}
+            {% if movie.type == 'series' and episodes %}
+                {% for episode in episodes %}
                     <div class="episode-item" style="border: 1px solid #444; padding: 10px; margin-bottom: 10px; border-radius: 5px;">
+                        <div class="form-group">
+                            <label>Season:</label>
+                            <input type="number" name="episode_season[]" value="{{ episode.season or 1 }}" min="1" required />
+                        </div>
                         <div class="form-group">
                             <label>Episode Number:</label>
                             <input type="number" name="episode_number[]" value="{{ episode.episode_number }}" required />
@@ -1609,7 +2683,7 @@ edit_html = """
 
     <div class="form-group">
         <label for="quality">Quality Tag (e.g., HD, Hindi Dubbed):</label>
-        <input type="text" name="quality" id="quality" placeholder="Quality tag" value="{{ movie.quality }}" />
+        <input type="text" name="quality" id="quality" placeholder="Quality tag" value="{{ movie.quality if movie.quality != 'TRENDING' else '' }}" />
     </div>
 
     <div class="form-group">
@@ -1618,7 +2692,7 @@ edit_html = """
     </div>
 
     <div class="form-group">
-        <input type="checkbox" name="is_trending" id="is_trending" value="true" {% if movie.quality == 'TRENDING' %}checked{% endif %}>
+        <input type="checkbox" name="is_trending" id="is_trending" value="true" {% if movie.is_trending or movie.quality == 'TRENDING' %}checked{% endif %}>
         <label for="is_trending" style="display: inline-block;">Is Trending?</label>
     </div>
 
@@ -1629,22 +2703,27 @@ edit_html = """
 
     <div class="form-group">
         <label for="overview">Overview (Optional - used if TMDb info not found):</label>
-        <textarea name="overview" id="overview" rows="5" placeholder="Enter movie/series overview or synopsis">{{ movie.overview }}</textarea>
+        <textarea name="overview" id="overview" rows="5" placeholder="Enter movie/series overview or synopsis">{{ movie.overview if movie.overview not in (None, 'No overview available.') else '' }}</textarea>
     </div>
 
     <div class="form-group">
         <label for="poster_url">Poster URL (Optional - direct image link, used if TMDb info not found):</label>
-        <input type="url" name="poster_url" id="poster_url" placeholder="e.g., https://example.com/poster.jpg" value="{{ movie.poster }}" />
+        <input type="url" name="poster_url" id="poster_url" placeholder="e.g., https://example.com/poster.jpg" value="{{ movie.poster or '' }}" />
     </div>
 
     <div class="form-group">
         <label for="year">Release Year (Optional - used if TMDb info not found):</label>
-        <input type="text" name="year" id="year" placeholder="e.g., 2023" value="{{ movie.year }}" />
+        <input type="number" name="year" id="year" min="1870" max="2100" placeholder="e.g., 2023" value="{{ movie.year if movie.year not in (None, 'N/A') else '' }}" />
+    </div>
+
+    <div class="form-group">
+        <label for="release_date">Release Date (Optional - used if TMDb info not found):</label>
+        <input type="date" name="release_date" id="release_date" value="{{ movie.release_date | format_date }}" />
     </div>
 
     <div class="form-group">
         <label for="original_language">Original Language (Optional - used if TMDb info not found):</label>
-        <input type="text" name="original_language" id="original_language" placeholder="e.g., Bengali, English" value="{{ movie.original_language }}" />
+        <input type="text" name="original_language" id="original_language" placeholder="Language code, e.g., en, bn" value="{{ movie.original_language if movie.original_language not in (None, 'N/A') else '' }}" />
     </div>
 
     <div class="form-group">
@@ -1679,6 +2758,7 @@ edit_html = """
         newEpisodeDiv.className = 'episode-item';
         newEpisodeDiv.style.cssText = 'border: 1px solid #444; padding: 10px; margin-bottom: 10px; border-radius: 5px;';
         
+        const episodeSeason = episode.season || 1;
         const episodeNumber = episode.episode_number || '';
         const episodeTitle = episode.title || '';
         const episodeOverview = episode.overview || '';
@@ -1687,6 +2767,10 @@ edit_html = """
         const link1080p = (episode.links && episode.links.find(l => l.quality === '1080p')) ? episode.links.find(l => l.quality === '1080p').url : '';
 
         newEpisodeDiv.innerHTML = `
+            <div class="form-group">
+                <label>Season:</label>
+                <input type="number" name="episode_season[]" value="${episodeSeason}" min="1" required />
+            </div>
             <div class="form-group">
                 <label>Episode Number:</label>
                 <input type="number" name="episode_number[]" value="${episodeNumber}" required />
@@ -1738,154 +2822,519 @@ edit_html = """
 # --- END OF edit_html TEMPLATE ---
 
 
+# --- START OF sitemap/feed XML TEMPLATES ---
+sitemap_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+{%- for endpoint in pages %}
+  <url><loc>{{ absolute_url(endpoint) }}</loc></url>
+{%- endfor %}
+{%- for movie_id, modified in titles %}
+  <url><loc>{{ absolute_url('movie_detail', movie_id=movie_id) }}</loc><lastmod>{{ format_lastmod(modified) }}</lastmod></url>
+{%- endfor %}
+</urlset>
+"""
+
+sitemap_index_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>{{ absolute_url('sitemap_pages') }}</loc></sitemap>
+{%- for shard, modified in shards %}
+  <sitemap><loc>{{ absolute_url('sitemap_shard', shard=shard) }}</loc>{% if modified %}<lastmod>{{ format_lastmod(modified) }}</lastmod>{% endif %}</sitemap>
+{%- endfor %}
+</sitemapindex>
+"""
+
+rss_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">
+  <channel>
+    <title>MovieZone - {{ feed_title }}</title>
+    <link>{{ absolute_url('home') }}</link>
+    <atom:link href="{{ absolute_url('feed', kind=kind, feed_format=feed_format) }}" rel="self" type="application/rss+xml" />
+    <description>{{ feed_title }} on MovieZone</description>
+    <lastBuildDate>{{ format_lastmod(updated, rfc822=True) }}</lastBuildDate>
+{%- for m in items %}
+    <item>
+      <title>{{ m.title }}{% if m.year and m.year != 'N/A' %} ({{ m.year }}){% endif %}</title>
+      <link>{{ absolute_url('movie_detail', movie_id=m._id) }}</link>
+      <guid isPermaLink="true">{{ absolute_url('movie_detail', movie_id=m._id) }}</guid>
+      <description>{{ m.overview or '' }}</description>
+      <pubDate>{{ format_lastmod(m.published, rfc822=True) }}</pubDate>
+    </item>
+{%- endfor %}
+  </channel>
+</rss>
+"""
+
+atom_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>MovieZone - {{ feed_title }}</title>
+  <id>{{ absolute_url('feed', kind=kind, feed_format=feed_format) }}</id>
+  <link href="{{ absolute_url('feed', kind=kind, feed_format=feed_format) }}" rel="self" />
+  <link href="{{ absolute_url('home') }}" />
+  <updated>{{ format_lastmod(updated) }}</updated>
+{%- for m in items %}
+  <entry>
+    <title>{{ m.title }}{% if m.year and m.year != 'N/A' %} ({{ m.year }}){% endif %}</title>
+    <id>{{ absolute_url('movie_detail', movie_id=m._id) }}</id>
+    <link href="{{ absolute_url('movie_detail', movie_id=m._id) }}" />
+    <published>{{ format_lastmod(m.published) }}</published>
+    <updated>{{ format_lastmod(m.lastmod) }}</updated>
+    <summary>{{ m.overview or '' }}</summary>
+  </entry>
+{%- endfor %}
+</feed>
+"""
+# --- END OF sitemap/feed XML TEMPLATES ---
+
+
+# --- START OF bulk_result_html TEMPLATE ---
+bulk_result_html = """
+<!DOCTYPE html>
+<html>
+<head>
+  <title>Bulk Action Results - MovieZone</title>
+  <style>
+    body { font-family: Arial, sans-serif; background: #121212; color: #eee; padding: 20px; }
+    table { width: 100%; max-width: 800px; border-collapse: collapse; margin: 20px 0; }
+    th, td { padding: 10px; text-align: left; border-bottom: 1px solid #333; }
+    th { background: #282828; }
+    td { background: #181818; }
+    .status-ok { color: #1db954; }
+    .status-failed { color: #e44d26; }
+    a { color: #1db954; font-weight: bold; text-decoration: none; }
+    a:hover { text-decoration: underline; }
+  </style>
+</head>
+<body>
+  <a href="{{ url_for('admin') }}">&larr; Back to Admin Panel</a>
+  <h2>{{ label }}{% if value %}: "{{ value }}"{% endif %}</h2>
+  <table>
+    <thead>
+      <tr><th>Title</th><th>Result</th></tr>
+    </thead>
+    <tbody>
+      {% for item in results %}
+      <tr>
+        <td>{{ item.title }}</td>
+        <td class="{% if item.status in ('updated', 'deleted') %}status-ok{% else %}status-failed{% endif %}">{{ item.status }}</td>
+      </tr>
+      {% endfor %}
+    </tbody>
+  </table>
+</body>
+</html>
+"""
+# --- END OF bulk_result_html TEMPLATE ---
+
+
+# --- START OF conflict_html TEMPLATE ---
+conflict_html = """
+<!DOCTYPE html>
+<html>
+<head>
+  <title>Edit Conflict - MovieZone</title>
+  <style>
+    body { font-family: Arial, sans-serif; background: #121212; color: #eee; padding: 20px; }
+    .conflict-box { max-width: 600px; border: 1px solid #e44d26; padding: 20px; border-radius: 8px; background: #181818; }
+    h2 { color: #e44d26; margin-top: 0; }
+    a { color: #1db954; font-weight: bold; text-decoration: none; margin-right: 20px; }
+    a:hover { text-decoration: underline; }
+  </style>
+</head>
+<body>
+  <div class="conflict-box">
+    <h2>Edit Conflict</h2>
+    <p>"{{ movie.title }}" was changed by someone else after you opened the edit form
+       (your form: version {{ loaded_version }}, saved: version {{ movie.version or 0 }}).
+       Your changes were <strong>not</strong> saved.</p>
+    <p>Open the edit form again to see the latest version, then re-apply your changes.</p>
+    <a href="{{ url_for('edit_movie', movie_id=movie._id) }}">Reload Edit Form</a>
+    <a href="{{ url_for('admin') }}">Back to Admin Panel</a>
+  </div>
+</body>
+</html>
+"""
+# --- END OF conflict_html TEMPLATE ---
+
+
+# --- START OF tmdb_picker_html TEMPLATE ---
+# Included in the add and edit forms after the title and content type fields
+tmdb_picker_html = """
+<style>
+  .tmdb-candidates { list-style: none; padding: 0; margin: 0 0 10px; max-height: 400px; overflow-y: auto; border: 1px solid #333; border-radius: 5px; }
+  .tmdb-candidates:empty { display: none; }
+  .tmdb-candidates li { display: flex; gap: 10px; padding: 8px; cursor: pointer; border-bottom: 1px solid #333; background: #222; }
+  .tmdb-candidates li:hover { background: #2a2a2a; }
+  .tmdb-candidates img, .tmdb-candidates .no-poster { width: 46px; height: 69px; object-fit: cover; border-radius: 3px; background: #333; flex-shrink: 0; }
+  .tmdb-candidates p { margin: 4px 0 0; font-size: 13px; color: #aaa; }
+  .tmdb-selected { font-size: 14px; color: #1db954; margin-bottom: 10px; }
+  .tmdb-selected button { width: auto; padding: 2px 8px; margin: 0 0 0 8px; font-size: 12px; }
+</style>
+<div class="form-group">
+    <label>TMDb Match (pick the exact title; empty fields are filled from it on save):</label>
+    <input type="hidden" name="tmdb_id" id="tmdb_id" value="{{ tmdb_id or '' }}" />
+    <div class="tmdb-selected" id="tmdb_selected"></div>
+    <ul class="tmdb-candidates" id="tmdb_candidates"></ul>
+</div>
+<script>
+  (function () {
+    const titleInput = document.getElementById('title');
+    const typeSelect = document.getElementById('content_type');
+    const idInput = document.getElementById('tmdb_id');
+    const selected = document.getElementById('tmdb_selected');
+    const list = document.getElementById('tmdb_candidates');
+    let timer = null;
+    let latest = 0;
+
+    function showSelected(text) {
+      selected.textContent = text;
+      if (text) {
+        const clear = document.createElement('button');
+        clear.type = 'button';
+        clear.textContent = 'Clear';
+        clear.onclick = function () { idInput.value = ''; showSelected(''); };
+        selected.appendChild(clear);
+      }
+    }
+
+    function describe(c) {
+      return c.title + (c.year ? ' (' + c.year + ')' : '') + ' - TMDb #' + c.tmdb_id;
+    }
+
+    function pick(c) {
+      idInput.value = c.tmdb_id;
+      showSelected('Selected: ' + describe(c));
+      list.innerHTML = '';
+      // Caches the detail on the server, so saving the form doesn't wait for TMDb
+      fetch('{{ url_for("admin_tmdb_detail") }}?type=' + encodeURIComponent(typeSelect.value) + '&id=' + c.tmdb_id);
+    }
+
+    function search() {
+      const query = titleInput.value.trim();
+      const request = ++latest;
+      if (query.length < 2) { list.innerHTML = ''; return; }
+      fetch('{{ url_for("admin_tmdb_search") }}?type=' + encodeURIComponent(typeSelect.value) + '&q=' + encodeURIComponent(query))
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          if (request !== latest) return; // A newer search has been sent since
+          list.innerHTML = '';
+          (data.results || []).forEach(function (c) {
+            const item = document.createElement('li');
+            const poster = document.createElement(c.poster ? 'img' : 'div');
+            if (c.poster) { poster.src = c.poster; poster.loading = 'lazy'; } else { poster.className = 'no-poster'; }
+            const text = document.createElement('div');
+            const heading = document.createElement('strong');
+            heading.textContent = describe(c);
+            const overview = document.createElement('p');
+            overview.textContent = c.overview;
+            text.appendChild(heading);
+            text.appendChild(overview);
+            item.appendChild(poster);
+            item.appendChild(text);
+            item.onclick = function () { pick(c); };
+            list.appendChild(item);
+          });
+        })
+        .catch(function () {});
+    }
+
+    if (idInput.value) showSelected('Selected: TMDb #' + idInput.value);
+    titleInput.addEventListener('input', function () { clearTimeout(timer); timer = setTimeout(search, 300); });
+    typeSelect.addEventListener('change', search);
+  })();
+</script>
+"""
+# --- END OF tmdb_picker_html TEMPLATE ---
+
+# The template strings above are served by name through Jinja's loader, so each one is
+# compiled on first use (or in compile_templates) and then reused for every request.
+TEMPLATES = {
+    "index.html": index_html,
+    "detail.html": detail_html,
+    "admin.html": admin_html,
+    "edit.html": edit_html,
+    "bulk_result.html": bulk_result_html,
+    "conflict.html": conflict_html,
+    "tmdb_picker.html": tmdb_picker_html,
+    "sitemap.xml": sitemap_xml,
+    "sitemap_index.xml": sitemap_index_xml,
+    "rss.xml": rss_xml,
+    "atom.xml": atom_xml
+}
+app.jinja_loader = DictLoader(TEMPLATES)
+app.add_template_filter(format_date)
+app.add_template_filter(link_size)
+app.add_template_global(absolute_url)
+
+# --- Startup: application factory, warm-up and health checks ---
+startup = {"import_seconds": None, "warm_up_seconds": None, "first_request_seconds": None}
+
+def compile_templates():
+    for name in TEMPLATES:
+        app.jinja_env.get_template(name)
+
+def warm_up():
+    """Does the deferred startup work now instead of on the first requests."""
+    started = time.perf_counter()
+    compile_templates()
+    get_client().admin.command("ping")
+    print("Successfully connected to MongoDB!")
+    startup["warm_up_seconds"] = time.perf_counter() - started
+
+def create_app(warm=False):
+    """Application factory: checks the configuration and returns the Flask app.
+
+    Nothing connects or compiles until first use unless `warm` is set.
+    """
+    check_config()
+    if warm:
+        warm_up()
+    return app
+
+@app.before_request
+def record_first_request():
+    if startup["first_request_seconds"] is None:
+        startup["first_request_seconds"] = time.perf_counter() - IMPORT_STARTED
+        print(f"Cold start: bot.py imported in {startup['import_seconds']:.3f}s, "
+              f"first request {startup['first_request_seconds']:.3f}s after import began.")
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return "ok"
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: MongoDB answers a ping within READYZ_TIMEOUT seconds."""
+    status = {"startup": startup, "title_search": title_search.ready,
+              "catalog_mirror": catalog_mirror.ready if CATALOG_MIRROR else None}
+    try:
+        with pymongo.timeout(READYZ_TIMEOUT):
+            get_client().admin.command("ping")
+        status["mongo"] = "ok"
+        return jsonify(status)
+    except Exception as e:
+        status["mongo"] = f"error: {e}"
+        return jsonify(status), 503
+
+
 @app.route('/')
+@serve_stale_on_db_error
 def home():
     query = request.args.get('q')
-    
-    movies_list = []
-    trending_movies_list = []
-    latest_movies_list = []
-    latest_series_list = []
-    coming_soon_movies_list = []
+    if query:
+        # Ranked, typo-tolerant search (see title_search.py); search results are shown vertically too
+        return stream_list_page(None, iter_search_results(query), query=query)
+    return cached_page("home", render_home)[0]
 
-    # is_full_page_list = False for the homepage
-    is_full_page_list = False
+def render_home():
+    """Homepage shelves; returns (html, doc_ids shown, shelves listed)."""
+    # Fetch data for each category on the homepage with a limit of 6
+    # Trending (pinned with is_trending, then the computed ranking)
+    trending_movies_list = shelf_list("trending", HOME_SHELF_LIMIT)
 
-    if query:
-        # Search functionality remains the same
-        result = movies.find({"title": {"$regex": query, "$options": "i"}})
-        movies_list = list(result)
-        is_full_page_list = True # Search results should also be vertical
-    else:
-        # Fetch data for each category on the homepage with a limit of 6
-        # Trending (quality == 'TRENDING')
-        trending_movies_result = movies.find({"quality": "TRENDING"}).sort('_id', -1).limit(6)
-        trending_movies_list = list(trending_movies_result)
-
-        # Latest Movies (type == 'movie', not trending, not coming soon)
-        latest_movies_result = movies.find({
-            "type": "movie",
-            "quality": {"$ne": "TRENDING"},
-            "is_coming_soon": {"$ne": True}
-        }).sort('_id', -1).limit(6)
-        latest_movies_list = list(latest_movies_result)
-
-        # Latest Web Series (type == 'series', not trending, not coming soon)
-        latest_series_result = movies.find({
-            "type": "series",
-            "quality": {"$ne": "TRENDING"},
-            "is_coming_soon": {"$ne": True}
-        }).sort('_id', -1).limit(6)
-        latest_series_list = list(latest_series_result)
-
-        # Coming Soon (is_coming_soon == True)
-        coming_soon_result = movies.find({"is_coming_soon": True}).sort('_id', -1).limit(6)
-        coming_soon_movies_list = list(coming_soon_result)
-
-    # Convert ObjectIds to strings for all fetched lists
-    for m in movies_list + trending_movies_list + latest_movies_list + latest_series_list + coming_soon_movies_list:
-        m['_id'] = str(m['_id']) 
-
-    return render_template_string(
-        index_html, 
-        movies=movies_list, # Only used for search results or full page lists
-        query=query,
+    # Latest Movies (type == 'movie', not trending, not coming soon)
+    latest_movies_list = shelf_list("movies", HOME_SHELF_LIMIT)
+
+    # Latest Web Series (type == 'series', not trending, not coming soon)
+    latest_series_list = shelf_list("series", HOME_SHELF_LIMIT)
+
+    # Coming Soon (is_coming_soon == True)
+    coming_soon_movies_list = shelf_list("coming_soon", HOME_SHELF_LIMIT)
+
+    html = render_template(
+        "index.html",
+        movies=[], # Only used for search results or full page lists
+        query=None,
         trending_movies=trending_movies_list,
         latest_movies=latest_movies_list,
         latest_series=latest_series_list,
         coming_soon_movies=coming_soon_movies_list,
-        is_full_page_list=is_full_page_list # Pass this flag to the template
+        is_full_page_list=False # Pass this flag to the template
     )
+    shown = trending_movies_list + latest_movies_list + latest_series_list + coming_soon_movies_list
+    return html, [m['_id'] for m in shown], SHELVES
 
 @app.route('/movie/<movie_id>')
+@serve_stale_on_db_error
 def movie_detail(movie_id):
+    episode_page = request.args.get('page', 1, type=int)
     try:
-        movie = movies.find_one({"_id": ObjectId(movie_id)})
-        if movie:
-            movie['_id'] = str(movie['_id'])
-            
-            # Fetch additional details from TMDb if API key is available
-            # Only fetch if tmdb_id is not already present or if the existing poster/overview are default values.
-            # AND if it's a movie (TMDb episode details are more complex)
-            should_fetch_tmdb = TMDB_API_KEY and (not movie.get("tmdb_id") or movie.get("overview") == "No overview available." or not movie.get("poster")) and movie.get("type") == "movie"
-
-            if should_fetch_tmdb:
-                tmdb_id = movie.get("tmdb_id") 
-                
-                # If TMDb ID is not stored, search by title first
-                if not tmdb_id:
-                    # Decide whether to search as movie or tv based on 'type' field
-                    tmdb_search_type = "movie" if movie.get("type") == "movie" else "tv" # Will only be 'movie' due to should_fetch_tmdb
-                    search_url = f"https://api.themoviedb.org/3/search/{tmdb_search_type}?api_key={TMDB_API_KEY}&query={movie['title']}"
-                    try:
-                        search_res = requests.get(search_url, timeout=5).json()
-                        if search_res and "results" in search_res and search_res["results"]:
-                            tmdb_id = search_res["results"][0].get("id")
-                            # Update the movie in DB with tmdb_id for future faster access
-                            movies.update_one({"_id": ObjectId(movie_id)}, {"$set": {"tmdb_id": tmdb_id}})
-                        else:
-                            print(f"No search results found on TMDb for title: {movie['title']} ({tmdb_search_type})")
-                            tmdb_id = None # Ensure tmdb_id is None if no search results
-                    except requests.exceptions.RequestException as e:
-                        print(f"Error connecting to TMDb API for search '{movie['title']}': {e}")
-                        tmdb_id = None
-                    except Exception as e:
-                        print(f"An unexpected error occurred during TMDb search: {e}")
-                        tmdb_id = None
-
-                # If TMDb ID is found (either from DB or search), fetch full details
-                if tmdb_id:
-                    tmdb_detail_type = "movie" # Always movie if should_fetch_tmdb is true
-                    tmdb_detail_url = f"https://api.themoviedb.org/3/{tmdb_detail_type}/{tmdb_id}?api_key={TMDB_API_KEY}"
-                    try:
-                        res = requests.get(tmdb_detail_url, timeout=5).json()
-                        if res:
-                            # Only update if TMDb provides a better value AND manual data wasn't provided
-                            if movie.get("overview") == "No overview available." and res.get("overview"):
-                                movie["overview"] = res.get("overview")
-                            if not movie.get("poster") and res.get("poster_path"):
-                                movie["poster"] = f"https://image.tmdb.org/t/p/w500{res['poster_path']}"
-                            
-                            release_date = res.get("release_date") # For movies
-                            if movie.get("year") == "N/A" and release_date:
-                                movie["year"] = release_date[:4]
-                                movie["release_date"] = release_date
-                            
-                            if movie.get("vote_average") is None and res.get("vote_average"):
-                                movie["vote_average"] = res.get("vote_average")
-                            if movie.get("original_language") == "N/A" and res.get("original_language"):
-                                movie["original_language"] = res.get("original_language")
-                            
-                            genres_names = []
-                            for genre_obj in res.get("genres", []):
-                                if isinstance(genre_obj, dict) and genre_obj.get("id") in TMDb_Genre_Map:
-                                    genres_names.append(TMDb_Genre_Map[genre_obj["id"]])
-                            if (not movie.get("genres") or movie["genres"] == []) and genres_names: # Only update if TMDb provides genres and no manual genres
-                                movie["genres"] = genres_names
-
-                            # Persist TMDb fetched data to DB
-                            movies.update_one({"_id": ObjectId(movie_id)}, {"$set": {
-                                "overview": movie["overview"],
-                                "poster": movie["poster"],
-                                "year": movie["year"],
-                                "release_date": movie["release_date"],
-                                "vote_average": movie["vote_average"],
-                                "original_language": movie["original_language"],
-                                "genres": movie["genres"]
-                            }})
-                    except requests.exceptions.RequestException as e:
-                        print(f"Error connecting to TMDb API for detail '{movie_id}': {e}")
-                    except Exception as e:
-                        print(f"An unexpected error occurred while fetching TMDb detail data: {e}")
+        html, cacheable = cached_page(f"movie:{movie_id}:{episode_page}", lambda: render_movie_detail(movie_id, episode_page))
+        # Page 1 of an existing title is always cacheable, so only real titles are counted
+        if episode_page == 1 and cacheable:
+            view_counter.record(ObjectId(movie_id)) # For the computed trending shelf
+        return html
+    except PyMongoError:
+        raise # Handled by serve_stale_on_db_error
+    except Exception as e:
+        print(f"Error fetching movie detail for ID {movie_id}: {e}")
+        return render_template("detail.html", movie=None)
+
+def render_movie_detail(movie_id, episode_page):
+    requested_page = episode_page
+    movie = catalog_mirror.get(movie_id) if catalog_mirror.ready else None
+    if movie is None:
+        movie = public_movies.find_one({"_id": ObjectId(movie_id)})
+    if movie:
+        movie['_id'] = str(movie['_id'])
+
+        # Fetch additional details from TMDb if API key is available
+        # Only fetch if tmdb_id is not already present or if the existing poster/overview are default values.
+        # AND if it's a movie (TMDb episode details are more complex)
+        if should_fetch_tmdb(movie):
+            # The page shows what is stored; the lookup runs in the background (see queue_tmdb_enrichment)
+            queue_tmdb_enrichment(movie_id, dict(movie))
+        else:
+            print("Skipping TMDb API call for movie details (not a movie, no key, or data already present).")
+
+    episodes_list, episode_pages = [], 1
+    if movie and movie.get("type") == "series":
+        episodes_list, episode_page, episode_pages = load_episodes_page(movie, episode_page)
+
+    related_list = load_related(movie) if movie else []
+    html = render_template("detail.html", movie=movie, episodes=episodes_list, episode_page=episode_page, episode_pages=episode_pages,
+                           related_titles=related_list)
+    # Pages for unknown ids aren't cached, nor ?page= values a movie ignores or a series clamps:
+    # each would be another copy of a page already cached under its own ?page=
+    shown_page = episode_page if movie and movie.get("type") == "series" else 1
+    cacheable = movie and shown_page == requested_page
+    return html, [movie_id] + [m["_id"] for m in related_list] if cacheable else None, ()
+
+# TMDb lookups of viewed titles run in a background thread, one title at a time: inside the
+# view they would use up its PUBLIC_DB_DEADLINE while MongoDB is healthy. The lookup's write
+# invalidates the cached page, so the next view shows the TMDb data.
+tmdb_pending = {} # movie_id -> stored movie, queued or being looked up
+tmdb_lock = threading.Lock()
+tmdb_worker = None
+
+def queue_tmdb_enrichment(movie_id, movie):
+    global tmdb_worker
+    with tmdb_lock:
+        tmdb_pending.setdefault(movie_id, movie) # Views of a title already queued share its lookup
+        if tmdb_worker is None:
+            tmdb_worker = threading.Thread(target=run_tmdb_enrichment, daemon=True)
+            tmdb_worker.start()
+
+def run_tmdb_enrichment():
+    """Looks up the queued titles until the queue is empty."""
+    global tmdb_worker
+    while True:
+        with tmdb_lock:
+            if not tmdb_pending:
+                tmdb_worker = None
+                return
+            movie_id, movie = next(iter(tmdb_pending.items()))
+        try:
+            enrich_from_tmdb(movie_id, movie)
+        except Exception as e:
+            print(f"Error enriching movie ID {movie_id} from TMDb: {e}")
+        finally:
+            with tmdb_lock:
+                del tmdb_pending[movie_id]
+
+def enrich_from_tmdb(movie_id, movie):
+    """Fills in `movie` from TMDb, persists the result and returns the updated movie.
+
+    `movie` is what the page showed, possibly from the mirror, a secondary or a while
+    ago: the write only applies if the title still has that version (an admin save
+    in the meantime wins), and only sets the fields TMDb filled in.
+    With SINGLE_FLIGHT_MONGO=1 only one process at a time looks a title up; the
+    others render what is stored and pick up the result on a later view.
+    """
+    owner = f"{NODE_ID}:{os.getpid()}"
+    if SINGLE_FLIGHT_MONGO and not tmdb_lease.acquire(f"tmdb:{movie_id}", owner):
+        print(f"TMDb lookup for '{movie.get('title', movie_id)}' is already running in another process. Skipping.")
+        return movie
+    try:
+        tmdb_id = movie.get("tmdb_id") 
+        changes = {}
+
+        # If TMDb ID is not stored, search by title first
+        if not tmdb_id:
+            try:
+                search_res = tmdb_search(movie['title']) # Only movies are enriched (should_fetch_tmdb)
+                if search_res and "results" in search_res and search_res["results"]:
+                    tmdb_id = search_res["results"][0].get("id")
+                    # Stored with the details below, for future faster access
+                    movie["tmdb_id"] = changes["tmdb_id"] = tmdb_id
                 else:
-                    print(f"TMDb ID not found for movie '{movie.get('title', movie_id)}'. Skipping TMDb detail fetch.")
+                    print(f"No search results found on TMDb for title: {movie['title']} (movie)")
+                    tmdb_id = None # Ensure tmdb_id is None if no search results
+            except requests.exceptions.RequestException as e:
+                print(f"Error connecting to TMDb API for search '{movie['title']}': {e}")
+                tmdb_id = None
+            except Exception as e:
+                print(f"An unexpected error occurred during TMDb search: {e}")
+                tmdb_id = None
+
+        # If TMDb ID is found (either from DB or search), fetch full details
+        if tmdb_id:
+            try:
+                res = tmdb_detail(tmdb_id) # Always a movie if should_fetch_tmdb is true
+                if res and res.get("id"):
+                    changes.update(merge_tmdb_detail(movie, res))
+            except requests.exceptions.RequestException as e:
+                print(f"Error connecting to TMDb API for detail '{movie_id}': {e}")
+            except Exception as e:
+                print(f"An unexpected error occurred while fetching TMDb detail data: {e}")
+        else:
+            print(f"TMDb ID not found for movie '{movie.get('title', movie_id)}'. Skipping TMDb detail fetch.")
+
+        if changes:
+            # Persist TMDb fetched data to DB, unless the title was saved since `movie` was read
+            changes.setdefault("updated_at", datetime.now(timezone.utc))
+            saved = movies.find_one_and_update(
+                {"_id": ObjectId(movie_id), "version": movie.get("version") or {"$in": [None, 0]}},
+                {"$set": changes, "$inc": {"version": 1}},
+                return_document=ReturnDocument.AFTER)
+            if saved:
+                notify_movie_changed(movie_id, saved)
+                movie = dict(saved, _id=movie_id)
             else:
-                print("Skipping TMDb API call for movie details (not a movie, no key, or data already present).")
+                print(f"'{movie.get('title', movie_id)}' changed during its TMDb lookup; it is looked up again on a later view.")
+    finally:
+        if SINGLE_FLIGHT_MONGO:
+            tmdb_lease.release(f"tmdb:{movie_id}", owner)
+    return movie
+
+@app.route('/download/<movie_id>/<quality>')
+def download(movie_id, quality):
+    """Counts a click on a movie's download link and redirects to it."""
+    try:
+        movie = catalog_mirror.get(movie_id) if catalog_mirror.ready else None
+        if movie is None:
+            movie = public_movies.find_one({"_id": ObjectId(movie_id)}, {"links": 1})
+    except Exception as e:
+        print(f"Error looking up download link for ID {movie_id}: {e}")
+        return "Download link not found.", 404
+    return count_and_redirect(movie_id, movie and movie.get("links"), quality)
 
-        return render_template_string(detail_html, movie=movie)
+@app.route('/download/<movie_id>/s<int:season>e<int:episode>/<quality>')
+def download_episode(movie_id, season, episode, quality):
+    """Counts a click on an episode's download link and redirects to it."""
+    try:
+        series_id = ObjectId(movie_id)
+        found = public_episodes.find_one({"series_id": series_id, "season": season, "episode_number": episode}, {"links": 1})
+        if found is None and season == 1:
+            # Episodes saved without a season are shown as season 1
+            found = public_episodes.find_one({"series_id": series_id, "season": {"$exists": False}, "episode_number": episode}, {"links": 1})
+        if found is None:
+            # Series not migrated yet keep their episodes embedded
+            series = public_movies.find_one({"_id": series_id}, {"episodes": 1}) or {}
+            found = next((ep for ep in series.get("episodes") or []
+                          if ep.get("season", 1) == season and ep.get("episode_number") == episode), None)
     except Exception as e:
-        print(f"Error fetching movie detail for ID {movie_id}: {e}")
-        return render_template_string(detail_html, movie=None)
+        print(f"Error looking up episode download link for ID {movie_id}: {e}")
+        return "Download link not found.", 404
+    return count_and_redirect(movie_id, found and found.get("links"), quality, season, episode)
+
+def count_and_redirect(movie_id, links, quality, season=None, episode=None):
+    # Only ever redirect to a link stored on the title, so /download/ can't be used as an open redirect
+    url = next((link.get("url") for link in links or [] if link.get("quality") == quality and link.get("url")), None)
+    if url is None:
+        return "Download link not found.", 404
+    click_counter.record(ObjectId(movie_id), quality, season, episode)
+    return redirect(url)
 
 @app.route('/admin', methods=["GET", "POST"])
 @requires_auth # অথেন্টিকেশন ডেকোরেটর যোগ করা হয়েছে
@@ -1898,7 +3347,8 @@ def admin():
         # Get manual inputs
         manual_overview = request.form.get("overview")
         manual_poster_url = request.form.get("poster_url")
-        manual_year = request.form.get("year")
+        manual_year = parse_year(request.form.get("year"))
+        manual_release_date = parse_release_date(request.form.get("release_date"))
         manual_original_language = request.form.get("original_language")
         manual_genres_str = request.form.get("genres")
         manual_top_label = request.form.get("top_label") # Get custom top label
@@ -1908,107 +3358,53 @@ def admin():
         # Process manual genres (comma-separated string to list)
         manual_genres_list = [g.strip() for g in manual_genres_str.split(',') if g.strip()] if manual_genres_str else []
 
-        # If is_trending is true, force quality to 'TRENDING'
-        if is_trending:
-            quality_tag = "TRENDING"
-
         movie_data = {
             "title": title,
             "quality": quality_tag,
             "type": content_type, # Use selected content type
-            "overview": manual_overview if manual_overview else "No overview available.",
-            "poster": manual_poster_url if manual_poster_url else "",
-            "year": manual_year if manual_year else "N/A",
-            "release_date": manual_year if manual_year else "N/A", 
+            "overview": manual_overview or None, # Unknown values are stored as null (see schema.py)
+            "poster": manual_poster_url or None,
+            "year": manual_year,
+            "release_date": manual_release_date,
             "vote_average": None,
-            "original_language": manual_original_language if manual_original_language else "N/A",
+            "original_language": manual_original_language or None,
             "genres": manual_genres_list,
             "tmdb_id": None,
             "top_label": manual_top_label if manual_top_label else "",
-            "is_coming_soon": is_coming_soon # Store coming soon status
+            "is_trending": is_trending, # Trending no longer overwrites the quality tag
+            "is_coming_soon": is_coming_soon, # Store coming soon status
+            "version": 1, # Incremented by every edit (optimistic concurrency in edit_movie)
+            "updated_at": datetime.now(timezone.utc) # lastmod in the sitemap and feeds
         }
+        movie_data["shelves"] = sorted(movie_shelves(movie_data))
 
         # Handle download links based on content type
         if content_type == "movie":
             links_list = []
             link_480p = request.form.get("link_480p")
             if link_480p:
-                links_list.append({"quality": "480p", "size": "590MB", "url": link_480p})
+                links_list.append(make_link("480p", link_480p))
             link_720p = request.form.get("link_720p")
             if link_720p:
-                links_list.append({"quality": "720p", "size": "1.4GB", "url": link_720p})
+                links_list.append(make_link("720p", link_720p))
             link_1080p = request.form.get("link_1080p")
             if link_1080p:
-                links_list.append({"quality": "1080p", "size": "2.9GB", "url": link_1080p})
+                links_list.append(make_link("1080p", link_1080p))
             movie_data["links"] = links_list
         else: # content_type == "series"
-            episodes_list = []
-            episode_numbers = request.form.getlist('episode_number[]')
-            episode_titles = request.form.getlist('episode_title[]')
-            episode_overviews = request.form.getlist('episode_overview[]')
-            episode_link_480ps = request.form.getlist('episode_link_480p[]')
-            episode_link_720ps = request.form.getlist('episode_link_720p[]')
-            episode_link_1080ps = request.form.getlist('episode_link_1080p[]')
-
-            for i in range(len(episode_numbers)):
-                episode_links = []
-                if episode_link_480ps and episode_link_480ps[i]:
-                    episode_links.append({"quality": "480p", "size": "590MB", "url": episode_link_480ps[i]})
-                if episode_link_720ps and episode_link_720ps[i]:
-                    episode_links.append({"quality": "720p", "size": "1.4GB", "url": episode_link_720ps[i]})
-                if episode_link_1080ps and episode_link_1080ps[i]:
-                    episode_links.append({"quality": "1080p", "size": "2.9GB", "url": episode_link_1080ps[i]})
-                
-                episodes_list.append({
-                    "episode_number": int(episode_numbers[i]) if episode_numbers[i] else 0,
-                    "title": episode_titles[i] if episode_titles else "",
-                    "overview": episode_overviews[i] if episode_overviews else "",
-                    "links": episode_links
-                })
-            movie_data["episodes"] = episodes_list
-
-        # Try to fetch from TMDb only if no manual poster or overview was provided
-        # And if it's a movie, TMDb series episode fetching is more complex and not implemented here
-        if TMDB_API_KEY and content_type == "movie" and (not manual_poster_url and not manual_overview or movie_data["overview"] == "No overview available." or not movie_data["poster"]):
-            tmdb_url = f"https://api.themoviedb.org/3/search/movie?api_key={TMDB_API_KEY}&query={title}"
-            try:
-                res = requests.get(tmdb_url, timeout=5).json()
-                if res and "results" in res and res["results"]:
-                    data = res["results"][0]
-                    # Overwrite only if TMDb provides a value and manual data wasn't explicitly provided
-                    if not manual_overview and data.get("overview"):
-                        movie_data["overview"] = data.get("overview")
-                    if not manual_poster_url and data.get("poster_path"):
-                        movie_data["poster"] = f"https://image.tmdb.org/t/p/w500{data['poster_path']}"
-                    
-                    release_date = data.get("release_date")
-                    if not manual_year and release_date:
-                        movie_data["year"] = release_date[:4]
-                        movie_data["release_date"] = release_date
-                    
-                    movie_data["vote_average"] = data.get("vote_average", movie_data["vote_average"])
-                    if not manual_original_language and data.get("original_language"):
-                        movie_data["original_language"] = data.get("original_language")
-                    
-                    genres_names = []
-                    for genre_id in data.get("genre_ids", []):
-                        if genre_id in TMDb_Genre_Map:
-                            genres_names.append(TMDb_Genre_Map[genre_id])
-                    if not manual_genres_list and genres_names: # Only update genres if TMDb provides them AND no manual genres
-                        movie_data["genres"] = genres_names
-                    
-                    movie_data["tmdb_id"] = data.get("id")
-                else:
-                    print(f"No results found on TMDb for title: {title} (movie)")
-            except requests.exceptions.RequestException as e:
-                print(f"Error connecting to TMDb API for '{title}': {e}")
-            except Exception as e:
-                print(f"An unexpected error occurred while fetching TMDb data: {e}")
-        else:
-            print("Skipping TMDb API call (not a movie, no key, or manual poster/overview provided).")
+            # Episodes are stored in the episodes collection once the series has an _id
+            episodes_list = episodes_from_form()
+            movie_data["episode_count"] = len(episodes_list)
+
+        # TMDb data comes from the candidate picked in the form (a cached detail by id), never from a search on save
+        apply_tmdb_pick(movie_data, request.form.get("tmdb_id", type=int), content_type)
 
         try:
+            movie_data = normalize_movie(movie_data)
             movies.insert_one(movie_data)
+            if content_type == "series" and episodes_list:
+                episodes.insert_many([dict(ep, series_id=movie_data["_id"]) for ep in episodes_list], ordered=False)
+            notify_movie_changed(str(movie_data["_id"]), movie_data)
             print(f"Content '{movie_data['title']}' added successfully to MovieZone!")
             return redirect(url_for('admin')) # Redirect to admin after POST
         except Exception as e:
@@ -2025,21 +3421,190 @@ def admin():
         # If no search query, fetch all content (as before)
         all_content = list(movies.find().sort('_id', -1))
     
+    # Download counts as of the last click counter flush
+    download_totals = {str(row['_id']): row.get('total', 0)
+                       for row in download_clicks.find({"_id": {"$in": [c['_id'] for c in all_content]}}, {"total": 1})}
+
     # Convert ObjectIds to string for template
     for content in all_content:
         content['_id'] = str(content['_id']) 
 
-    return render_template_string(admin_html, movies=all_content, admin_query=admin_query)
+    trending_ranks = {str(doc_id): rank for rank, doc_id in enumerate(trending_shelf.ids, 1)}
+    return render_template("admin.html", movies=all_content, admin_query=admin_query, download_totals=download_totals,
+                                  trending_ranks=trending_ranks,
+                                  bulk_actions=[(action, label) for action, (label, _) in BULK_ACTIONS.items()])
+
+
+# Bulk actions on the admin table: action -> (label, fields to $set given the form's value)
+BULK_ACTIONS = {
+    "delete": ("Delete", None),
+    "set_trending": ("Mark trending", lambda value: {"is_trending": True}),
+    "clear_trending": ("Remove from trending", lambda value: {"is_trending": False}),
+    "set_coming_soon": ("Mark coming soon", lambda value: {"is_coming_soon": True}),
+    "clear_coming_soon": ("Remove from coming soon", lambda value: {"is_coming_soon": False}),
+    "set_quality": ("Set quality tag", lambda value: {"quality": value.upper()}),
+    "set_top_label": ("Set top label", lambda value: {"top_label": value})
+}
+
+@app.route('/admin/bulk', methods=["POST"])
+@requires_auth
+def admin_bulk():
+    action = request.form.get("action", "")
+    value = request.form.get("value", "").strip()
+    if action not in BULK_ACTIONS:
+        return "Unknown bulk action.", 400
+    label, make_fields = BULK_ACTIONS[action]
+
+    ids = []
+    results = {}
+    for raw_id in request.form.getlist("ids[]"):
+        try:
+            ids.append(ObjectId(raw_id))
+        except Exception:
+            results[raw_id] = {"_id": raw_id, "title": raw_id, "status": "invalid id"}
+
+    # One read for titles, existence and the pre-images used to update caches
+    found = {doc["_id"]: doc for doc in movies.find({"_id": {"$in": ids}})}
+    targets = [oid for oid in ids if oid in found]
+    for oid in ids:
+        if oid not in found:
+            results[str(oid)] = {"_id": str(oid), "title": str(oid), "status": "not found"}
+
+    if make_fields is None:
+        operations = [DeleteOne({"_id": oid}) for oid in targets]
+    else:
+        fields = dict(make_fields(value), updated_at=datetime.now(timezone.utc))
+        pipeline = [
+            {"$set": {field: {"$literal": field_value} for field, field_value in fields.items()}},
+            SET_SHELVES_STAGE,
+            {"$set": {"version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}}
+        ]
+        operations = [UpdateOne({"_id": oid}, pipeline) for oid in targets]
+
+    failed = {}
+    if operations:
+        try:
+            movies.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error.get("errmsg", "write error") for error in e.details.get("writeErrors", [])}
+
+    deleted_series = []
+    for index, oid in enumerate(targets):
+        doc = found[oid]
+        entry = {"_id": str(oid), "title": doc.get("title", str(oid))}
+        if index in failed:
+            entry["status"] = f"error: {failed[index]}"
+        elif make_fields is None:
+            entry["status"] = "deleted"
+            if doc.get("type") == "series":
+                deleted_series.append(oid)
+            notify_movie_changed(str(oid), None)
+        else:
+            entry["status"] = "updated"
+            doc.update(fields)
+            doc["shelves"] = sorted(movie_shelves(doc))
+            doc["version"] = doc.get("version", 0) + 1
+            notify_movie_changed(str(oid), doc)
+        results[str(oid)] = entry
+    if deleted_series:
+        episodes.delete_many({"series_id": {"$in": deleted_series}})
+
+    print(f"Bulk action '{action}' applied to {len(targets) - len(failed)} of {len(results)} selected titles.")
+    return render_template("bulk_result.html", label=label, value=value, results=list(results.values()))
+
+
+@app.route('/admin/catalog_mirror')
+@requires_auth
+def catalog_mirror_stats():
+    # Memory accounting for the in-memory catalog mirror (largest documents first)
+    return catalog_mirror.memory_report(top=request.args.get('top', 20, type=int))
+
+
+@app.route('/admin/mongo_metrics')
+@requires_auth
+def mongo_metrics():
+    # Where this process's MongoDB commands went, per server, and how public reads were routed
+    return jsonify(public_read_preference=read_routing.read_preference.document,
+                   primary_reads_after_change=read_routing.hold_seconds,
+                   public_reads=read_routing.counts(),
+                   servers=command_metrics.report(get_client().topology_description))
+
+
+@app.route('/admin/slow_queries')
+@requires_auth
+def slow_queries():
+    # Slowest query shapes first: ?rank=total|max|avg|count, ?top=N
+    rank = request.args.get('rank', 'total')
+    if rank not in RANK_KEYS:
+        return jsonify(error=f"rank must be one of {', '.join(RANK_KEYS)}"), 400
+    return jsonify(slow_query_log.report(rank, top=request.args.get('top', 20, type=int)))
+
+
+@app.route('/admin/export')
+@requires_auth
+def admin_export():
+    # Streams the catalog as gzipped JSONL/BSON; ?after=<last _id received> resumes a cut-off download
+    collection_name = request.args.get("collection", "movies")
+    fmt = request.args.get("format", "jsonl")
+    if collection_name not in catalog_export.COLLECTIONS or fmt not in catalog_export.FORMATS:
+        return "Unknown collection or format.", 400
+    try:
+        query = catalog_export.export_filter(request.args.get("type") or None,
+                                             catalog_export.parse_date(request.args.get("since")),
+                                             catalog_export.parse_date(request.args.get("until")))
+        after = ObjectId(request.args["after"]) if request.args.get("after") else None
+    except Exception:
+        return "Invalid since, until or after.", 400
+
+    chunks = catalog_export.export_chunks(db[collection_name], query, fmt, after)
+    filename = f"movie_db-{collection_name}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{fmt}.gz"
+    return Response(stream_with_context(chunk for chunk, _, _ in chunks), mimetype="application/gzip",
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+@app.route('/admin/tmdb/search')
+@requires_auth
+def admin_tmdb_search():
+    # Candidate matches for the title being typed in the admin forms (JSON, cached)
+    title = request.args.get("q", "").strip()
+    content_type = request.args.get("type", "movie")
+    if content_type not in TMDB_TYPES:
+        return jsonify(results=[], error="Unknown content type."), 400
+    if not TMDB_API_KEY:
+        return jsonify(results=[], error="TMDB_API_KEY is not set."), 503
+    if len(title) < 2:
+        return jsonify(results=[])
+    try:
+        return jsonify(results=tmdb_candidates(tmdb_search(title, content_type)))
+    except requests.exceptions.RequestException as e:
+        print(f"Error connecting to TMDb API for search '{title}': {e}")
+        return jsonify(results=[], error="TMDb is not reachable."), 502
+
+
+@app.route('/admin/tmdb/detail')
+@requires_auth
+def admin_tmdb_detail():
+    # Called when a candidate is picked, so the detail is cached before the form is saved
+    content_type = request.args.get("type", "movie")
+    tmdb_id = request.args.get("id", type=int)
+    if content_type not in TMDB_TYPES or not tmdb_id:
+        return jsonify(error="Unknown content type or id."), 400
+    if not TMDB_API_KEY:
+        return jsonify(error="TMDB_API_KEY is not set."), 503
+    try:
+        res = tmdb_detail(tmdb_id, content_type)
+    except requests.exceptions.RequestException as e:
+        print(f"Error connecting to TMDb API for {TMDB_TYPES[content_type]} {tmdb_id}: {e}")
+        return jsonify(error="TMDb is not reachable."), 502
+    if not res or res.get("id") != tmdb_id:
+        return jsonify(error="Not found on TMDb."), 404
+    return jsonify(tmdb_candidate(res))
 
 
 @app.route('/edit_movie/<movie_id>', methods=["GET", "POST"])
 @requires_auth # অথেন্টিকেশন ডেকোরেটর যোগ করা হয়েছে
 def edit_movie(movie_id):
     try:
-        movie = movies.find_one({"_id": ObjectId(movie_id)})
-        if not movie:
-            return "Movie not found!", 404
-
         if request.method == "POST":
             # Extract updated data from form
             title = request.form.get("title")
@@ -2048,7 +3613,8 @@ def edit_movie(movie_id):
             
             manual_overview = request.form.get("overview")
             manual_poster_url = request.form.get("poster_url")
-            manual_year = request.form.get("year")
+            manual_year = parse_year(request.form.get("year"))
+            manual_release_date = parse_release_date(request.form.get("release_date"))
             manual_original_language = request.form.get("original_language")
             manual_genres_str = request.form.get("genres")
             manual_top_label = request.form.get("top_label")
@@ -2057,119 +3623,104 @@ def edit_movie(movie_id):
 
             manual_genres_list = [g.strip() for g in manual_genres_str.split(',') if g.strip()] if manual_genres_str else []
 
-            if is_trending:
-                quality_tag = "TRENDING"
-            
             # Prepare updated data for MongoDB
             updated_data = {
                 "title": title,
                 "quality": quality_tag,
                 "type": content_type,
-                "overview": manual_overview if manual_overview else "No overview available.",
-                "poster": manual_poster_url if manual_poster_url else "",
-                "year": manual_year if manual_year else "N/A",
-                "release_date": manual_year if manual_year else "N/A", # Assuming release_date is same as year if manually entered
-                "original_language": manual_original_language if manual_original_language else "N/A",
+                "overview": manual_overview or None,
+                "poster": manual_poster_url or None,
+                "year": manual_year,
+                "release_date": manual_release_date,
+                "original_language": manual_original_language or None,
                 "genres": manual_genres_list,
                 "top_label": manual_top_label if manual_top_label else "",
-                "is_coming_soon": is_coming_soon
+                "is_trending": is_trending,
+                "is_coming_soon": is_coming_soon,
+                "updated_at": datetime.now(timezone.utc)
             }
+            updated_data["shelves"] = sorted(movie_shelves(updated_data))
 
             # Handle download links based on content type
             if content_type == "movie":
                 links_list = []
                 link_480p = request.form.get("link_480p")
                 if link_480p:
-                    links_list.append({"quality": "480p", "size": "590MB", "url": link_480p})
+                    links_list.append(make_link("480p", link_480p))
                 link_720p = request.form.get("link_720p")
                 if link_720p:
-                    links_list.append({"quality": "720p", "size": "1.4GB", "url": link_720p})
+                    links_list.append(make_link("720p", link_720p))
                 link_1080p = request.form.get("link_1080p")
                 if link_1080p:
-                    links_list.append({"quality": "1080p", "size": "2.9GB", "url": link_1080p})
-                updated_data["links"] = links_list
-                # Remove episodes if present for a movie
-                if "episodes" in movie:
-                    movies.update_one({"_id": ObjectId(movie_id)}, {"$unset": {"episodes": ""}})
+                    links_list.append(make_link("1080p", link_1080p))
+                # Links that didn't change keep their link check results (merged by the update itself,
+                # against what is stored then); new ones are checked by the next sweep
+                links_stages = keep_link_checks_stages(links_list)
+                # Remove episodes in case this was a series before
+                unset_fields = {"episodes": "", "episode_count": ""}
             else: # content_type == "series"
-                episodes_list = []
-                episode_numbers = request.form.getlist('episode_number[]')
-                episode_titles = request.form.getlist('episode_title[]')
-                episode_overviews = request.form.getlist('episode_overview[]')
-                episode_link_480ps = request.form.getlist('episode_link_480p[]')
-                episode_link_720ps = request.form.getlist('episode_link_720p[]')
-                episode_link_1080ps = request.form.getlist('episode_link_1080p[]')
-
-                for i in range(len(episode_numbers)):
-                    episode_links = []
-                    if episode_link_480ps and episode_link_480ps[i]:
-                        episode_links.append({"quality": "480p", "size": "590MB", "url": episode_link_480ps[i]})
-                    if episode_link_720ps and episode_link_720ps[i]:
-                        episode_links.append({"quality": "720p", "size": "1.4GB", "url": episode_link_720ps[i]})
-                    if episode_link_1080ps and episode_link_1080ps[i]:
-                        episode_links.append({"quality": "1080p", "size": "2.9GB", "url": episode_link_1080ps[i]})
-                    
-                    episodes_list.append({
-                        "episode_number": int(episode_numbers[i]) if episode_numbers[i] else 0,
-                        "title": episode_titles[i] if episode_titles else "",
-                        "overview": episode_overviews[i] if episode_overviews else "",
-                        "links": episode_links
-                    })
-                updated_data["episodes"] = episodes_list
-                # Remove top-level 'links' if present for series
-                if "links" in movie:
-                    movies.update_one({"_id": ObjectId(movie_id)}, {"$unset": {"links": ""}})
-
-
-            # If TMDb API Key is available and no manual overview/poster provided, fetch and update
-            # Only for movies, as TMDb episode details are more complex
-            if TMDB_API_KEY and content_type == "movie" and (not manual_poster_url and not manual_overview): # Only try to fetch if not manually overridden
-                tmdb_url = f"https://api.themoviedb.org/3/search/movie?api_key={TMDB_API_KEY}&query={title}"
-                try:
-                    res = requests.get(tmdb_url, timeout=5).json()
-                    if res and "results" in res and res["results"]:
-                        data = res["results"][0]
-                        # Only update if TMDb provides a value and manual data wasn't explicitly provided
-                        if not manual_overview and data.get("overview"):
-                            updated_data["overview"] = data.get("overview")
-                        if not manual_poster_url and data.get("poster_path"):
-                            updated_data["poster"] = f"https://image.tmdb.org/t/p/w500{data['poster_path']}"
-                        
-                        release_date = data.get("release_date")
-                        if not manual_year and release_date:
-                            updated_data["year"] = release_date[:4]
-                            updated_data["release_date"] = release_date
-                        
-                        updated_data["vote_average"] = data.get("vote_average", movie.get("vote_average")) # Keep old if TMDb doesn't provide
-                        if not manual_original_language and data.get("original_language"):
-                            updated_data["original_language"] = data.get("original_language")
-                        
-                        genres_names = []
-                        for genre_id in data.get("genre_ids", []):
-                            if genre_id in TMDb_Genre_Map:
-                                genres_names.append(TMDb_Genre_Map[genre_id])
-                        if not manual_genres_list and genres_names:
-                            updated_data["genres"] = genres_names
-                        
-                        updated_data["tmdb_id"] = data.get("id")
-                    else:
-                        print(f"No results found on TMDb for title: {title} (movie) during edit.")
-                except requests.exceptions.RequestException as e:
-                    print(f"Error connecting to TMDb API for '{title}' during edit: {e}")
-                except Exception as e:
-                    print(f"An unexpected error occurred while fetching TMDb data during edit: {e}")
-            else:
-                print("Skipping TMDb API call (not a movie, no key, or manual poster/overview provided).")
+                episodes_list = episodes_from_form()
+                updated_data["episode_count"] = len(episodes_list)
+                links_stages = []
+                # Remove top-level 'links' (and any not yet migrated embedded episodes) for series
+                unset_fields = {"links": "", "episodes": ""}
+
+            # Fill what was left empty from the picked TMDb candidate (a cached detail by id)
+            tmdb_id = request.form.get("tmdb_id", type=int)
+            updated_data["tmdb_id"] = tmdb_id
+            if any(not updated_data.get(field) for field in TMDB_FILLED_FIELDS):
+                apply_tmdb_pick(updated_data, tmdb_id, content_type)
             
-            # Update the movie in MongoDB
-            movies.update_one({"_id": ObjectId(movie_id)}, {"$set": updated_data})
+            # Update the movie in MongoDB in one atomic round trip. The form carries the
+            # version it was loaded with; if someone else saved in the meantime the
+            # filter doesn't match and nothing is written.
+            updated_data = normalize_movie(updated_data)
+            loaded_version = request.form.get("version", 0, type=int)
+            movie = movies.find_one_and_update(
+                {"_id": ObjectId(movie_id), "version": loaded_version if loaded_version else {"$in": [None, 0]}},
+                [{"$set": {field: {"$literal": value} for field, value in updated_data.items()}}] + links_stages + [
+                    {"$project": {field: 0 for field in unset_fields}},
+                    {"$set": {"version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}}],
+                return_document=ReturnDocument.BEFORE
+            )
+            if movie is None:
+                current = movies.find_one({"_id": ObjectId(movie_id)}, {"title": 1, "version": 1})
+                if not current:
+                    return "Movie not found!", 404
+                print(f"Edit conflict for '{title}': form had version {loaded_version}, database has {current.get('version', 0)}.")
+                return render_template("conflict.html", movie=current, loaded_version=loaded_version), 409
+
+            # Episodes live in their own collection and are written after the series document
+            if content_type == "series":
+                save_episodes(ObjectId(movie_id), episodes_list)
+            elif movie.get("type") == "series":
+                episodes.delete_many({"series_id": ObjectId(movie_id)})
+
+            updated_movie = {key: value for key, value in movie.items() if key not in unset_fields}
+            updated_movie.update(updated_data, version=movie.get("version", 0) + 1)
+            if content_type == "movie":
+                # What the update merged against is the pre-image it returned
+                updated_movie["links"] = keep_link_checks(movie.get("links"), links_list)
+                updated_movie.pop("dead_links", None)
+                dead_links = dead_link_count(updated_movie["links"])
+                if dead_links is not None:
+                    updated_movie["dead_links"] = dead_links
+            notify_movie_changed(movie_id, updated_movie)
             print(f"Content '{title}' updated successfully!")
             return redirect(url_for('admin')) # Redirect back to admin list after update
 
         else: # GET request, display the form
+            movie = movies.find_one({"_id": ObjectId(movie_id)})
+            if not movie:
+                return "Movie not found!", 404
+
             # Convert ObjectId to string for template
+            if "episodes" in movie:
+                episodes_list = sorted_embedded_episodes(movie)
+            else:
+                episodes_list = list(episodes.find({"series_id": movie["_id"]}).sort(EPISODE_SORT))
             movie['_id'] = str(movie['_id']) 
-            return render_template_string(edit_html, movie=movie)
+            return render_template("edit.html", movie=movie, episodes=episodes_list)
 
     except Exception as e:
         print(f"Error processing edit for movie ID {movie_id}: {e}")
@@ -2183,6 +3734,8 @@ def delete_movie(movie_id):
         # Delete the movie from MongoDB using its ObjectId
         result = movies.delete_one({"_id": ObjectId(movie_id)})
         if result.deleted_count == 1:
+            episodes.delete_many({"series_id": ObjectId(movie_id)})
+            notify_movie_changed(movie_id, None)
             print(f"Content with ID {movie_id} deleted successfully from MovieZone!")
         else:
             print(f"Content with ID {movie_id} not found in MovieZone database.")
@@ -2192,39 +3745,140 @@ def delete_movie(movie_id):
     return redirect(url_for('admin')) # Redirect back to the admin page
 
 
+@app.route('/sitemap.xml')
+def sitemap():
+    ensure_sitemap_index()
+    root = site_root()
+    if len(sitemap_index) + len(SITEMAP_PAGES) <= SITEMAP_MAX_URLS:
+        # Everything fits in one file
+        xml = sitemap_index.rendered(0, ("single", root), lambda: render_template(
+            "sitemap.xml", pages=SITEMAP_PAGES, titles=sitemap_index.shard(0), format_lastmod=format_lastmod))
+    else:
+        xml = sitemap_index.rendered(None, ("index", root), lambda: render_template(
+            "sitemap_index.xml", shards=[(n, sitemap_index.shard_lastmod(n)) for n in range(sitemap_index.shard_count())],
+            format_lastmod=format_lastmod))
+    return Response(xml, mimetype="application/xml")
+
+@app.route('/sitemap-pages.xml')
+def sitemap_pages():
+    return Response(render_template("sitemap.xml", pages=SITEMAP_PAGES, titles=[], format_lastmod=format_lastmod),
+                    mimetype="application/xml")
+
+@app.route('/sitemap-<int:shard>.xml')
+def sitemap_shard(shard):
+    ensure_sitemap_index()
+    if shard >= sitemap_index.shard_count():
+        return "Sitemap not found!", 404
+    xml = sitemap_index.rendered(shard, ("shard", site_root()), lambda: render_template(
+        "sitemap.xml", pages=[], titles=sitemap_index.shard(shard), format_lastmod=format_lastmod))
+    return Response(xml, mimetype="application/xml")
+
+def format_lastmod(value, rfc822=False):
+    return format_datetime(value) if rfc822 else value.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+@app.route('/feed/<kind>.<feed_format>')
+def feed(kind, feed_format):
+    if kind not in FEED_TYPES or feed_format not in ("rss", "atom"):
+        return "Feed not found!", 404
+    content_type, feed_title = FEED_TYPES[kind]
+    cache_key = (kind, feed_format, site_root())
+    xml = feed_cache.get(cache_key)
+    if xml is None:
+        items = list(public_movies.find({"type": content_type}).sort('_id', -1).limit(FEED_SIZE))
+        for m in items:
+            m['published'] = m['_id'].generation_time
+            m['lastmod'] = lastmod(m)
+            m['_id'] = str(m['_id'])
+        updated = max((m['lastmod'] for m in items), default=datetime.now(timezone.utc))
+        xml = render_template(f"{feed_format}.xml", kind=kind, feed_format=feed_format, feed_title=feed_title,
+                              items=items, updated=updated, format_lastmod=format_lastmod)
+        feed_cache.set(cache_key, xml, content_type, [m['_id'] for m in items])
+    mimetype = "application/rss+xml" if feed_format == "rss" else "application/atom+xml"
+    return Response(xml, mimetype=mimetype)
+
+
 # New routes for navigation bar and specific categories
+@app.route('/browse')
+@serve_stale_on_db_error
+def browse():
+    return render_browse({})
+
+@app.route('/genre/<name>')
+@serve_stale_on_db_error
+def genre(name):
+    return render_browse({"genre": [name]})
+
+@app.route('/year/<year>')
+@serve_stale_on_db_error
+def year(year):
+    return render_browse({"year": [year]})
+
+@app.route('/language/<code>')
+@serve_stale_on_db_error
+def language(code):
+    return render_browse({"language": [code.lower()]})
+
+def render_browse(preset):
+    """Titles matching the preset and query string filters, newest first, with facet counts."""
+    ensure_facet_index()
+    selected = {facet: list(dict.fromkeys(preset.get(facet, []) + request.args.getlist(facet))) for facet in FACETS}
+    page = max(request.args.get('page', 1, type=int), 1)
+    ids, total, counts = facet_index.query(selected, (page - 1) * BROWSE_PAGE_SIZE, BROWSE_PAGE_SIZE)
+    movies_list = titles_by_id(ids, CARD_FIELDS)
+
+    # Every value links to the filters with that value toggled; the preset of a landing page is kept
+    facet_groups = []
+    for facet in FACETS:
+        items = []
+        for value, count in counts[facet]:
+            active = value in selected[facet]
+            toggled = dict(selected, **{facet: [v for v in selected[facet] if v != value] if active else selected[facet] + [value]})
+            text = value.upper() if facet == "language" else value.title() if facet == "type" else value
+            items.append((text, count, active, url_for('browse', **toggled)))
+        facet_groups.append((FACET_LABELS[facet], items))
+
+    pages = max(1, -(-total // BROWSE_PAGE_SIZE))
+    # Route arguments repeated in the query string (/genre/Action?name=x) would be passed twice
+    args = {k: v for k, v in request.args.to_dict(flat=False).items() if k not in (request.view_args or {})}
+    page_url = lambda n: url_for(request.endpoint, **(request.view_args or {}), **dict(args, page=n))
+    pagination = {"page": page, "pages": pages,
+                  "prev": page_url(page - 1) if page > 1 else None,
+                  "next": page_url(page + 1) if page < pages else None}
+    chosen = [value for facet in FACETS for value in selected[facet]]
+    title = f"Browse: {' · '.join(chosen)}" if chosen else "Browse MovieZone"
+    return render_template("index.html", movies=movies_list, query=title, is_full_page_list=True,
+                           facets=facet_groups, facet_total=total, pagination=pagination)
+
 @app.route('/trending_movies')
+@serve_stale_on_db_error
 def trending_movies():
-    trending_list = list(movies.find({"quality": "TRENDING"}).sort('_id', -1))
-    for m in trending_list:
-        m['_id'] = str(m['_id'])
-    # Pass is_full_page_list=True and use 'movies' for the list
-    return render_template_string(index_html, movies=trending_list, query="Trending on MovieZone", is_full_page_list=True)
+    return stream_list_page("shelf:trending", iter_shelf("trending"), ["trending"], query="Trending on MovieZone")
 
 @app.route('/movies_only')
+@serve_stale_on_db_error
 def movies_only():
-    movie_list = list(movies.find({"type": "movie", "quality": {"$ne": "TRENDING"}, "is_coming_soon": {"$ne": True}}).sort('_id', -1))
-    for m in movie_list:
-        m['_id'] = str(m['_id'])
-    # Pass is_full_page_list=True and use 'movies' for the list
-    return render_template_string(index_html, movies=movie_list, query="All Movies on MovieZone", is_full_page_list=True)
+    return stream_list_page("shelf:movies", iter_shelf("movies"), ["movies"], query="All Movies on MovieZone")
 
 @app.route('/webseries')
+@serve_stale_on_db_error
 def webseries():
-    series_list = list(movies.find({"type": "series", "quality": {"$ne": "TRENDING"}, "is_coming_soon": {"$ne": True}}).sort('_id', -1))
-    for m in series_list:
-        m['_id'] = str(m['_id'])
-    # Pass is_full_page_list=True and use 'movies' for the list
-    return render_template_string(index_html, movies=series_list, query="All Web Series on MovieZone", is_full_page_list=True)
+    return stream_list_page("shelf:series", iter_shelf("series"), ["series"], query="All Web Series on MovieZone")
 
 @app.route('/coming_soon')
+@serve_stale_on_db_error
 def coming_soon():
-    coming_soon_list = list(movies.find({"is_coming_soon": True}).sort('_id', -1))
-    for m in coming_soon_list:
-        m['_id'] = str(m['_id'])
-    # Pass is_full_page_list=True and use 'movies' for the list
-    return render_template_string(index_html, movies=coming_soon_list, query="Coming Soon to MovieZone", is_full_page_list=True)
+    return stream_list_page("shelf:coming_soon", iter_shelf("coming_soon"), ["coming_soon"], query="Coming Soon to MovieZone")
+
 
+startup["import_seconds"] = time.perf_counter() - IMPORT_STARTED
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server only. In production run: gunicorn -c gunicorn.conf.py
+    try:
+        create_app(warm=True)
+    except Exception as e:
+        print(f"Error: {e} Exiting.")
+        exit(1)
+    ensure_indexes()
+    start_background_workers()
+    app.run(host='0.0.0.0', port=int(os.getenv("PORT", "5000")), debug=os.getenv("FLASK_DEBUG") == "1")
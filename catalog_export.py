@@ -0,0 +1,239 @@
+"""Streaming export and restore of the catalog.
+
+    python catalog_export.py export movies.jsonl.gz [--type movie] [--since 2024-01-01] [--until ...]
+    python catalog_export.py export movies.jsonl.gz --resume      # continue an interrupted export
+    python catalog_export.py export episodes.bson.gz --collection episodes --format bson
+    python catalog_export.py restore movies.jsonl.gz [--collection movies] [--batch-size 1000]
+
+Documents are read in `_id` order from a cursor and written `batch_size` at a
+time, each batch as a complete gzip member (a file of several members is
+still one valid gzip file). Formats:
+
+    jsonl   one MongoDB Extended JSON (canonical) document per line
+    bson    concatenated BSON documents, as written by mongodump
+
+Nothing is held in memory beyond one batch. Because the documents come in
+`_id` order, an export can continue after the last `_id` it wrote: the CLI
+retries from there when the cursor fails, and --resume first cuts an existing
+file back to its last complete gzip member. The admin export endpoint takes
+the same filters plus `after`, so an interrupted download can be resumed too.
+
+`--since`/`--until` filter on `updated_at`, falling back to the creation time
+of documents that have none, like the sitemap's lastmod.
+
+Restore upserts every document by `_id` (``ReplaceOne(upsert=True)``) in
+unordered bulk writes, so it can be re-run over a partly restored database
+and a failing document doesn't stop the batch. A truncated file is restored
+up to its last complete gzip member.
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+
+import bson
+from bson import json_util
+from bson.objectid import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+FORMATS = ("jsonl", "bson")
+COLLECTIONS = ("movies", "episodes")
+_JSON_OPTIONS = json_util.CANONICAL_JSON_OPTIONS
+
+
+def parse_date(value):
+    """"2024-01-31" or an ISO timestamp -> aware UTC datetime (None stays None)."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+
+def export_filter(content_type=None, since=None, until=None):
+    """MongoDB filter for the export options (all optional)."""
+    query = {}
+    if content_type:
+        query["type"] = content_type
+    if since or until:
+        updated, created = {}, {}
+        if since:
+            updated["$gte"] = since
+            created["$gte"] = ObjectId.from_datetime(since)
+        if until:
+            updated["$lt"] = until
+            created["$lt"] = ObjectId.from_datetime(until)
+        query["$or"] = [{"updated_at": updated}, {"updated_at": {"$exists": False}, "_id": created}]
+    return query
+
+
+def encode(doc, fmt):
+    if fmt == "bson":
+        return bson.encode(doc)
+    return json_util.dumps(doc, json_options=_JSON_OPTIONS).encode() + b"\n"
+
+
+def export_chunks(collection, query=None, fmt="jsonl", after=None, batch_size=1000):
+    """Yields (gzip member, _id of its last document, documents in it), in _id order after `after`."""
+    query = dict(query or {})
+    if after is not None:
+        query = {"$and": [query, {"_id": {"$gt": after}}]}
+    batch = []
+    last_id = None
+    for doc in collection.find(query).sort("_id", 1).batch_size(batch_size):
+        batch.append(encode(doc, fmt))
+        last_id = doc["_id"]
+        if len(batch) >= batch_size:
+            yield gzip.compress(b"".join(batch), compresslevel=6), last_id, len(batch)
+            batch = []
+    if batch:
+        yield gzip.compress(b"".join(batch), compresslevel=6), last_id, len(batch)
+
+
+def read_members(path, read_size=1 << 20):
+    """Yields (decompressed member, end offset in the file) for every complete gzip member of `path`."""
+    with open(path, "rb") as f:
+        offset = 0  # Start of the current member in the file
+        pending = b""
+        while True:
+            decompressor = zlib.decompressobj(wbits=31)
+            parts = []
+            consumed = 0
+            data = pending
+            while not decompressor.eof:
+                if not data:
+                    data = f.read(read_size)
+                    if not data:
+                        return  # End of file, or a member cut short
+                parts.append(decompressor.decompress(data))
+                consumed += len(data) - len(decompressor.unused_data)
+                data = b""
+            pending = decompressor.unused_data
+            offset += consumed
+            yield b"".join(parts), offset
+            if not pending:
+                pending = f.read(read_size)
+                if not pending:
+                    return
+
+
+def decode(member, fmt):
+    if fmt == "bson":
+        return bson.decode_all(member)
+    return [json_util.loads(line) for line in member.splitlines() if line.strip()]
+
+
+def resume_point(path, fmt):
+    """Cuts `path` back to its last complete gzip member; returns (last _id in it, documents kept)."""
+    end, last_id, count = 0, None, 0
+    for member, end in read_members(path):
+        docs = decode(member, fmt)
+        if docs:
+            last_id = docs[-1]["_id"]
+            count += len(docs)
+    with open(path, "r+b") as f:
+        f.truncate(end)
+    return last_id, count
+
+
+def export_to_file(collection, path, query=None, fmt="jsonl", batch_size=1000, resume=False, retries=5):
+    started = time.perf_counter()
+    after, written = (resume_point(path, fmt) if resume and os.path.exists(path) else (None, 0))
+    if after is not None:
+        print(f"Resuming after {after} ({written} documents already exported).")
+    attempts = 0
+    with open(path, "ab" if resume else "wb") as f:
+        while True:
+            try:
+                for chunk, after, count in export_chunks(collection, query, fmt, after, batch_size):
+                    f.write(chunk)
+                    written += count
+                    rate = written / (time.perf_counter() - started)
+                    print(f"  {written} documents ({f.tell() / 1e6:,.1f} MB, {rate:,.0f} docs/s)", end="\r", flush=True)
+                break
+            except PyMongoError as e:
+                # The _id order makes the export resumable from the last document written
+                attempts += 1
+                if attempts > retries:
+                    raise
+                print(f"\nCursor failed ({e}); resuming after {after}.")
+                time.sleep(min(2 ** attempts, 30))
+    print(f"\nExported {written} documents to {path} in {time.perf_counter() - started:.1f}s.")
+    return written
+
+
+def restore_file(collection, path, fmt="jsonl", batch_size=1000):
+    """Upserts the documents of an export into `collection`; returns (upserted or replaced, failed)."""
+    started = time.perf_counter()
+    applied = failed = 0
+    batch = []
+
+    def flush():
+        nonlocal applied, failed
+        try:
+            result = collection.bulk_write(batch, ordered=False)
+            applied += result.upserted_count + result.matched_count
+        except BulkWriteError as e:
+            details = e.details
+            applied += details.get("nUpserted", 0) + details.get("nMatched", 0)
+            failed += len(details.get("writeErrors", []))
+            for error in details.get("writeErrors", [])[:5]:
+                print(f"\n  Failed to restore document {error.get('op', {}).get('_id')}: {error.get('errmsg')}")
+        batch.clear()
+        rate = (applied + failed) / (time.perf_counter() - started)
+        print(f"  {applied} documents restored, {failed} failed ({rate:,.0f} docs/s)", end="\r", flush=True)
+
+    end = 0
+    for member, end in read_members(path):
+        for doc in decode(member, fmt):
+            batch.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    if end < os.path.getsize(path):
+        print(f"\nWarning: {path} ends with an incomplete gzip member; restored up to byte {end}.")
+    print(f"\nRestored {applied} documents ({failed} failed) in {time.perf_counter() - started:.1f}s.")
+    return applied, failed
+
+
+def guess_format(path):
+    return "bson" if ".bson" in os.path.basename(path) else "jsonl"
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Export or restore the MovieZone catalog.")
+    parser.add_argument("command", choices=("export", "restore"))
+    parser.add_argument("path", help="gzipped export file")
+    parser.add_argument("--collection", choices=COLLECTIONS, default="movies")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to bson for *.bson.gz, jsonl otherwise")
+    parser.add_argument("--type", choices=("movie", "series"), help="export only this type")
+    parser.add_argument("--since", type=parse_date, help="export documents updated at or after this date")
+    parser.add_argument("--until", type=parse_date, help="export documents updated before this date")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted export into the same file")
+    parser.add_argument("--batch-size", type=int, default=1000, help="documents per gzip member / bulk write")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"), help="defaults to $MONGO_URI")
+    parser.add_argument("--db", default="movie_db")
+    args = parser.parse_args(argv)
+
+    if not args.mongo_uri:
+        print("Error: MONGO_URI environment variable not set and --mongo-uri not given.")
+        return 1
+
+    collection = MongoClient(args.mongo_uri)[args.db][args.collection]
+    fmt = args.format or guess_format(args.path)
+    if args.command == "export":
+        export_to_file(collection, args.path, export_filter(args.type, args.since, args.until), fmt,
+                       args.batch_size, args.resume)
+        return 0
+    _, failed = restore_file(collection, args.path, fmt, args.batch_size)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Full in-memory mirror of the movies collection for serving public reads.
+
+The mirror is loaded once per process and then kept current through the same
+change notifications that invalidate the page cache (local admin writes, plus
+change stream events when CHANGE_STREAMS=1). Each shelf has a list of ``_id``
+values kept sorted on insert, so "newest N on a shelf" is a slice.
+
+Reads return shallow copies with ``_id`` as a string, matching what the routes
+pass to the templates. Changes arriving while the initial load runs are queued
+and replayed after it, so nothing is lost between the snapshot and the first
+event.
+"""
+import bisect
+import sys
+import threading
+import time
+
+import bson
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+
+
+def deep_sizeof(obj, _seen=None):
+    """Approximate memory held by `obj` and everything it references."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, _seen) + deep_sizeof(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, _seen) for item in obj)
+    return size
+
+
+class CatalogMirror:
+    def __init__(self, shelf_fn, shelves):
+        """`shelf_fn(doc)` returns the names of the shelves `doc` belongs to."""
+        self.shelf_fn = shelf_fn
+        self.shelves = tuple(shelves)
+        self.ready = False
+        self.load_seconds = None
+        self._docs = {}  # ObjectId -> document
+        self._doc_shelves = {}  # ObjectId -> set of shelf names
+        self._shelf_ids = {name: [] for name in self.shelves}  # ascending ObjectIds
+        self._sizes = {}  # ObjectId -> (python bytes, bson bytes)
+        self._lock = threading.RLock()
+        self._loading = False
+        self._pending = []
+
+    def load(self, collection, batch_size=1000):
+        started = time.perf_counter()
+        with self._lock:
+            self._loading = True
+            self._pending = []
+        try:
+            docs = {}
+            for doc in collection.find().batch_size(batch_size):
+                docs[doc["_id"]] = doc
+            with self._lock:
+                self._docs = {}
+                self._doc_shelves = {}
+                self._shelf_ids = {name: [] for name in self.shelves}
+                self._sizes = {}
+                for doc in docs.values():
+                    self._put(doc, keep_sorted=False)
+                for ids in self._shelf_ids.values():
+                    ids.sort()
+                for doc_id, doc in self._pending:
+                    self._apply(doc_id, doc)
+                self.ready = True
+        finally:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+        self.load_seconds = time.perf_counter() - started
+        return len(self._docs)
+
+    def apply_change(self, doc_id, doc):
+        """Movie change listener: upserts `doc`, or removes `doc_id` when doc is None."""
+        with self._lock:
+            if self._loading:
+                self._pending.append((doc_id, doc))
+            elif doc_id is None:
+                # Unknown changes; only a reload can make the mirror trustworthy again
+                self.ready = False
+            else:
+                self._apply(doc_id, doc)
+
+    def _apply(self, doc_id, doc):
+        if doc_id is None:
+            self.ready = False
+            return
+        self._remove(ObjectId(doc_id))
+        if doc is not None:
+            doc = dict(doc, _id=ObjectId(doc_id))
+            self._put(doc)
+
+    def _put(self, doc, keep_sorted=True):
+        doc_id = doc["_id"]
+        shelves = self.shelf_fn(doc)
+        self._docs[doc_id] = doc
+        self._doc_shelves[doc_id] = shelves
+        for name in shelves:
+            if keep_sorted:
+                bisect.insort(self._shelf_ids[name], doc_id)
+            else:
+                self._shelf_ids[name].append(doc_id)
+        self._sizes[doc_id] = (deep_sizeof(doc), len(bson.encode(doc)))
+
+    def _remove(self, doc_id):
+        if self._docs.pop(doc_id, None) is None:
+            return
+        for name in self._doc_shelves.pop(doc_id, ()):
+            ids = self._shelf_ids[name]
+            i = bisect.bisect_left(ids, doc_id)
+            if i < len(ids) and ids[i] == doc_id:
+                del ids[i]
+        self._sizes.pop(doc_id, None)
+
+    @staticmethod
+    def _view(doc):
+        return dict(doc, _id=str(doc["_id"]))
+
+    def get(self, doc_id):
+        try:
+            doc = self._docs.get(ObjectId(doc_id))
+        except InvalidId:
+            return None
+        return self._view(doc) if doc is not None else None
+
+    def iter_shelf(self, name):
+        """Documents on shelf `name`, newest first, one at a time."""
+        with self._lock:
+            ids = list(self._shelf_ids[name])
+        for doc_id in reversed(ids):
+            doc = self._docs.get(doc_id)
+            if doc is not None:
+                yield self._view(doc)
+
+    def shelf(self, name, limit=0):
+        """Documents on shelf `name`, newest first."""
+        with self._lock:
+            ids = self._shelf_ids[name]
+            selected = ids[-limit:] if limit else ids
+            return [self._view(self._docs[doc_id]) for doc_id in reversed(selected)]
+
+    def memory_report(self, top=20):
+        """Total and per-document memory use; the `top` largest documents are listed."""
+        with self._lock:
+            sizes = list(self._sizes.items())
+        largest = sorted(sizes, key=lambda item: item[1][0], reverse=True)[:top]
+        return {
+            "ready": self.ready,
+            "documents": len(sizes),
+            "load_seconds": self.load_seconds,
+            "python_bytes": sum(py for _, (py, _) in sizes),
+            "bson_bytes": sum(bs for _, (_, bs) in sizes),
+            "shelves": {name: len(ids) for name, ids in self._shelf_ids.items()},
+            "largest_documents": [
+                {"_id": str(doc_id), "title": self._docs[doc_id].get("title") if doc_id in self._docs else None,
+                 "python_bytes": py, "bson_bytes": bs}
+                for doc_id, (py, bs) in largest
+            ]
+        }
+
+    def __len__(self):
+        return len(self._docs)
@@ -0,0 +1,211 @@
+"""Change-stream watcher that keeps in-process caches consistent across app nodes.
+
+Every app process runs one ChangeStreamWatcher on ``movie_db.movies``. Each
+insert/update/replace/delete made by any node (through ``admin``,
+``edit_movie``, ``delete_movie`` or the TMDb enrichment in ``movie_detail``) is
+passed to the callback, which invalidates caches for that document.
+
+The resume token is stored in MongoDB under the node's id, so a restarted
+process continues from where its node left off. If the token has fallen out of
+the oplog, the watcher starts a new stream and reports a full reset
+(``doc_id=None``) so the callback can drop everything.
+
+Change streams need a replica set. A single-node replica set is enough for
+local testing:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+    MONGO_URI="mongodb://localhost:27017/?replicaSet=rs0" CHANGE_STREAMS=1 python bot.py
+
+Without change streams, a CatalogPoller finds the changes of other processes
+by polling ``updated_at`` instead, a poll interval late.
+"""
+import datetime
+import threading
+import time
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+# Server error code for "resume point no longer in the oplog"
+CHANGE_STREAM_HISTORY_LOST = 286
+
+DOCUMENT_OPERATIONS = ("insert", "update", "replace", "delete")
+
+# Lets CatalogPoller find recently changed titles
+UPDATED_AT_INDEX = [("updated_at", 1)]
+
+
+class ChangeStreamWatcher(threading.Thread):
+    """Background thread calling ``callback(doc_id, full_document)`` for every change.
+
+    ``doc_id`` is the string ``_id``. ``full_document`` is the document after the
+    change, or None when it was deleted. ``callback(None, None)`` means the stream
+    could not resume and every cache should be dropped.
+    """
+
+    def __init__(self, collection, token_collection, node_id, callback,
+                 save_every=50, save_interval=5.0, retry_delay=1.0, max_retry_delay=30.0):
+        super().__init__(name=f"change-stream-{collection.name}", daemon=True)
+        self.collection = collection
+        self.token_collection = token_collection
+        self.node_id = node_id
+        self.callback = callback
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.resume_token = None
+        self._stop_event = threading.Event()
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def load_resume_token(self):
+        state = self.token_collection.find_one({"_id": self.node_id})
+        return state.get("token") if state else None
+
+    def save_resume_token(self):
+        if self.resume_token is None:
+            return
+        self.token_collection.update_one(
+            {"_id": self.node_id},
+            {"$set": {"token": self.resume_token, "updated_at": datetime.datetime.now(datetime.timezone.utc)}},
+            upsert=True
+        )
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def dispatch(self, change):
+        operation = change["operationType"]
+        if operation in DOCUMENT_OPERATIONS:
+            self.callback(str(change["documentKey"]["_id"]), change.get("fullDocument"))
+        else:
+            # drop / rename / dropDatabase / invalidate: anything may be gone
+            self.callback(None, None)
+
+    def watch_once(self):
+        with self.collection.watch(full_document="updateLookup", resume_after=self.resume_token) as stream:
+            while not self._stop_event.is_set() and stream.alive:
+                change = stream.try_next()
+                # resume_token advances with the post-batch token even while idle
+                self.resume_token = stream.resume_token
+                if change is not None:
+                    self.dispatch(change)
+                    self._unsaved += 1
+                if self._unsaved >= self.save_every or time.monotonic() - self._last_save >= self.save_interval:
+                    self.save_resume_token()
+
+    def run(self):
+        delay = self.retry_delay
+        try:
+            self.resume_token = self.load_resume_token()
+        except PyMongoError as e:
+            print(f"Could not load change stream resume token for node '{self.node_id}': {e}")
+
+        while not self._stop_event.is_set():
+            try:
+                self.watch_once()
+                delay = self.retry_delay
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    print("Change stream resume token expired; restarting stream and dropping caches.")
+                    self.resume_token = None
+                    self.callback(None, None)
+                    continue
+                print(f"Change stream error: {e}. Retrying in {delay:.0f}s.")
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+            except PyMongoError as e:
+                print(f"Change stream connection error: {e}. Retrying in {delay:.0f}s.")
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+        try:
+            self.save_resume_token()
+        except PyMongoError:
+            pass
+
+
+class CatalogPoller(threading.Thread):
+    """Fallback for processes without change streams: polls for changes made by other processes.
+
+    Every ``interval`` seconds, titles whose ``updated_at`` (set by every admin
+    write and TMDb merge) moved are passed to ``callback(doc_id, document)``,
+    like change stream events. Deletions can't be seen that way: when the number
+    of titles no longer matches the count at the last poll plus the titles
+    inserted since, ``callback(None, None)`` drops and reloads everything.
+    Clocks of the writing processes may disagree by up to ``skew`` seconds, so
+    each poll looks back that far and skips versions it already reported.
+    """
+
+    def __init__(self, collection, callback, interval=30.0, skew=60.0):
+        super().__init__(name=f"catalog-poller-{collection.name}", daemon=True)
+        self.collection = collection
+        self.callback = callback
+        self.interval = interval
+        self.skew = datetime.timedelta(seconds=skew)
+        self.since = datetime.datetime.now(datetime.timezone.utc)
+        self._seen = {}  # _id -> updated_at already reported, within the look-back window
+        self._count = None
+        self._max_id = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _aware(self, value):
+        return value.replace(tzinfo=datetime.timezone.utc) if value.tzinfo is None else value
+
+    def _baseline(self):
+        """(newest _id, title count) read consistently, or None while inserts keep racing the reads."""
+        for _ in range(3):
+            newest = self.collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+            max_id = newest["_id"] if newest else None
+            count = self.collection.estimated_document_count()
+            newer = self.collection.count_documents({"_id": {"$gt": max_id}}) if max_id else count
+            if not newer or max_id is None:
+                return max_id, count
+        return None
+
+    def poll_once(self):
+        window_start = self.since - self.skew
+        for doc in self.collection.find({"updated_at": {"$gt": window_start}}):
+            updated_at = self._aware(doc["updated_at"])
+            if self._seen.get(doc["_id"]) == updated_at:
+                continue
+            self._seen[doc["_id"]] = updated_at
+            self.since = max(self.since, updated_at)
+            self.callback(str(doc["_id"]), doc)
+        window_start = self.since - self.skew
+        self._seen = {doc_id: seen for doc_id, seen in self._seen.items() if seen > window_start}
+
+        baseline = self._baseline()
+        if baseline is None:
+            return
+        previous_count, previous_max_id = self._count, self._max_id
+        self._max_id, self._count = baseline
+        if previous_count is None:
+            return
+        inserted = 0
+        if self._max_id is not None:
+            # Titles inserted up to the newest _id of this baseline; later inserts count at the next poll
+            id_range = {"$lte": self._max_id}
+            if previous_max_id is not None:
+                id_range["$gt"] = previous_max_id
+            inserted = self.collection.count_documents({"_id": id_range})
+        if self._count != previous_count + inserted:
+            print("Titles were deleted or restored by another process; reloading in-process caches.")
+            self.callback(None, None)
+
+    def run(self):
+        try:
+            self._max_id, self._count = self._baseline() or (None, None)
+        except PyMongoError as e:
+            print(f"Catalog poller could not read the catalog size: {e}")
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll_once()
+            except PyMongoError as e:
+                print(f"Catalog poll failed: {e}. Retrying in {self.interval:.0f}s.")
@@ -0,0 +1,191 @@
+"""Download link health checker.
+
+    python check_links.py [--max-age-hours 24] [--concurrency 100] [--per-host 8]
+    python check_links.py --every 60        # keep sweeping once an hour
+
+Probes every movie link (`links`) and every episode link (`episodes.links`)
+that hasn't been checked within --max-age-hours. Requests run concurrently on
+one event loop, capped overall and per host. Each link is tried with HEAD,
+falling back to a one-byte ranged GET for hosts that reject HEAD or don't
+report a length. The outcome is stored on the link itself:
+
+    check   {ok, status, latency_ms, error, checked_at}
+    bytes   real Content-Length (when the host reports it)
+    size    the same, formatted like the admin defaults ("590MB", "1.4GB")
+
+and every title gets `dead_links`, the number of its links whose last check
+failed, which the admin table shows. Links added or edited in the admin get
+the default sizes and are picked up by the next sweep, as they have no
+`check` yet.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+import httpx
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+USER_AGENT = "MovieZone-LinkChecker/1.0"
+_CONTENT_RANGE_TOTAL = re.compile(r"/(\d+)$")
+
+
+def format_size(size):
+    """1476395008 -> "1.4GB", like the sizes the admin form stores."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}" if unit == "GB" else f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+def stale_link_filter(cutoff):
+    return {"$or": [{"check.checked_at": {"$exists": False}}, {"check.checked_at": {"$lt": cutoff}}]}
+
+
+def collect_links(db, cutoff, limit=0):
+    """[(collection, doc _id, title _id, url)] for every link not checked since `cutoff`."""
+    links = []
+    due = {"links": {"$elemMatch": stale_link_filter(cutoff)}}
+    sources = [
+        ("movies", db["movies"].find(due, {"links": 1}), "_id"),
+        ("episodes", db["episodes"].find(due, {"links": 1, "series_id": 1}), "series_id"),
+    ]
+    for collection, cursor, title_field in sources:
+        for doc in cursor:
+            for link in doc.get("links") or []:
+                checked_at = (link.get("check") or {}).get("checked_at")
+                if link.get("url") and (checked_at is None or checked_at.replace(tzinfo=timezone.utc) < cutoff):
+                    links.append((collection, doc["_id"], doc[title_field], link["url"]))
+                    if limit and len(links) >= limit:
+                        return links
+    return links
+
+
+async def probe(client, url):
+    """HEAD `url` (ranged GET as fallback); returns (check, content length or None)."""
+    started = time.perf_counter()
+    try:
+        response = await client.head(url)
+        length = response.headers.get("content-length")
+        if response.status_code >= 400 or length is None:
+            # Some hosts reject HEAD or omit the length on it; ask for a single byte instead
+            async with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+                total = _CONTENT_RANGE_TOTAL.search(response.headers.get("content-range", ""))
+                length = total.group(1) if total else response.headers.get("content-length") if response.status_code == 200 else None
+        check = {"ok": response.status_code < 400, "status": response.status_code, "error": None}
+    except httpx.HTTPError as e:
+        check = {"ok": False, "status": None, "error": f"{type(e).__name__}: {e}"[:200]}
+        length = None
+    check["latency_ms"] = round((time.perf_counter() - started) * 1000)
+    check["checked_at"] = datetime.now(timezone.utc)
+    return check, int(length) if length and length.isdigit() else None
+
+
+async def check_all(links, concurrency=100, per_host=8, timeout=10.0, on_result=None):
+    """Probes `links` with at most `concurrency` requests in flight, `per_host` per host."""
+    total_slots = asyncio.Semaphore(concurrency)
+    host_slots = defaultdict(lambda: asyncio.Semaphore(per_host))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, follow_redirects=True,
+                                 headers={"User-Agent": USER_AGENT}) as client:
+        async def run(link):
+            # Per-host slot first, so a slow host never holds more than per_host global slots
+            async with host_slots[urlsplit(link[3]).netloc], total_slots:
+                result = await probe(client, link[3])
+            if on_result:
+                on_result(link, *result)
+        await asyncio.gather(*(run(link) for link in links))
+
+
+def sweep(db, max_age_hours=24, concurrency=100, per_host=8, timeout=10.0, limit=0, batch_size=500):
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+    links = collect_links(db, cutoff, limit)
+    print(f"Checking {len(links)} links (concurrency {concurrency}, {per_host} per host)...")
+    started = time.perf_counter()
+    pending = defaultdict(list)  # collection -> UpdateOnes not yet written
+    counts = {"checked": 0, "dead": 0}
+    titles = defaultdict(set)  # collection -> title ids whose dead_links count may have changed
+
+    def flush(collection):
+        if pending[collection]:
+            db[collection].bulk_write(pending[collection], ordered=False)
+            pending[collection] = []
+
+    def on_result(link, check, length):
+        collection, doc_id, title_id, url = link
+        # Positional update of the link with this url, so a concurrent admin edit of the other links isn't lost
+        fields = {"links.$.check": check}
+        if length:
+            fields["links.$.bytes"] = length
+            fields["links.$.size"] = format_size(length)
+        pending[collection].append(UpdateOne({"_id": doc_id, "links.url": url}, {"$set": fields}))
+        titles[collection].add(title_id)
+        counts["checked"] += 1
+        counts["dead"] += not check["ok"]
+        if len(pending[collection]) >= batch_size:
+            flush(collection)
+            rate = counts["checked"] / (time.perf_counter() - started)
+            print(f"  {counts['checked']} checked, {counts['dead']} dead ({rate:,.0f} links/s)", end="\r", flush=True)
+
+    asyncio.run(check_all(links, concurrency, per_host, timeout, on_result))
+    for collection in list(pending):
+        flush(collection)
+    update_dead_link_counts(db, titles["movies"], titles["episodes"])
+    elapsed = time.perf_counter() - started
+    print(f"\nChecked {counts['checked']} links in {elapsed:.1f}s, {counts['dead']} dead.")
+    return counts
+
+
+def update_dead_link_counts(db, movie_ids, series_ids):
+    """Recomputes `dead_links` on titles from the checks stored on their links."""
+    operations = [UpdateOne({"_id": movie_id}, [{"$set": {"dead_links": {"$size": {"$filter": {
+        "input": {"$ifNull": ["$links", []]}, "cond": {"$eq": ["$$this.check.ok", False]}}}}}}])
+        for movie_id in movie_ids]
+    dead = {series_id: 0 for series_id in series_ids}
+    pipeline = [
+        {"$match": {"series_id": {"$in": list(series_ids)}}},
+        {"$unwind": "$links"},
+        {"$match": {"links.check.ok": False}},
+        {"$group": {"_id": "$series_id", "dead": {"$sum": 1}}},
+    ]
+    for row in db["episodes"].aggregate(pipeline):
+        dead[row["_id"]] = row["dead"]
+    operations.extend(UpdateOne({"_id": series_id}, {"$set": {"dead_links": count}}) for series_id, count in dead.items())
+    if operations:
+        db["movies"].bulk_write(operations, ordered=False)
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Check MovieZone download links.")
+    parser.add_argument("--max-age-hours", type=float, default=24, help="recheck links last checked longer ago than this")
+    parser.add_argument("--concurrency", type=int, default=100, help="requests in flight overall")
+    parser.add_argument("--per-host", type=int, default=8, help="requests in flight per host")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds per request")
+    parser.add_argument("--limit", type=int, default=0, help="check at most this many links per sweep")
+    parser.add_argument("--every", type=float, default=0, help="repeat the sweep every N minutes")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"), help="defaults to $MONGO_URI")
+    parser.add_argument("--db", default="movie_db")
+    args = parser.parse_args(argv)
+
+    if not args.mongo_uri:
+        print("Error: MONGO_URI environment variable not set and --mongo-uri not given.")
+        return 1
+
+    db = MongoClient(args.mongo_uri)[args.db]
+    while True:
+        sweep(db, args.max_age_hours, args.concurrency, args.per_host, args.timeout, args.limit)
+        if not args.every:
+            return 0
+        time.sleep(args.every * 60)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Buffered download click counters.
+
+Clicks are counted in memory and written every ``flush_interval`` seconds as
+one unordered ``bulk_write`` of upserting ``$inc`` updates, one per title, so
+a click costs a dict increment on the request path and MongoDB sees a bounded
+number of writes however busy the site is.
+
+Counts live in their own collection (one document per title, ``_id`` = the
+title's ``_id``) rather than on the movie documents, so counting doesn't
+trigger change stream events that would invalidate cached pages:
+
+    {total, links: {"720p": n, ...}, episodes: {"s1e2": {"720p": n, ...}}}
+"""
+import atexit
+import threading
+import time
+from collections import Counter, defaultdict
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+
+class ClickCounter:
+    def __init__(self, collection, flush_interval=10):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self._clicks = Counter()  # buffer key -> clicks; (title ObjectId, field path) here
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def record(self, title_id, quality, season=None, episode=None):
+        quality = quality.replace(".", "_").lstrip("$")  # Used as a field name
+        path = f"links.{quality}" if season is None else f"episodes.s{season}e{episode}.{quality}"
+        self._add((title_id, path))
+
+    def _add(self, key):
+        with self._lock:
+            self._clicks[key] += 1
+            if self._flusher is None:
+                # Started on first use, so it runs in the process that serves requests (after any fork)
+                self._flusher = threading.Thread(target=self._run, daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing {type(self).__name__}: {e}")
+
+    def _operations(self, clicks):
+        """[(UpdateOne, buffer keys it writes)] for the buffered `clicks`: one upsert per title."""
+        increments = defaultdict(Counter)
+        for (title_id, path), count in clicks.items():
+            increments[title_id][path] += count
+            increments[title_id]["total"] += count
+        return [(UpdateOne({"_id": title_id}, {"$inc": dict(paths)}, upsert=True),
+                 [(title_id, path) for path in paths if path != "total"])
+                for title_id, paths in increments.items()]
+
+    def flush(self):
+        """Writes the buffered clicks; returns how many were written."""
+        with self._lock:
+            clicks, self._clicks = self._clicks, Counter()
+        if not clicks:
+            return 0
+        operations = self._operations(clicks)
+        try:
+            self.collection.bulk_write([operation for operation, _ in operations], ordered=False)
+        except BulkWriteError as e:
+            # Keep the clicks of the operations that failed for the next flush
+            failed = [key for error in e.details.get("writeErrors", []) for key in operations[error["index"]][1]]
+            self._restore({key: clicks[key] for key in failed})
+            raise
+        except PyMongoError:
+            self._restore(clicks)
+            raise
+        return sum(clicks.values())
+
+    def _restore(self, clicks):
+        with self._lock:
+            self._clicks.update(clicks)
+
+    def pending(self):
+        return sum(self._clicks.values())
@@ -0,0 +1,186 @@
+"""Faceted browsing (genre, year, language, type) over an in-memory bitmap index.
+
+Every title gets a slot number, assigned in ``_id`` order, and every facet
+value a bitmap (a Python int) with the bits of the slots having that value:
+
+    genre     one bit per genre of the title
+    year      the first four digits of `year`
+    language  original_language, lowercased
+    type      movie / series
+
+A filter ORs the bitmaps of the values selected within a facet and ANDs the
+facets together. The count next to each value is the population count of its
+bitmap ANDed with the filter of the *other* facets, so it says how many
+titles the page would show with that value added. Results are the set bits
+from the highest slot down, i.e. newest first.
+
+The index is loaded once per process and kept current from movie change
+notifications, like the title search index. Slots of deleted titles stay
+empty until the next load.
+"""
+import threading
+import time
+
+from bson.objectid import ObjectId
+
+FACETS = ("genre", "year", "language", "type")
+FACET_FIELDS = {"genres": 1, "year": 1, "original_language": 1, "type": 1}
+
+
+def facet_values(doc):
+    """{facet: set of values} of `doc`."""
+    year = str(doc.get("year") or "")[:4]
+    language = (doc.get("original_language") or "").lower()
+    return {
+        "genre": {genre for genre in doc.get("genres") or [] if genre},
+        "year": {year} if year.isdigit() else set(),
+        "language": {language} if language and language != "n/a" else set(),
+        "type": {doc["type"]} if doc.get("type") else set(),
+    }
+
+
+def _sort_key(facet):
+    # Years newest first; other facets by how many titles they'd show, then alphabetically
+    if facet == "year":
+        return lambda item: -int(item[0])
+    return lambda item: (-item[1], item[0])
+
+
+class FacetIndex:
+    def __init__(self):
+        self.ready = False
+        self.load_seconds = None
+        self._ids = []  # slot -> ObjectId (None once deleted)
+        self._slots = {}  # ObjectId -> slot
+        self._values = {}  # slot -> facet_values() of the title
+        self._bitmaps = {facet: {} for facet in FACETS}  # facet -> value -> bitmap of slots
+        self._live = 0  # bitmap of the slots of existing titles
+        self._lock = threading.RLock()
+        self._loading = False
+        self._pending = []
+
+    def load(self, collection, batch_size=5000):
+        started = time.perf_counter()
+        with self._lock:
+            self._loading = True
+            self._pending = []
+        try:
+            docs = list(collection.find({}, FACET_FIELDS).sort("_id", 1).batch_size(batch_size))
+            with self._lock:
+                self._ids = []
+                self._slots = {}
+                self._values = {}
+                self._bitmaps = {facet: {} for facet in FACETS}
+                self._live = 0
+                for doc in docs:
+                    self._put(doc["_id"], doc)
+                self.ready = True
+                for doc_id, doc in self._pending:
+                    self._apply(doc_id, doc)
+        finally:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+        self.load_seconds = time.perf_counter() - started
+        return len(self._slots)
+
+    def apply_change(self, doc_id, doc):
+        """Movie change listener: (re)indexes `doc`, or removes `doc_id` when doc is None."""
+        with self._lock:
+            if self._loading:
+                self._pending.append((doc_id, doc))
+            elif self.ready:
+                self._apply(doc_id, doc)
+
+    def _apply(self, doc_id, doc):
+        if doc_id is None:
+            # Unknown changes; only a reload can make the index trustworthy again
+            self.ready = False
+            return
+        doc_id = ObjectId(doc_id)
+        if doc is None:
+            self._remove(doc_id)
+        else:
+            self._put(doc_id, doc)
+
+    def _put(self, doc_id, doc):
+        slot = self._slots.get(doc_id)
+        if slot is None:
+            # New titles have the newest _id, so appending keeps slots in _id order
+            slot = self._slots[doc_id] = len(self._ids)
+            self._ids.append(doc_id)
+        else:
+            self._clear(slot)
+        bit = 1 << slot
+        values = self._values[slot] = facet_values(doc)
+        for facet, facet_values_ in values.items():
+            bitmaps = self._bitmaps[facet]
+            for value in facet_values_:
+                bitmaps[value] = bitmaps.get(value, 0) | bit
+        self._live |= bit
+
+    def _remove(self, doc_id):
+        slot = self._slots.pop(doc_id, None)
+        if slot is not None:
+            self._clear(slot)
+            self._ids[slot] = None
+
+    def _clear(self, slot):
+        bit = 1 << slot
+        for facet, values in self._values.pop(slot, {}).items():
+            bitmaps = self._bitmaps[facet]
+            for value in values:
+                bitmaps[value] &= ~bit
+                if not bitmaps[value]:
+                    del bitmaps[value]
+        self._live &= ~bit
+
+    def query(self, selected, offset=0, limit=60):
+        """Titles matching `selected` ({facet: [values]}), newest first, and the facet counts.
+
+        Returns (ids of titles offset..offset+limit, total matches, {facet: [(value, count)]}).
+        """
+        with self._lock:
+            masks = {}
+            for facet in FACETS:
+                values = selected.get(facet)
+                if values:
+                    mask = 0
+                    for value in values:
+                        mask |= self._bitmaps[facet].get(value, 0)
+                    masks[facet] = mask
+            matches = self._live
+            for mask in masks.values():
+                matches &= mask
+
+            counts = {}
+            for facet in FACETS:
+                others = self._live
+                for other, mask in masks.items():
+                    if other != facet:
+                        others &= mask
+                facet_counts = [(value, (bitmap & others).bit_count()) for value, bitmap in self._bitmaps[facet].items()]
+                chosen = set(selected.get(facet) or ())
+                counts[facet] = sorted(((value, count) for value, count in facet_counts if count or value in chosen),
+                                       key=_sort_key(facet))
+
+            ids = [self._ids[slot] for slot in _slots_newest_first(matches, offset, limit)]
+        return ids, matches.bit_count(), counts
+
+    def __len__(self):
+        return len(self._slots)
+
+
+def _slots_newest_first(bitmap, offset, limit):
+    """Slots of the set bits of `bitmap`, highest first, skipping `offset` of them."""
+    bits = bin(bitmap)[2:]  # Highest slot first
+    top = len(bits) - 1
+    slots = []
+    i = bits.find("1")
+    while i != -1 and len(slots) < limit:
+        if offset:
+            offset -= 1
+        else:
+            slots.append(top - i)
+        i = bits.find("1", i + 1)
+    return slots
@@ -0,0 +1,171 @@
+"""Sitemap and RSS/Atom feed state, kept current from movie change notifications.
+
+The sitemap index holds only ``(_id, lastmod)`` for every title, loaded once
+per process with an ``_id``-ordered scan and then updated from the same
+change notifications as the page cache. Titles are split into shards of
+``SITEMAP_MAX_URLS`` in ``_id`` order; a change re-renders only the shard it
+falls in (new titles land in the last one), plus the small sitemap index.
+
+Feeds list the newest titles of one type and are rendered from an indexed
+``(type, _id)`` query; a rendered feed is dropped when a title of its type,
+or one it shows, changes.
+
+``lastmod`` is the document's ``updated_at`` (set by every admin write), or
+the creation time stored in its ObjectId for documents written before that.
+
+Rendered sitemaps and feeds are keyed by the site root their URLs start with;
+at most ``max_entries`` of each are kept, oldest dropped first, in case the
+root comes from the request's Host header.
+"""
+import bisect
+import threading
+from datetime import timezone
+
+from bson.objectid import ObjectId
+
+# Sitemap protocol limit per file
+SITEMAP_MAX_URLS = 50000
+
+FEED_INDEX = [("type", 1), ("_id", -1)]
+
+
+def lastmod(doc):
+    """When `doc` last changed, as an aware UTC datetime."""
+    value = doc.get("updated_at") or ObjectId(doc["_id"]).generation_time
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class SitemapIndex:
+    def __init__(self, shard_size=SITEMAP_MAX_URLS, max_entries=64):
+        self.shard_size = shard_size
+        self.max_entries = max_entries
+        self.ready = False
+        self._ids = []  # ascending ObjectIds
+        self._lastmod = {}  # ObjectId -> datetime
+        self._rendered = {}  # (shard or None for whole-sitemap entries, key) -> xml
+        self._generation = 0
+        self._lock = threading.RLock()
+        self._loading = False
+        self._pending = []
+
+    def load(self, collection, batch_size=5000):
+        with self._lock:
+            self._loading = True
+            self._pending = []
+        try:
+            lastmods = {}
+            for doc in collection.find({}, {"updated_at": 1}).sort("_id", 1).batch_size(batch_size):
+                lastmods[doc["_id"]] = lastmod(doc)
+            with self._lock:
+                self._ids = list(lastmods)
+                self._lastmod = lastmods
+                self._rendered = {}
+                self._generation += 1
+                self.ready = True
+                for doc_id, doc in self._pending:
+                    self._apply(doc_id, doc)
+        finally:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+        return len(self._ids)
+
+    def apply_change(self, doc_id, doc):
+        """Movie change listener: records the new lastmod of `doc`, or drops `doc_id` when doc is None."""
+        with self._lock:
+            if self._loading:
+                self._pending.append((doc_id, doc))
+            elif self.ready:
+                self._apply(doc_id, doc)
+
+    def _apply(self, doc_id, doc):
+        self._generation += 1
+        if doc_id is None:
+            # Unknown changes; the next request reloads
+            self.ready = False
+            self._rendered = {}
+            return
+        doc_id = ObjectId(doc_id)
+        i = bisect.bisect_left(self._ids, doc_id)
+        present = i < len(self._ids) and self._ids[i] == doc_id
+        shard = i // self.shard_size
+        if doc is None:
+            if present:
+                del self._ids[i]
+                del self._lastmod[doc_id]
+                self._invalidate(shard, shift=True)
+        else:
+            self._lastmod[doc_id] = lastmod(dict(doc, _id=doc_id))
+            if not present:
+                self._ids.insert(i, doc_id)
+            self._invalidate(shard, shift=not present)
+
+    def _invalidate(self, shard, shift):
+        """Drops rendered output for `shard` (and every later one when titles moved between shards)."""
+        stale = [key for key in self._rendered
+                 if key[0] is None or key[0] == shard or (shift and key[0] > shard)]
+        for key in stale:
+            del self._rendered[key]
+
+    def __len__(self):
+        return len(self._ids)
+
+    def shard_count(self):
+        return max(1, -(-len(self._ids) // self.shard_size))
+
+    def shard(self, number):
+        """[(id string, lastmod)] of the titles in shard `number`, oldest first."""
+        with self._lock:
+            ids = self._ids[number * self.shard_size:(number + 1) * self.shard_size]
+            return [(str(doc_id), self._lastmod[doc_id]) for doc_id in ids]
+
+    def shard_lastmod(self, number):
+        with self._lock:
+            ids = self._ids[number * self.shard_size:(number + 1) * self.shard_size]
+            return max((self._lastmod[doc_id] for doc_id in ids), default=None)
+
+    def rendered(self, shard, key, render):
+        """Cached output of `render()` for `key`; `shard` is the shard it is built from (None: all)."""
+        cached = self._rendered.get((shard, key))
+        if cached is not None:
+            return cached
+        generation = self._generation
+        output = render()
+        with self._lock:
+            # Don't cache output built from entries that changed while rendering
+            if generation == self._generation:
+                self._rendered[(shard, key)] = output
+                while len(self._rendered) > self.max_entries:
+                    del self._rendered[next(iter(self._rendered))]
+        return output
+
+
+class FeedCache:
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = {}  # key -> (xml, content type, doc_ids)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def set(self, key, xml, content_type, doc_ids):
+        with self._lock:
+            self._entries[key] = (xml, content_type, frozenset(doc_ids))
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    def apply_change(self, doc_id, doc):
+        """Movie change listener: drops feeds of the changed title's type or that show it."""
+        content_type = doc.get("type") if doc else None
+        with self._lock:
+            if doc_id is None:
+                self._entries.clear()
+                return
+            stale = [key for key, (_, feed_type, doc_ids) in self._entries.items()
+                     if feed_type == content_type or doc_id in doc_ids]
+            for key in stale:
+                del self._entries[key]
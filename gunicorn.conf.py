@@ -0,0 +1,63 @@
+# Production launcher for MovieZone.
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# The app is imported once in the master (preload_app) and forked into workers.
+# Importing bot.py doesn't connect to MongoDB, so the master only compiles the
+# templates (shared with the workers copy-on-write). Every worker runs a thread
+# pool (gthread), so a request blocked on MongoDB or TMDb only ties up one
+# thread, and opens its own MongoClient with a pool sized to its thread count.
+#
+# Graceful reload:
+#   kill -HUP  <master pid>   re-read this file and replace workers one by one
+#   kill -USR2 <master pid>   start a new master with new code (needed for code
+#                             deploys because the app is preloaded), then
+#   kill -QUIT <old pid>      once the new workers are serving
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+wsgi_app = "bot:create_app()"
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Request handlers mostly wait on MongoDB and TMDb, so a few processes with
+# several threads each keeps all cores busy without a process per request.
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", cpu_count * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))  # TMDb calls are capped at 5s each
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so slow leaks can't accumulate.
+max_requests = 2000
+max_requests_jitter = 200
+
+pidfile = os.getenv("GUNICORN_PIDFILE")
+accesslog = "-"
+errorlog = "-"
+
+# One connection per request thread plus headroom for background threads
+# (change stream watcher).
+# Must be set before bot.py is imported (it reads MONGO_MAX_POOL_SIZE at import time).
+os.environ.setdefault("MONGO_MAX_POOL_SIZE", str(threads + 2))
+
+
+def when_ready(server):
+    # Runs in the master after preloading, before any worker is forked
+    import bot
+    bot.compile_templates()
+    server.log.info(f"Templates compiled; bot.py imported in {bot.startup['import_seconds']:.3f}s")
+
+
+def post_fork(server, worker):
+    # A MongoClient is not fork-safe (its monitor threads and sockets don't
+    # survive fork), so every worker builds its own.
+    import bot
+    bot.connect_mongo()
+    server.log.info(f"Worker {worker.pid}: MongoDB client initialised (maxPoolSize={bot.MONGO_MAX_POOL_SIZE})")
+    # Threads don't survive fork either; start the change stream watcher etc. per worker
+    bot.start_background_workers()
@@ -0,0 +1,192 @@
+"""Data migrations for movie_db.
+
+    python migrate.py episodes [--batch-size 100]
+    python migrate.py indexes
+    python migrate.py shelves [--batch-size 1000]
+    python migrate.py schema [--batch-size 500]
+
+Each migration works in small batches against the live database, so the site
+can keep serving while it runs, and can be re-run safely after an interruption.
+
+episodes: moves the `episodes` array embedded in series documents into the
+    `episodes` collection (one document per episode) and stores `episode_count`
+    on the series instead. A series is only switched over if its embedded
+    episodes are still the ones copied; one saved in the admin meanwhile keeps
+    what the admin saved.
+
+shelves: moves trending titles from quality="TRENDING" to is_trending (the
+    overwritten quality tag cannot be recovered and is left empty) and fills the
+    indexed `shelves` field used by the homepage and category queries.
+
+indexes: creates every index the site queries with (the serving processes
+    don't, so that a worker boots while MongoDB is slow or unavailable). Run it
+    on every deploy, before the new code serves; creating an existing index is
+    a no-op.
+
+schema: rewrites titles and episodes into the normalized layout of schema.py
+    (integer year, real release dates, nulls instead of "N/A" placeholders, no
+    default link sizes) and creates the year and rating indexes. Each update
+    only applies if the fields still hold what was read, so a concurrent admin
+    edit is never overwritten; titles changed meanwhile are reported and left
+    for a re-run.
+"""
+import argparse
+import os
+import sys
+import time
+
+from bson.objectid import ObjectId
+from dotenv import load_dotenv
+from pymongo import InsertOne, MongoClient, UpdateOne
+
+from schema import NORMALIZERS, RATING_INDEX, YEAR_INDEX, schema_changes
+from shelves import SET_SHELVES_STAGE, SHELF_INDEX
+
+EPISODE_INDEX = [("series_id", 1), ("season", 1), ("episode_number", 1)]
+
+
+def migrate_episodes(db, batch_size=100):
+    db["episodes"].create_index(EPISODE_INDEX)
+    movies = db["movies"]
+    migrated = moved = skipped = 0
+    run = ObjectId()
+    started = time.perf_counter()
+    last_id = None
+    while True:
+        id_filter = {"_id": {"$gt": last_id}} if last_id else {}
+        batch = list(movies.find(dict(id_filter, episodes={"$exists": True}), {"episodes": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        for series in batch:
+            series_id = series["_id"]
+            embedded = series.get("episodes") or []
+            # Episodes written by the migration carry `migrating` until their series is switched
+            # over; admin saves never write it, so leftovers of an interrupted run can be told apart
+            episodes = db["episodes"]
+            episodes.delete_many({"series_id": series_id, "migrating": {"$exists": True}})
+            operations = [InsertOne({
+                "series_id": series_id,
+                "season": ep.get("season", 1),
+                "episode_number": ep.get("episode_number", 0),
+                "title": ep.get("title", ""),
+                "overview": ep.get("overview", ""),
+                "links": ep.get("links", []),
+                "migrating": run,
+            }) for ep in embedded]
+            if operations:
+                episodes.bulk_write(operations, ordered=False)
+            # Only switch the series if its embedded episodes are still the ones copied; an admin
+            # save in the meantime has unset them and written its own episode documents
+            switched = movies.update_one({"_id": series_id, "episodes": series["episodes"]},
+                                         {"$unset": {"episodes": ""}, "$set": {"episode_count": len(embedded)}})
+            if switched.matched_count:
+                episodes.update_many({"series_id": series_id, "migrating": run}, {"$unset": {"migrating": ""}})
+                migrated += 1
+                moved += len(embedded)
+            else:
+                episodes.delete_many({"series_id": series_id, "migrating": run})
+                skipped += 1
+        last_id = batch[-1]["_id"]
+        print(f"  {migrated} series migrated, {moved} episodes moved", end="\r", flush=True)
+    print(f"\nMoved {moved} episodes out of {migrated} series in {time.perf_counter() - started:.1f}s.")
+    if skipped:
+        print(f"{skipped} series were edited while being migrated and were left as saved.")
+
+
+def migrate_shelves(db, batch_size=1000):
+    movies = db["movies"]
+    movies.create_index(SHELF_INDEX)
+    pipeline = [
+        # Both fields are computed from the document as it was before this stage
+        {"$set": {
+            "is_trending": {"$or": [{"$eq": ["$is_trending", True]}, {"$eq": ["$quality", "TRENDING"]}]},
+            "quality": {"$cond": [{"$eq": ["$quality", "TRENDING"]}, "", "$quality"]}
+        }},
+        SET_SHELVES_STAGE
+    ]
+    updated = 0
+    last_id = None
+    started = time.perf_counter()
+    while True:
+        id_filter = {"_id": {"$gt": last_id}} if last_id else {}
+        ids = [doc["_id"] for doc in movies.find(id_filter, {"_id": 1}).sort("_id", 1).limit(batch_size)]
+        if not ids:
+            break
+        movies.update_many({"_id": {"$in": ids}}, pipeline)
+        updated += len(ids)
+        last_id = ids[-1]
+        print(f"  {updated} documents updated", end="\r", flush=True)
+    print(f"\nComputed shelves for {updated} documents in {time.perf_counter() - started:.1f}s.")
+
+
+def migrate_schema(db, batch_size=500):
+    db["movies"].create_index(YEAR_INDEX)
+    db["movies"].create_index(RATING_INDEX)
+    started = time.perf_counter()
+    # Episodes only have links to compact; their other fields are left alone
+    for name, fields in (("movies", list(NORMALIZERS)), ("episodes", ["links"])):
+        collection = db[name]
+        scanned = rewritten = skipped = 0
+        last_id = None
+        while True:
+            id_filter = {"_id": {"$gt": last_id}} if last_id else {}
+            batch = list(collection.find(id_filter, fields).sort("_id", 1).limit(batch_size))
+            if not batch:
+                break
+            operations = []
+            for doc in batch:
+                changes = schema_changes(doc)
+                if changes:
+                    expected = {field: doc[field] if field in doc else {"$exists": False} for field in changes}
+                    operations.append(UpdateOne(dict(expected, _id=doc["_id"]), {"$set": changes}))
+            if operations:
+                matched = collection.bulk_write(operations, ordered=False).matched_count
+                rewritten += matched
+                skipped += len(operations) - matched
+            scanned += len(batch)
+            last_id = batch[-1]["_id"]
+            print(f"  {name}: {scanned} scanned, {rewritten} rewritten", end="\r", flush=True)
+        print(f"\n{name}: rewrote {rewritten} of {scanned} documents in {time.perf_counter() - started:.1f}s.")
+        if skipped:
+            print(f"{skipped} {name} changed while being migrated; run the migration again to finish them.")
+
+
+def migrate_indexes(db, batch_size=None):
+    import bot  # The index list lives next to the queries that use it
+    if db.name != "movie_db":
+        raise SystemExit("The site's indexes are in movie_db; run without --db.")
+    bot.client = db.client
+    started = time.perf_counter()
+    bot.ensure_indexes()
+    print(f"Indexes ensured in {time.perf_counter() - started:.1f}s.")
+
+
+MIGRATIONS = {
+    "episodes": migrate_episodes,
+    "indexes": migrate_indexes,
+    "schema": migrate_schema,
+    "shelves": migrate_shelves,
+}
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run a movie_db data migration.")
+    parser.add_argument("migration", choices=sorted(MIGRATIONS))
+    parser.add_argument("--batch-size", type=int, help="documents per batch (default depends on the migration)")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"), help="defaults to $MONGO_URI")
+    parser.add_argument("--db", default="movie_db")
+    args = parser.parse_args(argv)
+
+    if not args.mongo_uri:
+        print("Error: MONGO_URI environment variable not set and --mongo-uri not given.")
+        return 1
+
+    db = MongoClient(args.mongo_uri)[args.db]
+    options = {"batch_size": args.batch_size} if args.batch_size else {}
+    MIGRATIONS[args.migration](db, **options)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
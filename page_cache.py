@@ -0,0 +1,108 @@
+"""In-process cache of rendered public pages.
+
+Every entry remembers which documents it shows and which shelves it is built
+from. When a document changes, only the pages that show it, or that list a
+shelf it now belongs to, are dropped.
+
+Hot entries are refreshed a little before they expire (probabilistic early
+expiration, "XFetch"): each lookup treats the entry as missing with a
+probability that grows as expiry nears and with how long the page took to
+render, so usually a single request re-renders it while the others are still
+served the cached copy, instead of all of them missing at the same moment.
+
+A page is only stored if nothing it shows or lists was invalidated while it
+was being rendered (or streamed to a slow client): callers take
+``generation()`` before rendering and pass it to ``set``.
+
+At most ``max_entries`` pages are kept; past that the least recently used
+are evicted, and expired entries are dropped when they are looked up.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class PageCache:
+    def __init__(self, ttl, early_refresh=1.0, max_entries=5000):
+        """`early_refresh` scales how early entries are refreshed (0 disables it)."""
+        self.ttl = ttl
+        self.early_refresh = early_refresh
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (html, doc_ids, shelves, expires_at, render_seconds)
+        self._generation = 0
+        self._invalidations = deque(maxlen=1000)  # (generation, doc_id or None for all, shelves)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            html, _, _, expires_at, render_seconds = entry
+            now = time.monotonic()
+            if now >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        if self.early_refresh:
+            # 1 - random() is in (0, 1], so the log is <= 0 and pushes `now` forward
+            now -= render_seconds * self.early_refresh * math.log(1.0 - random.random())
+        if now >= expires_at:
+            return None
+        return html
+
+    def generation(self):
+        """Take before rendering a page, and pass to set()."""
+        return self._generation
+
+    def set(self, key, html, doc_ids=(), shelves=(), render_seconds=0.0, generation=None):
+        """Stores a page, unless one of its documents or shelves was invalidated after `generation`."""
+        if not self.enabled:
+            return
+        doc_ids, shelves = frozenset(doc_ids), frozenset(shelves)
+        with self._lock:
+            if generation is not None and self._invalidated_since(generation, doc_ids, shelves):
+                return
+            self._entries[key] = (html, doc_ids, shelves, time.monotonic() + self.ttl, render_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _invalidated_since(self, generation, doc_ids, shelves):
+        if generation == self._generation:
+            return False
+        if not self._invalidations or self._invalidations[0][0] > generation + 1:
+            return True  # The log doesn't reach back that far
+        for invalidated, doc_id, invalidated_shelves in reversed(self._invalidations):
+            if invalidated <= generation:
+                break
+            if doc_id is None or doc_id in doc_ids or invalidated_shelves & shelves:
+                return True
+        return False
+
+    def invalidate_document(self, doc_id, shelves=()):
+        """Drops pages that show `doc_id` or list any of `shelves`."""
+        shelves = frozenset(shelves)
+        with self._lock:
+            self._generation += 1
+            self._invalidations.append((self._generation, doc_id, shelves))
+            stale = [key for key, (_, doc_ids, page_shelves, _, _) in self._entries.items()
+                     if doc_id in doc_ids or page_shelves & shelves]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._invalidations.append((self._generation, None, frozenset()))
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
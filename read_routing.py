@@ -0,0 +1,118 @@
+"""Routing of public reads to replica set secondaries, and per-server command counts.
+
+``ReadRouting`` holds the read preference of public pages (listing, detail,
+search, feeds) and the primary-after-change window: for ``hold_seconds``
+after a catalog change, public reads go to the primary again, so pages
+re-rendered right after an edit don't come from a secondary that hasn't
+replicated it yet. ``RoutedCollection`` is a collection stand-in that sends
+every operation wherever the routing says at that moment.
+
+``CommandMetrics`` is a pymongo command listener counting the reads, writes
+and other commands each server ran, with their time, so the split between
+primary and secondaries can be watched:
+
+    {"db1:27017": {"role": "RSPrimary", "reads": 120, "writes": 40, "other": 3, "failed": 0, "avg_ms": 1.2}, ...}
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+
+from pymongo import monitoring
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+READ_COMMANDS = frozenset({"find", "getMore", "aggregate", "count", "distinct"})
+WRITE_COMMANDS = frozenset({"insert", "update", "delete", "findAndModify"})
+
+
+def make_read_preference(mode, max_staleness=-1):
+    """Read preference `mode` ("secondaryPreferred", ...); max_staleness in seconds, -1 for no limit."""
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown read preference '{mode}' (use one of {', '.join(READ_PREFERENCES)}).")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCES[mode](max_staleness=max_staleness)
+
+
+class ReadRouting:
+    def __init__(self, mode="secondaryPreferred", max_staleness=-1, hold_seconds=5):
+        self.read_preference = make_read_preference(mode, max_staleness)
+        self.hold_seconds = hold_seconds
+        self.routed = Counter()  # "read_preference" / "primary_after_change" -> operations
+        self._primary_until = 0.0
+        self._lock = threading.Lock()  # route() runs in every serving thread
+
+    def catalog_changed(self, doc_id=None, doc=None):
+        """Movie change listener: public reads go to the primary for the next hold_seconds."""
+        self._primary_until = time.monotonic() + self.hold_seconds
+
+    def route(self, primary, public):
+        to_primary = time.monotonic() < self._primary_until
+        with self._lock:
+            self.routed["primary_after_change" if to_primary else "read_preference"] += 1
+        return primary if to_primary else public
+
+    def counts(self):
+        """Operations routed so far by the read preference and to the primary after a change."""
+        with self._lock:
+            return dict(self.routed)
+
+
+class RoutedCollection:
+    def __init__(self, routing, primary, public):
+        self._routing = routing
+        self._primary = primary
+        self._public = public
+
+    def __getattr__(self, name):
+        return getattr(self._routing.route(self._primary, self._public), name)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._servers = defaultdict(Counter)  # "host:port" -> counts, and microseconds spent
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+    def _record(self, event, failed):
+        name = event.command_name
+        kind = "reads" if name in READ_COMMANDS else "writes" if name in WRITE_COMMANDS else "other"
+        address = "%s:%s" % event.connection_id
+        with self._lock:
+            counts = self._servers[address]
+            counts[kind] += 1
+            counts["failed"] += failed
+            counts["micros"] += event.duration_micros
+
+    def report(self, topology=None):
+        """Counts per server; `topology` (a client's topology_description) adds each server's current role."""
+        roles = {"%s:%s" % address: server.server_type_name
+                 for address, server in topology.server_descriptions().items()} if topology else {}
+        with self._lock:
+            servers = {address: dict(counts) for address, counts in self._servers.items()}
+        report = {}
+        for address, counts in sorted(servers.items()):
+            total = counts.get("reads", 0) + counts.get("writes", 0) + counts.get("other", 0)
+            report[address] = {
+                "role": roles.get(address, "Unknown"),
+                "reads": counts.get("reads", 0),
+                "writes": counts.get("writes", 0),
+                "other": counts.get("other", 0),
+                "failed": counts.get("failed", 0),
+                "avg_ms": round(counts.get("micros", 0) / total / 1000, 2) if total else 0,
+            }
+        return report
@@ -0,0 +1,317 @@
+"""Related titles ("More like this") from a precomputed similarity index.
+
+    python related.py          # (re)build the related lists of the whole catalog
+
+Every title is described by one feature vector made of weighted blocks:
+
+    genres    one-hot over the catalog's genres
+    language  one-hot over original_language
+    type      movie / series
+    year      soft year buckets (a Gaussian around every 5th year), so nearby years overlap
+    overview  TF-IDF of the overview's words, hashed into OVERVIEW_DIMS buckets
+
+Each block is L2-normalized and scaled by the square root of its weight, so the
+dot product of two vectors is the weighted sum of the blocks' cosine
+similarities, between 0 and 1. The whole catalog is scored with NumPy matrix
+products, a chunk of titles at a time, and each title keeps its `size` nearest
+neighbours on its own document:
+
+    related  [{_id, score}, ...]  best first
+
+so the detail page needs one `_id $in` query to show them. ``RelatedIndex``
+keeps the vectors in memory and updates the lists of a few added or edited
+titles, and inserts them into (or removes deleted ones from) the lists of
+the other titles, without reloading the catalog.
+"""
+import argparse
+import math
+import os
+import re
+import sys
+import time
+import zlib
+
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+WEIGHTS = {"genres": 0.4, "overview": 0.3, "language": 0.1, "year": 0.1, "type": 0.1}
+OVERVIEW_DIMS = 256
+YEAR_CENTERS = np.arange(1940, 2036, 5, dtype=np.float32)
+YEAR_WIDTH = 4.0
+MIN_SCORE = 0.2
+FEATURE_FIELDS = {"genres": 1, "original_language": 1, "type": 1, "year": 1, "overview": 1}
+# Finds the lists showing a changed title
+RELATED_INDEX = [("related._id", 1)]
+
+_WORD = re.compile(r"[a-z]{3,}")
+STOPWORDS = frozenset("""
+    about after all also and are been before being but can from had has have her his into its more most
+    not one only our out over some such than that the their them then there these they this those two
+    under very was were what when where which while who will with you your
+""".split())
+
+
+def overview_words(text):
+    if not text or text == "No overview available.":
+        return []
+    return [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def _year(value):
+    try:
+        return int(str(value)[:4])
+    except ValueError:
+        return None
+
+
+def _categories(doc):
+    """Values of the one-hot blocks of `doc`."""
+    language = doc.get("original_language")
+    return {
+        "genres": doc.get("genres") or [],
+        "language": [language] if language not in (None, "", "N/A") else [],
+        "type": [doc["type"]] if doc.get("type") else [],
+    }
+
+
+def _overview_counts(docs):
+    block = np.zeros((len(docs), OVERVIEW_DIMS), np.float32)
+    # crc32 rather than hash(), which differs between processes
+    cells = [(row, zlib.crc32(word.encode()) % OVERVIEW_DIMS)
+             for row, doc in enumerate(docs) for word in overview_words(doc.get("overview"))]
+    if cells:
+        rows, cols = map(np.array, zip(*cells))
+        np.add.at(block, (rows, cols), 1)
+    return block
+
+
+class FeatureSpace:
+    """The genre, language and type vocabularies and overview IDF weights of a catalog."""
+
+    def __init__(self, docs):
+        self.vocabularies = {name: {} for name in ("genres", "language", "type")}
+        for doc in docs:
+            for name, values in _categories(doc).items():
+                vocabulary = self.vocabularies[name]
+                for value in values:
+                    vocabulary.setdefault(value, len(vocabulary))
+        document_frequency = np.count_nonzero(_overview_counts(docs), axis=0)
+        self.idf = (np.log((1 + len(docs)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    def vectors(self, docs):
+        """((len(docs), d) float32 matrix of the weighted, normalized feature blocks, whether a
+        doc has a genre, language or type this space doesn't know, which its vector leaves out)."""
+        unseen = False
+        blocks = {}
+        for name, vocabulary in self.vocabularies.items():
+            block = np.zeros((len(docs), len(vocabulary)), np.float32)
+            for row, doc in enumerate(docs):
+                for value in _categories(doc)[name]:
+                    if value in vocabulary:
+                        block[row, vocabulary[value]] = 1
+                    else:
+                        unseen = True
+            blocks[name] = block
+        years = np.array([_year(doc.get("year")) or np.nan for doc in docs], np.float32)
+        year_block = np.nan_to_num(np.exp(-0.5 * ((years[:, None] - YEAR_CENTERS) / YEAR_WIDTH) ** 2))
+        blocks["year"] = year_block.astype(np.float32)
+        blocks["overview"] = _overview_counts(docs) * self.idf
+        for name, block in blocks.items():
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            block /= np.where(norms == 0, 1, norms)
+            block *= math.sqrt(WEIGHTS[name])
+        return np.hstack([blocks[name] for name in WEIGHTS]), unseen
+
+
+def feature_matrix(docs):
+    """(len(docs), d) float32 matrix of the weighted, normalized feature blocks."""
+    return FeatureSpace(docs).vectors(docs)[0]
+
+
+def top_k(sims, rows, k):
+    """Best `k` columns of each row of `sims` (row i belongs to title rows[i], which is skipped)."""
+    sims[np.arange(len(rows)), rows] = -np.inf
+    k = min(k, sims.shape[1] - 1)
+    if k <= 0:
+        return np.empty((len(rows), 0), np.intp), np.empty((len(rows), 0), np.float32)
+    best = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(sims, best, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def _neighbours(ids, columns, scores):
+    return [{"_id": ids[j], "score": round(float(score), 4)} for j, score in zip(columns, scores) if score >= MIN_SCORE]
+
+
+def _weakest(related, size):
+    """Score a title must beat to enter `related` (titles without a list yet are left to the next rebuild)."""
+    if related is None:
+        return np.inf
+    return related[-1]["score"] if len(related) >= size else MIN_SCORE
+
+
+def signature(doc):
+    """What of `doc` its feature vector depends on."""
+    return (tuple(doc.get("genres") or ()), doc.get("original_language"), doc.get("type"), _year(doc.get("year")),
+            tuple(overview_words(doc.get("overview"))))
+
+
+def rebuild(movies, size=12, chunk_size=512):
+    """Recomputes the related list of every title; returns how many were written."""
+    started = time.perf_counter()
+    docs = list(movies.find({}, FEATURE_FIELDS))
+    ids = [doc["_id"] for doc in docs]
+    features = feature_matrix(docs)
+    for start in range(0, len(docs), chunk_size):
+        rows = np.arange(start, min(start + chunk_size, len(docs)))
+        best, scores = top_k(features[rows] @ features.T, rows, size)
+        movies.bulk_write([UpdateOne({"_id": ids[row]}, {"$set": {"related": _neighbours(ids, best[i], scores[i])}})
+                           for i, row in enumerate(rows)], ordered=False)
+        print(f"  {rows[-1] + 1} of {len(docs)} titles", end="\r", flush=True)
+    print(f"\nBuilt related lists for {len(docs)} titles in {time.perf_counter() - started:.1f}s.")
+    return len(docs)
+
+
+class RelatedIndex:
+    """The catalog's feature vectors, kept between updates so an update only scores the changed titles.
+
+    ``load`` reads the whole catalog once. ``update`` then reads only the changed
+    titles, the lists that show them and the lists they may enter. The
+    vocabularies and IDF weights stay as loaded until a changed title brings a
+    genre, language or type they don't know, which reloads everything. Each
+    title's weakest listed score is kept too, to find the lists a changed title
+    enters without reading them all.
+    """
+
+    def __init__(self, size=12):
+        self.size = size
+        self.ready = False
+        self.clear()
+
+    def clear(self):
+        """Drops the loaded state (the next update loads it again)."""
+        self.ready = False
+        self.space = None
+        self.features = None
+        self.ids = []  # row -> _id, None for deleted titles
+        self.position = {}
+        self.weakest = None
+        self.signatures = {}
+
+    def load(self, movies):
+        started = time.perf_counter()
+        docs = list(movies.find({}, dict(FEATURE_FIELDS, related=1)))
+        self.space = FeatureSpace(docs)
+        self.features = self.space.vectors(docs)[0]
+        self.ids = [doc["_id"] for doc in docs]
+        self.position = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.weakest = np.array([_weakest(doc.get("related"), self.size) for doc in docs], np.float32)
+        self.signatures = {doc["_id"]: signature(doc) for doc in docs}
+        self.ready = True
+        self.load_seconds = time.perf_counter() - started
+        return len(docs)
+
+    def changed(self, doc):
+        """Whether `doc`'s features differ from its indexed ones (or it isn't indexed)."""
+        return self.signatures.get(doc.get("_id")) != signature(doc)
+
+    def _apply(self, docs, deleted):
+        """Puts the vectors of `docs` into the index and zeroes deleted titles; False if the space must be reloaded."""
+        vectors, unseen = self.space.vectors(docs)
+        if unseen:
+            return False
+        added = []
+        for doc, vector in zip(docs, vectors):
+            row = self.position.get(doc["_id"])
+            if row is None:
+                added.append(vector)
+                row = self.position[doc["_id"]] = len(self.ids)
+                self.ids.append(doc["_id"])
+            else:
+                self.features[row] = vector
+            self.signatures[doc["_id"]] = signature(doc)
+        if added:
+            self.features = np.vstack([self.features, np.array(added)])
+            self.weakest = np.concatenate([self.weakest, np.full(len(added), np.inf, np.float32)])
+        for doc_id in deleted:
+            row = self.position.pop(doc_id, None)
+            if row is not None:
+                # A zero vector scores 0 against everything, below MIN_SCORE
+                self.features[row] = 0
+                self.weakest[row] = np.inf
+                self.ids[row] = None
+                self.signatures.pop(doc_id, None)
+        return True
+
+    def update(self, movies, changed_ids):
+        """Updates the related lists after `changed_ids` were added, edited or deleted.
+
+        Returns the ids of the titles whose list was rewritten.
+        """
+        changed = set(changed_ids)
+        docs = list(movies.find({"_id": {"$in": list(changed)}}, FEATURE_FIELDS))
+        deleted = changed - {doc["_id"] for doc in docs}
+        if not self.ready or not self._apply(docs, deleted):
+            self.load(movies)
+        ids = self.ids
+        rows = np.array(sorted(self.position[doc["_id"]] for doc in docs), np.intp)
+        operations = {}  # row -> new related list
+
+        entering = {}  # row of another title -> {changed id: its score for that title}
+        if len(rows):
+            sims = self.features[rows] @ self.features.T
+            best, scores = top_k(sims.copy(), rows, self.size)
+            for i, row in enumerate(rows):
+                operations[row] = _neighbours(ids, best[i], scores[i])
+            # A changed title enters another title's list if it beats that list's weakest entry
+            enters = sims >= self.weakest
+            enters[:, rows] = False
+            for i, j in zip(*np.nonzero(enters)):
+                entering.setdefault(j, {})[ids[rows[i]]] = float(sims[i, j])
+
+        # Titles it enters, and titles already listing a changed (or deleted) title, which gets its new score or leaves
+        query = {"$or": [{"_id": {"$in": [ids[j] for j in entering]}}, {"related._id": {"$in": list(changed)}}]}
+        for doc in movies.find(query, {"related": 1}):
+            j = self.position.get(doc["_id"])
+            if j is None or j in operations:
+                continue
+            scores = entering.get(j, {})
+            for neighbour in doc.get("related") or []:
+                doc_id = neighbour["_id"]
+                if doc_id in changed and doc_id in self.position and doc_id not in scores:
+                    i = int(np.searchsorted(rows, self.position[doc_id]))
+                    scores[doc_id] = float(sims[i, j])
+            related = [n for n in doc.get("related") or [] if n["_id"] not in changed]
+            related += [{"_id": doc_id, "score": round(score, 4)} for doc_id, score in scores.items() if score >= MIN_SCORE]
+            related.sort(key=lambda n: n["score"], reverse=True)
+            operations[j] = related[:self.size]
+
+        if operations:
+            movies.bulk_write([UpdateOne({"_id": ids[row]}, {"$set": {"related": related}})
+                               for row, related in operations.items()], ordered=False)
+            for row, related in operations.items():
+                self.weakest[row] = _weakest(related, self.size)
+        return [ids[row] for row in operations]
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build the related titles of every MovieZone title.")
+    parser.add_argument("--size", type=int, default=int(os.getenv("RELATED_SIZE", "12")), help="neighbours per title")
+    parser.add_argument("--chunk-size", type=int, default=512, help="titles scored per matrix product")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"), help="defaults to $MONGO_URI")
+    parser.add_argument("--db", default="movie_db")
+    args = parser.parse_args(argv)
+
+    if not args.mongo_uri:
+        print("Error: MONGO_URI environment variable not set and --mongo-uri not given.")
+        return 1
+
+    rebuild(MongoClient(args.mongo_uri)[args.db]["movies"], args.size, args.chunk_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Normalized layout of catalog documents.
+
+    year               int, or None when unknown
+    release_date       datetime (midnight UTC), or None
+    original_language  lowercase code ("en", "bn"), or None
+    overview, poster   str, or None
+    vote_average       float, or None
+    links              [{quality, url}], with `size` only when it differs from the
+                       quality's default (e.g. a real size found by check_links.py);
+                       links are the same download when quality and url match
+
+Typed `year` and `vote_average` can be range-queried on their indexes
+({"year": {"$gte": 2020}} compares numbers, not strings). Documents written
+before this layout hold "N/A", "No overview available." or "" placeholders,
+`year` as a string and the default size on every link;
+``python migrate.py schema`` rewrites them. Readers still accept both.
+"""
+from datetime import datetime, timezone
+
+DEFAULT_LINK_SIZES = {"480p": "590MB", "720p": "1.4GB", "1080p": "2.9GB"}
+PLACEHOLDERS = frozenset({"", "N/A", "No overview available."})
+MIN_YEAR, MAX_YEAR = 1870, 2100
+YEAR_INDEX = [("year", 1)]
+RATING_INDEX = [("vote_average", 1)]
+
+
+def parse_year(value):
+    """2023, "2023" or "2023-05-12" -> 2023; anything else -> None."""
+    if isinstance(value, datetime):
+        return value.year
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        year = int(value)
+    else:
+        text = str(value or "").strip()[:4]
+        if not text.isdigit():
+            return None
+        year = int(text)
+    return year if MIN_YEAR <= year <= MAX_YEAR else None
+
+
+def parse_release_date(value):
+    """A datetime or "YYYY-MM-DD" (as TMDb returns it) -> datetime at midnight UTC; a bare year is no date."""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        return datetime.strptime(str(value or "").strip()[:10], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def parse_rating(value):
+    try:
+        return None if value is None or value == "" else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return None if value in PLACEHOLDERS else value
+
+
+def _language(value):
+    value = _text(value)
+    return value.lower() if value else None
+
+
+def make_link(quality, url):
+    return {"quality": quality, "url": url}
+
+
+def link_size(link):
+    """The size to show for a link: its own, or its quality's default."""
+    return link.get("size") or DEFAULT_LINK_SIZES.get(link.get("quality"), "")
+
+
+def link_key(link):
+    return link.get("quality"), link.get("url")
+
+
+def same_links(old_links, new_links):
+    """Whether two link lists point at the same downloads (check results and sizes aside)."""
+    return [link_key(link) for link in old_links or []] == [link_key(link) for link in new_links or []]
+
+
+def keep_link_checks(old_links, new_links):
+    """`new_links` (as built from a form) with the stored check, bytes and size of links that didn't change."""
+    stored = {link_key(link): link for link in old_links or []}
+    return [stored.get(link_key(link), link) for link in new_links]
+
+
+def dead_link_count(links):
+    """Links whose last check failed, or None if none of them has been checked."""
+    checks = [link["check"] for link in links if link.get("check")]
+    return sum(not check.get("ok") for check in checks) if checks else None
+
+
+def keep_link_checks_stages(new_links):
+    """Update pipeline stages doing keep_link_checks and dead_link_count on the server.
+
+    Sets `links` to `new_links`, each replaced by the stored link with the same key,
+    then `dead_links` (removed if no link has been checked). Merging against what is
+    stored at the moment of the update keeps a check written meanwhile.
+    """
+    stored = {"$filter": {"input": {"$ifNull": ["$links", []]}, "cond": {"$and": [
+        {"$eq": ["$$this.quality", "$$link.quality"]}, {"$eq": ["$$this.url", "$$link.url"]}]}}}
+    checked = {"$filter": {"input": "$links", "cond": {"$ne": [{"$ifNull": ["$$this.check", None]}, None]}}}
+    return [
+        {"$set": {"links": {"$map": {"input": {"$literal": new_links}, "as": "link",
+                                     "in": {"$ifNull": [{"$arrayElemAt": [stored, -1]}, "$$link"]}}}}},
+        {"$set": {"dead_links": {"$let": {"vars": {"checked": checked}, "in": {"$cond": [
+            {"$eq": [{"$size": "$$checked"}, 0]}, "$$REMOVE",
+            {"$size": {"$filter": {"input": "$$checked", "cond": {"$ne": ["$$this.check.ok", True]}}}}]}}}}},
+    ]
+
+
+def compact_links(links):
+    """Links without the `size` their quality implies anyway (other fields are kept)."""
+    compacted = []
+    for link in links or []:
+        if "size" in link and link["size"] == DEFAULT_LINK_SIZES.get(link.get("quality")):
+            link = {key: value for key, value in link.items() if key != "size"}
+        compacted.append(link)
+    return compacted
+
+
+NORMALIZERS = {
+    "year": parse_year,
+    "release_date": parse_release_date,
+    "original_language": _language,
+    "overview": _text,
+    "poster": _text,
+    "vote_average": parse_rating,
+    "links": compact_links,
+}
+
+
+def normalize_movie(doc):
+    """Copy of `doc` in the normalized layout (only the fields it has are touched)."""
+    normalized = dict(doc)
+    for field, normalize in NORMALIZERS.items():
+        if field in normalized:
+            normalized[field] = normalize(normalized[field])
+    if normalized.get("year") is None and normalized.get("release_date"):
+        normalized["year"] = normalized["release_date"].year
+    return normalized
+
+
+def _same(old, new):
+    if isinstance(old, datetime) and isinstance(new, datetime):
+        # Documents read back from MongoDB carry naive UTC datetimes
+        return parse_release_date(old) == new
+    return type(old) is type(new) and old == new
+
+
+def schema_changes(doc):
+    """{field: normalized value} for the fields of `doc` not yet in the normalized layout."""
+    normalized = normalize_movie(doc)
+    return {field: normalized[field] for field in NORMALIZERS
+            if field in normalized and not (field in doc and _same(doc[field], normalized[field]))}
+
+
+def format_date(value):
+    """Template filter: release dates as YYYY-MM-DD, whatever layout they're stored in."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    return value or ""
@@ -0,0 +1,278 @@
+"""Synthetic catalog generator for scale testing MovieZone.
+
+Produces documents with the same shape that ``admin()`` in bot.py writes
+(movies with ``links``, series with ``episode_count`` plus one document per
+episode in the ``episodes`` collection, quality tags, trending / coming-soon
+flags, genres, top labels) and streams them into MongoDB with unordered bulk
+inserts.
+
+Output is deterministic by seed: every document is generated from its own
+``Random("<seed>:<index>")``, so a run can be resumed with ``--start`` or split
+across several processes and still produce exactly the same catalog. Titles
+and episodes already inserted by an earlier run are skipped, so resuming from
+before the point where a run stopped is safe.
+
+Examples:
+    python seed_catalog.py --count 10000
+    python seed_catalog.py --count 1000000 --seed 7 --drop --batch-size 2000
+    python seed_catalog.py --count 3 --dry-run
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+
+from bson import json_util
+from bson.objectid import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+from change_stream import UPDATED_AT_INDEX
+from feeds import FEED_INDEX
+from schema import DEFAULT_LINK_SIZES, RATING_INDEX, YEAR_INDEX, make_link
+from shelves import SHELF_INDEX, movie_shelves
+
+# Same names as TMDb_Genre_Map in bot.py (kept local so seeding doesn't need a TMDb key)
+GENRES = [
+    "Action", "Adventure", "Animation", "Comedy", "Crime", "Documentary", "Drama",
+    "Music", "Mystery", "Romance", "Science Fiction", "TV Movie", "Thriller",
+    "War", "Western", "Family", "Fantasy", "History"
+]
+
+QUALITY_TAGS = ["HD", "HDRip", "WEB-DL", "BluRay", "Hindi Dubbed", "Dual Audio", "CAMRip", ""]
+QUALITY_WEIGHTS = [25, 15, 20, 10, 12, 8, 3, 7]
+
+TOP_LABELS = ["", "New", "Special Offer", "Exclusive", "Bangla Dubbed"]
+TOP_LABEL_WEIGHTS = [80, 8, 4, 4, 4]
+
+LANGUAGES = ["en", "hi", "bn", "ko", "ja", "ta", "te", "es", "fr", "ml"]
+LANGUAGE_WEIGHTS = [35, 20, 12, 8, 6, 5, 5, 4, 3, 2]
+
+LINK_HOSTS = ["dl1.example.net", "dl2.example.net", "cdn.files.example.org", "mirror.example.com"]
+
+TITLE_WORDS = [
+    "Shadow", "Kingdom", "Last", "Night", "River", "Storm", "Silent", "Empire", "Broken",
+    "Dawn", "Red", "City", "Ghost", "Iron", "Secret", "Wild", "Lost", "Fire", "Moon",
+    "Blood", "Heart", "Hunter", "Edge", "Legacy", "Return", "Rise", "Dark", "Golden",
+    "Frozen", "Echo", "Crown", "Signal", "Paradise", "Hidden", "Winter", "Avenger",
+    "Journey", "Mirror", "Thunder", "Garden", "Code", "Island", "Rebel", "Zero"
+]
+OVERVIEW_WORDS = [
+    "a", "the", "young", "detective", "family", "secret", "must", "discover", "world",
+    "war", "love", "journey", "betrayal", "team", "city", "past", "future", "fight",
+    "survive", "village", "mystery", "power", "friends", "escape", "truth", "danger",
+    "hidden", "legend", "mission", "dream", "revenge", "brother", "sister", "king"
+]
+
+# Base timestamp for generated ObjectIds (2015-01-01); ids are spread so that
+# `_id` order matches insertion order, like real admin inserts.
+BASE_TIMESTAMP = 1420070400
+SECONDS_PER_DOC = 37
+
+
+def make_object_id(index, rng):
+    """Deterministic, monotonically increasing ObjectId for document `index`."""
+    timestamp = BASE_TIMESTAMP + index * SECONDS_PER_DOC
+    return ObjectId(struct.pack(">I", timestamp & 0xFFFFFFFF) + rng.randbytes(5) + struct.pack(">I", index)[1:])
+
+
+def make_title(rng):
+    words = rng.sample(TITLE_WORDS, rng.randint(1, 3))
+    title = " ".join(words)
+    if rng.random() < 0.15:
+        title += f" {rng.randint(2, 4)}"
+    return title
+
+
+def make_overview(rng, min_words=12, max_words=40):
+    words = [rng.choice(OVERVIEW_WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+
+def make_links(rng, object_id, prefix=""):
+    links = []
+    host = rng.choice(LINK_HOSTS)
+    for quality in DEFAULT_LINK_SIZES:
+        links.append(make_link(quality, f"https://{host}/{object_id}/{prefix}{quality}.mkv"))
+    return links
+
+
+def episode_count(rng, max_episodes):
+    """Most series are short, a tail of long-running shows has hundreds of episodes."""
+    if rng.random() < 0.1:
+        return rng.randint(min(100, max_episodes), max_episodes)
+    return rng.randint(1, min(24, max_episodes))
+
+
+def make_document(index, seed, series_ratio=0.3, max_episodes=300):
+    """Builds catalog document number `index` exactly like admin() would store it.
+
+    Returns (document, episodes); episodes is empty for movies.
+    """
+    rng = random.Random(f"{seed}:{index}")
+    object_id = make_object_id(index, rng)
+    content_type = "series" if rng.random() < series_ratio else "movie"
+    is_trending = rng.random() < 0.03
+    is_coming_soon = rng.random() < 0.05
+
+    doc = {
+        "_id": object_id,
+        "title": make_title(rng),
+        "quality": rng.choices(QUALITY_TAGS, QUALITY_WEIGHTS)[0].upper(),
+        "type": content_type,
+        "overview": None,
+        "poster": None,
+        "year": None,
+        "release_date": None,
+        "vote_average": None,
+        "original_language": None,
+        "genres": [],
+        "tmdb_id": None,
+        "top_label": rng.choices(TOP_LABELS, TOP_LABEL_WEIGHTS)[0],
+        "is_trending": is_trending,
+        "is_coming_soon": is_coming_soon,
+        "version": 1,
+        "updated_at": object_id.generation_time
+    }
+    doc["shelves"] = sorted(movie_shelves(doc))
+
+    # ~85% of titles were matched on TMDb (or filled in manually), the rest keep admin() defaults
+    if rng.random() < 0.85:
+        year = rng.randint(1970, 2026)
+        doc["overview"] = make_overview(rng)
+        doc["poster"] = f"https://image.tmdb.org/t/p/w500/{rng.randbytes(12).hex()}.jpg"
+        doc["year"] = year
+        doc["release_date"] = datetime(year, rng.randint(1, 12), rng.randint(1, 28), tzinfo=timezone.utc)
+        doc["vote_average"] = round(rng.uniform(3.0, 9.5), 1)
+        doc["original_language"] = rng.choices(LANGUAGES, LANGUAGE_WEIGHTS)[0]
+        doc["genres"] = rng.sample(GENRES, rng.randint(1, 3))
+        doc["tmdb_id"] = rng.randint(1000, 1200000) if content_type == "movie" else None
+
+    episodes = []
+    if content_type == "movie":
+        doc["links"] = make_links(rng, object_id)
+    else:
+        # Long-running shows are split into seasons; numbering restarts every season
+        season, number, season_length = 1, 0, rng.randint(8, 24)
+        for _ in range(episode_count(rng, max_episodes)):
+            number += 1
+            if number > season_length:
+                season, number = season + 1, 1
+            episodes.append({
+                "_id": ObjectId(object_id.binary[:4] + rng.randbytes(8)),
+                "series_id": object_id,
+                "season": season,
+                "episode_number": number,
+                "title": f"Episode {number}",
+                "overview": make_overview(rng, 6, 20) if rng.random() < 0.5 else "",
+                "links": make_links(rng, object_id, f"s{season}e{number}-")
+            })
+        doc["episode_count"] = len(episodes)
+    return doc, episodes
+
+
+def generate(count, seed, start=0, series_ratio=0.3, max_episodes=300):
+    """Lazily yields (document, episodes) for documents start .. start+count-1."""
+    for index in range(start, start + count):
+        yield make_document(index, seed, series_ratio, max_episodes)
+
+
+DUPLICATE_KEY = 11000
+
+
+def insert_new(collection, documents):
+    """Unordered insert_many that skips documents whose _id already exists; returns how many were inserted."""
+    try:
+        return len(collection.insert_many(documents, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+            raise
+        return e.details["nInserted"]
+
+
+def insert_batches(db, generated, batch_size, collection="movies"):
+    """Streams generated titles into `db` with unordered insert_many batches.
+
+    Titles go to `collection`, their episodes to `db.episodes`; ones already
+    there (same _id, from an earlier run) are skipped. Returns (titles
+    inserted, episodes inserted, seconds).
+    """
+    inserted = inserted_episodes = 0
+    started = time.perf_counter()
+    batch, episode_batch = [], []
+
+    def flush():
+        nonlocal inserted, inserted_episodes
+        if batch:
+            inserted += insert_new(db[collection], batch)
+        if episode_batch:
+            inserted_episodes += insert_new(db["episodes"], episode_batch)
+        batch.clear()
+        episode_batch.clear()
+
+    for doc, episodes in generated:
+        batch.append(doc)
+        episode_batch.extend(episodes)
+        if len(batch) >= batch_size or len(episode_batch) >= batch_size * 10:
+            flush()
+            elapsed = time.perf_counter() - started
+            print(f"  {inserted} titles, {inserted_episodes} episodes inserted ({inserted / elapsed:,.0f} titles/s)", end="\r", flush=True)
+    flush()
+    return inserted, inserted_episodes, time.perf_counter() - started
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Generate a synthetic MovieZone catalog.")
+    parser.add_argument("--count", type=int, default=10000, help="number of titles to generate")
+    parser.add_argument("--seed", type=int, default=42, help="random seed (same seed = same catalog)")
+    parser.add_argument("--start", type=int, default=0, help="index of the first document (for resuming or sharding runs)")
+    parser.add_argument("--series-ratio", type=float, default=0.3, help="fraction of titles that are series")
+    parser.add_argument("--max-episodes", type=int, default=300, help="episode count of the longest-running series")
+    parser.add_argument("--batch-size", type=int, default=1000, help="documents per insert_many call")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"), help="defaults to $MONGO_URI")
+    parser.add_argument("--db", default="movie_db")
+    parser.add_argument("--collection", default="movies")
+    parser.add_argument("--drop", action="store_true", help="drop the target collection first")
+    parser.add_argument("--dry-run", action="store_true", help="print the documents as JSON instead of inserting")
+    args = parser.parse_args(argv)
+
+    generated = generate(args.count, args.seed, args.start, args.series_ratio, args.max_episodes)
+
+    if args.dry_run:
+        for doc, episodes in generated:
+            print(json_util.dumps(doc, indent=2))
+            for episode in episodes:
+                print(json_util.dumps(episode, indent=2))
+        return 0
+
+    if not args.mongo_uri:
+        print("Error: MONGO_URI environment variable not set and --mongo-uri not given.")
+        return 1
+
+    client = MongoClient(args.mongo_uri)
+    db = client[args.db]
+    if args.drop:
+        print(f"Dropping {args.db}.{args.collection} and {args.db}.episodes...")
+        db[args.collection].drop()
+        db["episodes"].drop()
+    db[args.collection].create_index(SHELF_INDEX)
+    db[args.collection].create_index(FEED_INDEX)
+    db[args.collection].create_index(UPDATED_AT_INDEX)
+    db[args.collection].create_index(YEAR_INDEX)
+    db[args.collection].create_index(RATING_INDEX)
+    db["episodes"].create_index([("series_id", 1), ("season", 1), ("episode_number", 1)])
+
+    print(f"Seeding {args.count} titles into {args.db}.{args.collection} (seed={args.seed}, start={args.start})...")
+    inserted, inserted_episodes, elapsed = insert_batches(db, generated, args.batch_size, args.collection)
+    print(f"\nInserted {inserted} titles and {inserted_episodes} episodes in {elapsed:.1f}s "
+          f"({inserted / max(elapsed, 1e-9):,.0f} titles/s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
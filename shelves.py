@@ -0,0 +1,72 @@
+"""Homepage shelf membership, shared by the app, the migrations and the seeder.
+
+Every title stores the shelves it appears on in an indexed ``shelves`` array,
+computed on every write, so each shelf query is one equality match walked in
+``_id`` order on the ``(shelves, _id)`` index:
+
+    trending     is_trending is set (titles pinned in the admin; the app lists
+                 the computed ranking of trending.py after them)
+    coming_soon  is_coming_soon is set
+    movies       a movie that is neither trending nor coming soon
+    series       a series that is neither trending nor coming soon
+
+Trending used to be stored by overwriting ``quality`` with "TRENDING"; that
+value is still treated as trending until ``python migrate.py shelves`` has
+moved it to ``is_trending``.
+"""
+SHELVES = ("trending", "movies", "series", "coming_soon")
+
+SHELF_INDEX = [("shelves", 1), ("_id", -1)]
+
+# Filters for the homepage shelves and their "See All" pages (all sorted newest first by _id)
+TRENDING_FILTER = {"shelves": "trending"}
+LATEST_MOVIES_FILTER = {"shelves": "movies"}
+LATEST_SERIES_FILTER = {"shelves": "series"}
+COMING_SOON_FILTER = {"shelves": "coming_soon"}
+
+SHELF_FILTERS = {
+    "trending": TRENDING_FILTER,
+    "movies": LATEST_MOVIES_FILTER,
+    "series": LATEST_SERIES_FILTER,
+    "coming_soon": COMING_SOON_FILTER
+}
+
+
+def is_trending(doc):
+    return doc.get("is_trending") is True or doc.get("quality") == "TRENDING"
+
+
+def movie_shelves(doc):
+    """Names of the homepage shelves `doc` appears on."""
+    shelves = set()
+    if is_trending(doc):
+        shelves.add("trending")
+    if doc.get("is_coming_soon") is True:
+        shelves.add("coming_soon")
+    if not shelves and doc.get("type") == "movie":
+        shelves.add("movies")
+    if not shelves and doc.get("type") == "series":
+        shelves.add("series")
+    return shelves
+
+
+# The same rule as an aggregation expression, for pipeline updates that recompute
+# `shelves` on the server (migrations, bulk admin actions).
+_TRENDING_EXPR = {"$or": [{"$eq": ["$is_trending", True]}, {"$eq": ["$quality", "TRENDING"]}]}
+_COMING_SOON_EXPR = {"$eq": ["$is_coming_soon", True]}
+SHELVES_EXPRESSION = {"$concatArrays": [
+    {"$cond": [_TRENDING_EXPR, ["trending"], []]},
+    {"$cond": [_COMING_SOON_EXPR, ["coming_soon"], []]},
+    {"$cond": [
+        {"$or": [_TRENDING_EXPR, _COMING_SOON_EXPR]},
+        [],
+        {"$switch": {
+            "branches": [
+                {"case": {"$eq": ["$type", "movie"]}, "then": ["movies"]},
+                {"case": {"$eq": ["$type", "series"]}, "then": ["series"]}
+            ],
+            "default": []
+        }}
+    ]}
+]}
+SET_SHELVES_STAGE = {"$set": {"shelves": SHELVES_EXPRESSION}}
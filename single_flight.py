@@ -0,0 +1,75 @@
+"""Request coalescing for expensive loads.
+
+``SingleFlight`` lets one thread per key do the work while concurrent callers
+for the same key wait for, and share, its result (or exception).
+
+``MongoLease`` is the cross-process counterpart: a short-lived lock document
+in MongoDB, so only one process at a time runs a given load. Leases expire
+after ``ttl`` seconds, so a crashed holder can't block the key for long.
+"""
+import threading
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}  # key -> _Call in progress
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Runs `fn()` unless a call for `key` is already running, in which case waits for its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class MongoLease:
+    def __init__(self, collection, ttl=30):
+        self.collection = collection
+        self.ttl = ttl
+
+    def ensure_index(self):
+        # Lets MongoDB delete expired leases; acquire() doesn't rely on it
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def acquire(self, key, owner):
+        """True if `owner` now holds the lease on `key` (a holder acquiring it again renews it)."""
+        now = datetime.now(timezone.utc)
+        lease = {"owner": owner, "expires_at": now + timedelta(seconds=self.ttl)}
+        try:
+            self.collection.insert_one(dict(lease, _id=key))
+            return True
+        except DuplicateKeyError:
+            # Renew our own lease, or take over one whose holder didn't release it in time
+            result = self.collection.update_one({"_id": key, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+                                                {"$set": lease})
+            return result.modified_count == 1
+
+    def release(self, key, owner):
+        self.collection.delete_one({"_id": key, "owner": owner})
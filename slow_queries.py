@@ -0,0 +1,268 @@
+"""Slow-query log: a pymongo command listener recording queries over a latency threshold.
+
+Every find, aggregate, count, distinct, findAndModify, update or delete (and
+getMore of a cursor one of them opened) slower than `threshold_ms` is
+recorded with the route that ran it, its server, its time and the documents
+it returned. Queries are grouped by shape: the command, collection, filter
+with every value replaced by "?" (keys, operators and "$field" paths are
+kept), and sort:
+
+    find movies {"title": {"$regex": "?"}, "type": "?"} sort {"_id": -1}
+
+The first time a shape is slow, its query is re-run with
+``explain("executionStats")`` in a background thread. The shape's report
+then shows the documents and index keys examined, and the winning plan
+(COLLSCAN, IXSCAN on which index, a blocking SORT). Shapes are ranked by
+total time spent in slow runs.
+
+The driver doesn't report how many documents a single run examined, so that
+number comes from the shape's explain, next to the documents each run
+returned.
+
+Change streams and tailable cursors are left out: their getMores wait up to
+maxAwaitTimeMS for new data, so an idle one would look slow every time.
+"""
+import json
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+QUERY_COMMANDS = frozenset({"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"})
+# Fields the driver adds to commands, which explain doesn't take
+DRIVER_FIELDS = frozenset({"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "readConcern",
+                           "writeConcern", "startTransaction", "autocommit"})
+RANK_KEYS = {"total": "total_ms", "max": "max_ms", "avg": "avg_ms", "count": "count"}
+
+
+def is_tailing(command_name, command):
+    """Whether `command` opens a cursor that waits for new data: a change stream or a tailable find."""
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        return "$changeStream" in pipeline[0]
+    return command_name == "find" and bool(command.get("tailable") or command.get("awaitData"))
+
+
+def redact(value):
+    """Shape of a filter or pipeline: values become "?", lists of values one "?"."""
+    if isinstance(value, dict):
+        return {key: value[key] if key == "$sort" else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [redact(item) for item in value]
+        return ["?"]
+    if isinstance(value, str) and value.startswith("$"):
+        return value  # Field path ("$genres")
+    return "?"
+
+
+def query_parts(command_name, command):
+    """(filter or pipeline, sort) of a query command."""
+    if command_name == "find":
+        return command.get("filter", {}), command.get("sort")
+    if command_name == "aggregate":
+        return command.get("pipeline", []), None
+    if command_name in ("count", "distinct"):
+        return command.get("query", {}), None
+    if command_name == "findAndModify":
+        return command.get("query", {}), command.get("sort")
+    statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+    return statements[0].get("q", {}), None
+
+
+def explain_command(command_name, command):
+    """The query of `command` without driver fields; update/delete with its first statement only."""
+    explained = {key: value for key, value in command.items() if key not in DRIVER_FIELDS}
+    if command_name in ("update", "delete"):
+        statements = "updates" if command_name == "update" else "deletes"
+        explained[statements] = explained[statements][:1]
+    return explained
+
+
+def _find(doc, key):
+    """First value under `key` anywhere in an explain result."""
+    if isinstance(doc, dict):
+        if key in doc:
+            return doc[key]
+        values = doc.values()
+    elif isinstance(doc, list):
+        values = doc
+    else:
+        return None
+    for value in values:
+        found = _find(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _plan_stages(plan, stages, indexes):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        if "indexName" in plan:
+            indexes.append(plan["indexName"])
+        for value in plan.values():
+            _plan_stages(value, stages, indexes)
+    elif isinstance(plan, list):
+        for value in plan:
+            _plan_stages(value, stages, indexes)
+
+
+def summarize_explain(result):
+    """What the report shows of an explain("executionStats") result."""
+    stats = _find(result, "executionStats") or {}
+    stages, indexes = [], []
+    _plan_stages(_find(result, "winningPlan"), stages, indexes)
+    return {
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis"),
+        "plan": " > ".join(stages),
+        "indexes": sorted(set(indexes)),
+    }
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    def __init__(self, threshold_ms=100, explain=None, route=None, max_shapes=500, recent=200):
+        """`explain(database, command)` runs an explain command; `route()` names what is running a query."""
+        self.threshold_micros = int(threshold_ms * 1000)
+        self.explain = explain
+        self.route = route or (lambda: threading.current_thread().name)
+        self.max_shapes = max_shapes
+        self._pending = {}  # (connection, request id) -> (route, command name, command, getMore cursor id)
+        self._cursors = {}  # cursor id -> (command name, command) of the find/aggregate that opened it
+        self._shapes = {}  # shape key -> stats
+        self._recent = deque(maxlen=recent)
+        self._explains = queue.Queue(maxsize=100)
+        self._explainer = None
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        name = event.command_name
+        if self.threshold_micros <= 0 or (name not in QUERY_COMMANDS and name != "getMore"):
+            return
+        cursor_id = None
+        if name == "getMore":
+            cursor_id = event.command.get("getMore")
+            with self._lock:
+                opened = self._cursors.get(cursor_id)
+            if opened is None:
+                return
+            name, command = opened
+        else:
+            command = event.command
+            if is_tailing(name, command):
+                return  # Its getMores wait for changes on purpose; neither it nor they are slow queries
+        pending = (self.route(), name, command, cursor_id)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = pending
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None)
+
+    def _finish(self, event, reply):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        route, name, command, cursor_id = pending
+        cursor = (reply or {}).get("cursor") or {}
+        if cursor_id is None and cursor.get("id"):
+            with self._lock:
+                if len(self._cursors) >= 10000:
+                    self._cursors.pop(next(iter(self._cursors)))  # Oldest; its cursor was likely abandoned
+                self._cursors[cursor["id"]] = (name, command)
+        elif cursor_id is not None and not cursor.get("id"):
+            with self._lock:
+                self._cursors.pop(cursor_id, None)
+        if event.duration_micros >= self.threshold_micros:
+            returned = len(cursor.get("firstBatch", cursor.get("nextBatch", []))) if cursor else (reply or {}).get("n")
+            self.record(event, route, name, command, returned, failed=reply is None)
+
+    def record(self, event, route, name, command, returned, failed=False):
+        query, sort = query_parts(name, command)
+        filter_shape = json.dumps(redact(query), sort_keys=True, default=str)
+        sort_shape = json.dumps(sort, default=str) if sort else None
+        collection = command.get(name)
+        key = (name, collection, filter_shape, sort_shape)
+        took_ms = event.duration_micros / 1000
+        server = "%s:%s" % event.connection_id
+        print(f"Slow query ({took_ms:.0f} ms) in {route}: {name} {collection} {filter_shape}"
+              + (f" sort {sort_shape}" if sort_shape else ""))
+        explain = False
+        with self._lock:
+            stats = self._shapes.get(key)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    # Make room by dropping the shape that cost the least so far
+                    del self._shapes[min(self._shapes, key=lambda k: self._shapes[k]["total_ms"])]
+                stats = self._shapes[key] = {
+                    "command": name, "collection": collection, "filter": filter_shape, "sort": sort_shape,
+                    "count": 0, "failed": 0, "total_ms": 0.0, "max_ms": 0.0, "returned": 0,
+                    "routes": Counter(), "servers": Counter(), "first_seen": time.time(),
+                    "explain": "pending" if self.explain else None,
+                }
+                explain = self.explain is not None
+            stats["count"] += 1
+            stats["failed"] += failed
+            stats["total_ms"] += took_ms
+            stats["max_ms"] = max(stats["max_ms"], took_ms)
+            stats["returned"] += returned or 0
+            stats["routes"][route] += 1
+            stats["servers"][server] += 1
+            stats["last_seen"] = time.time()
+            command_name = name if event.command_name == name else f"{name} ({event.command_name})"
+            self._recent.append({"at": time.time(), "route": route, "command": command_name, "collection": collection,
+                                 "filter": filter_shape, "sort": sort_shape, "ms": round(took_ms, 1),
+                                 "returned": returned, "server": server, "failed": failed})
+        if explain:
+            self._queue_explain(key, event.database_name, explain_command(name, command))
+
+    def _queue_explain(self, key, database, command):
+        try:
+            self._explains.put_nowait((key, database, command))
+        except queue.Full:
+            with self._lock:
+                if key in self._shapes:
+                    self._shapes[key]["explain"] = "skipped (explain queue full)"
+            return
+        with self._lock:
+            if self._explainer is None:
+                self._explainer = threading.Thread(target=self._run_explains, daemon=True)
+                self._explainer.start()
+
+    def _run_explains(self):
+        while True:
+            key, database, command = self._explains.get()
+            try:
+                summary = summarize_explain(self.explain(database, command))
+            except PyMongoError as e:
+                summary = f"failed: {e}"
+            with self._lock:
+                if key in self._shapes:
+                    self._shapes[key]["explain"] = summary
+
+    def report(self, rank="total", top=20):
+        """The `top` slow shapes, worst first by total, max or avg time or count, and the latest slow runs."""
+        rank_key = RANK_KEYS[rank]
+        with self._lock:
+            shapes = []
+            for stats in self._shapes.values():
+                shape = dict(stats, routes=dict(stats["routes"].most_common()),
+                             servers=dict(stats["servers"].most_common()))
+                shape["avg_ms"] = shape["total_ms"] / shape["count"]
+                shapes.append(shape)
+            recent = list(self._recent)[::-1]
+        shapes.sort(key=lambda shape: shape[rank_key], reverse=True)
+        for shape in shapes:
+            for field in ("total_ms", "max_ms", "avg_ms"):
+                shape[field] = round(shape[field], 1)
+        return {"threshold_ms": self.threshold_micros / 1000, "shapes": shapes[:top], "recent": recent[:top]}
@@ -0,0 +1,45 @@
+"""Last-known-good copies of rendered public pages.
+
+Every successful render of a public URL is kept (least recently used entries
+are evicted past ``max_entries``), independent of the page cache TTL. When
+MongoDB fails or misses its deadline, the route serves this copy instead of an
+error. URLs served stale are remembered so they can be re-rendered once the
+database answers again.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class StaleCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # url -> (html, rendered_at)
+        self._served_stale = set()
+        self._lock = threading.Lock()
+
+    def set(self, url, html):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[url] = (html, time.time())
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_stale(self, url):
+        """(html, rendered_at) of the last good render of `url`, or None; marks `url` for revalidation."""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._served_stale.add(url)
+            return entry
+
+    def take_served_stale(self):
+        """URLs served stale since the last call."""
+        with self._lock:
+            urls, self._served_stale = self._served_stale, set()
+            return urls
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,153 @@
+"""Typo-tolerant title search over an in-process trigram index.
+
+Titles are normalized (accents stripped, lowercased, punctuation removed) and
+split into trigrams the way PostgreSQL's pg_trgm does: every word is padded
+with two spaces in front and one behind, so "avngers" still shares most of
+its trigrams with "avengers". An inverted index maps each trigram to the ids
+of the titles containing it; a search only visits the posting lists of the
+query's trigrams.
+
+Candidates are scored by the average of
+    coverage    shared trigrams / query trigrams (a short query inside a long title)
+    similarity  shared trigrams / all trigrams of both (Jaccard, favours close matches)
+with a bonus when the normalized query appears verbatim in the title. Ties
+are broken by rating, then year, then newest first.
+
+The index is loaded once per process and kept current from movie change
+notifications, like the catalog mirror.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from bson.objectid import ObjectId
+
+MIN_SCORE = 0.3
+SUBSTRING_BONUS = 0.5
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    """Lowercase ASCII words of `text`: "Amélie: Part-2" -> "amelie part 2"."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def trigrams(normalized):
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _year(value):
+    try:
+        return int(str(value)[:4])
+    except ValueError:
+        return 0
+
+
+class TitleSearchIndex:
+    def __init__(self, min_score=MIN_SCORE):
+        self.min_score = min_score
+        self.ready = False
+        self.load_seconds = None
+        self._postings = {}  # trigram -> set of ObjectIds
+        self._titles = {}  # ObjectId -> (normalized title, trigrams, (rating, year))
+        self._lock = threading.RLock()
+        self._loading = False
+        self._pending = []
+
+    def load(self, collection, batch_size=5000):
+        started = time.perf_counter()
+        with self._lock:
+            self._loading = True
+            self._pending = []
+        try:
+            docs = list(collection.find({}, {"title": 1, "year": 1, "vote_average": 1}).batch_size(batch_size))
+            with self._lock:
+                self._postings = {}
+                self._titles = {}
+                for doc in docs:
+                    self._put(doc["_id"], doc)
+                self.ready = True
+                for doc_id, doc in self._pending:
+                    self._apply(doc_id, doc)
+        finally:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+        self.load_seconds = time.perf_counter() - started
+        return len(self._titles)
+
+    def apply_change(self, doc_id, doc):
+        """Movie change listener: (re)indexes `doc`, or removes `doc_id` when doc is None."""
+        with self._lock:
+            if self._loading:
+                self._pending.append((doc_id, doc))
+            elif self.ready:
+                self._apply(doc_id, doc)
+
+    def _apply(self, doc_id, doc):
+        if doc_id is None:
+            # Unknown changes; only a reload can make the index trustworthy again
+            self.ready = False
+            return
+        doc_id = ObjectId(doc_id)
+        self._remove(doc_id)
+        if doc is not None:
+            self._put(doc_id, doc)
+
+    def _put(self, doc_id, doc):
+        title = normalize(doc.get("title"))
+        grams = trigrams(title)
+        self._titles[doc_id] = (title, grams, (doc.get("vote_average") or 0, _year(doc.get("year"))))
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(doc_id)
+
+    def _remove(self, doc_id):
+        entry = self._titles.pop(doc_id, None)
+        if entry is None:
+            return
+        for gram in entry[1]:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def search(self, query, limit=50):
+        """Ids of the best matching titles for `query`, best first."""
+        normalized = normalize(query)
+        query_grams = trigrams(normalized)
+        if not query_grams:
+            return []
+        with self._lock:
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self._postings.get(gram, ()))
+            # Without the substring bonus a score never exceeds coverage, so titles sharing
+            # too few trigrams can be skipped without scoring them (substrings share nearly all)
+            min_common = self.min_score * len(query_grams)
+            scored = []
+            for doc_id, common in shared.items():
+                if common < min_common:
+                    continue
+                title, grams, (rating, year) = self._titles[doc_id]
+                coverage = common / len(query_grams)
+                similarity = common / (len(query_grams) + len(grams) - common)
+                score = (coverage + similarity) / 2
+                if normalized in title:
+                    score += SUBSTRING_BONUS
+                if score >= self.min_score:
+                    scored.append((score, rating, year, doc_id))
+        best = heapq.nlargest(limit, scored)
+        return [doc_id for _, _, _, doc_id in best]
+
+    def __len__(self):
+        return len(self._titles)
@@ -0,0 +1,87 @@
+"""Cached TMDb lookups (title searches for the admin candidate picker, details by id).
+
+Responses are kept in a small in-process LRU and in MongoDB, one document per
+lookup, expired by a TTL index:
+
+    {_id: "search:movie:the matrix" | "movie:603" | "tv:1396", data, expires_at}
+
+so the process that saves a title finds the detail another process fetched
+while the admin was picking it. Concurrent lookups of the same key in a
+process share one request. TMDb error responses ({"success": false}) are
+not cached.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import PyMongoError
+
+from single_flight import SingleFlight
+
+POSTER_THUMB_URL = "https://image.tmdb.org/t/p/w92"
+
+
+class TMDbCache:
+    def __init__(self, collection, ttl=86400, max_entries=1000):
+        self.collection = collection
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (monotonic expiry, data), least recently used first
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def ensure_index(self):
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def get(self, key, fetch):
+        """The cached response for `key`, or fetch()'s result (cached unless it is a TMDb error)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[1]
+        return self._flight.do(key, lambda: self._load(key, fetch))
+
+    def _load(self, key, fetch):
+        now = datetime.now(timezone.utc)
+        try:
+            doc = self.collection.find_one({"_id": key, "expires_at": {"$gt": now}})
+        except PyMongoError as e:
+            print(f"Error reading TMDb cache entry '{key}': {e}")
+            doc = None
+        if doc is not None:
+            data = doc["data"]
+        else:
+            data = fetch()
+            if not isinstance(data, dict) or data.get("success") is False:
+                return data
+            try:
+                self.collection.update_one({"_id": key}, {"$set": {"data": data, "expires_at": now + timedelta(seconds=self.ttl)}},
+                                           upsert=True)
+            except PyMongoError as e:
+                print(f"Error writing TMDb cache entry '{key}': {e}")
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data
+
+
+def tmdb_candidate(result):
+    """What the admin picker shows of a TMDb search result or detail (movie or tv)."""
+    release = result.get("release_date") or result.get("first_air_date") or ""
+    overview = result.get("overview") or ""
+    return {
+        "tmdb_id": result.get("id"),
+        "title": result.get("title") or result.get("name") or "",
+        "original_title": result.get("original_title") or result.get("original_name") or "",
+        "year": int(release[:4]) if release[:4].isdigit() else None,
+        "poster": f"{POSTER_THUMB_URL}{result['poster_path']}" if result.get("poster_path") else None,
+        "overview": overview if len(overview) <= 300 else overview[:297].rsplit(" ", 1)[0] + "...",
+    }
+
+
+def tmdb_candidates(response, limit=8):
+    return [tmdb_candidate(result) for result in (response or {}).get("results", [])[:limit] if result.get("id")]
@@ -0,0 +1,102 @@
+"""Trending shelf computed from detail page views.
+
+Views of /movie/<id> are buffered per process (``ViewCounter``) and written as
+batched ``$inc`` upserts into hourly buckets, one document per title and hour:
+
+    title_views  {title_id, hour, views}
+
+A periodic job turns the buckets of the last ``window_hours`` into one score
+per title, each bucket's views weighted by ``0.5 ** (age / half_life_hours)``,
+so a view counts half as much a half-life later. The scores are computed with
+NumPy over every bucket at once and the best ``size`` titles are stored, in
+order, as one document that every process reads:
+
+    trending  {_id: "current", ids, scores, computed_at}
+
+Titles pinned with ``is_trending`` are not part of the ranking; the app lists
+them first.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from pymongo import UpdateOne
+
+from click_counter import ClickCounter
+
+VIEWS_INDEX = [("title_id", 1), ("hour", 1)]
+
+
+class ViewCounter(ClickCounter):
+    """Buffered page views, written per (title, hour) bucket."""
+
+    def record(self, title_id):
+        hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        self._add((title_id, hour))
+
+    def _operations(self, views):
+        return [(UpdateOne({"title_id": title_id, "hour": hour}, {"$inc": {"views": count}}, upsert=True), [(title_id, hour)])
+                for (title_id, hour), count in views.items()]
+
+
+def trending_scores(buckets, now, half_life_hours):
+    """(title ids, time-decayed scores as an array) from {title_id, hour, views} buckets."""
+    codes = {}  # title id -> position in the scores array
+    titles = np.fromiter((codes.setdefault(b["title_id"], len(codes)) for b in buckets), np.intp, len(buckets))
+    # Stored datetimes come back naive, in UTC
+    hours = np.fromiter((b["hour"].replace(tzinfo=timezone.utc).timestamp() for b in buckets), np.float64, len(buckets))
+    views = np.fromiter((b["views"] for b in buckets), np.float64, len(buckets))
+    age_hours = np.maximum(now.timestamp() - hours, 0) / 3600
+    scores = np.bincount(titles, weights=views * np.exp2(-age_hours / half_life_hours), minlength=len(codes))
+    return list(codes), scores
+
+
+def top_titles(ids, scores, size):
+    """The `size` best scoring ids, best first, with their scores."""
+    if len(ids) > size:
+        best = np.argpartition(scores, -size)[-size:]
+    else:
+        best = np.arange(len(ids))
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return [ids[i] for i in best], [round(float(score), 3) for score in scores[best]]
+
+
+def compute_trending(views_collection, size, half_life_hours, window_hours):
+    """Ranks titles by their recent views; returns (ids, scores). Drops buckets older than the window."""
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(hours=window_hours)
+    views_collection.delete_many({"hour": {"$lt": cutoff}})
+    buckets = list(views_collection.find({"hour": {"$gte": cutoff}}, {"_id": 0, "title_id": 1, "hour": 1, "views": 1}))
+    if not buckets:
+        return [], []
+    ids, scores = trending_scores(buckets, now, half_life_hours)
+    return top_titles(ids, scores, size)
+
+
+class TrendingShelf:
+    """The stored ranking, cached per process and re-read by ``refresh()``."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.ids = []
+        self.scores = []
+        self.computed_at = None
+
+    def refresh(self):
+        """Re-reads the stored ranking; True if the ranked ids changed."""
+        doc = self.collection.find_one({"_id": "current"}) or {}
+        return self._set(doc.get("ids", []), doc.get("scores", []), doc.get("computed_at"))
+
+    def store(self, ids, scores):
+        computed_at = datetime.now(timezone.utc)
+        self.collection.replace_one({"_id": "current"}, {"ids": ids, "scores": scores, "computed_at": computed_at}, upsert=True)
+        return self._set(ids, scores, computed_at)
+
+    def _set(self, ids, scores, computed_at):
+        changed = ids != self.ids
+        self.ids, self.scores = ids, scores
+        self.computed_at = computed_at.replace(tzinfo=timezone.utc) if computed_at else None
+        return changed
+
+    def due(self, interval):
+        """True if the stored ranking is older than `interval` seconds (or missing)."""
+        return self.computed_at is None or datetime.now(timezone.utc) - self.computed_at >= timedelta(seconds=interval)